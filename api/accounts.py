@@ -0,0 +1,63 @@
+# coding=utf-8
+import datetime
+
+from sqlalchemy import select
+
+from api.auth import TOKEN_LIFETIME
+from api.database import SHARDED_TABLES
+from api.sharding import shard_engine, shard_of
+from api.models import db, User, Category, Recipe, Tag, DisableTokens, IdempotencyKey, Change
+
+# rows removed per transaction, small enough to keep every lock short
+DEFAULT_BATCH_SIZE = 1000
+# the rows a deleted account owns, children first
+OWNED_TABLES = (Recipe.__table__, Tag.__table__, Category.__table__, DisableTokens.__table__,
+                IdempotencyKey.__table__, Change.__table__)
+
+
+def delete_in_batches(table, user_id, batch_size, engine=None):
+    """
+    Delete the rows of `table` owned by a user, `batch_size` rows per transaction
+
+    :param engine: the database holding the rows, the default one unless given
+
+    :return: the number of rows deleted
+    """
+    engine = engine or db.engine
+    key = table.c.id if 'id' in table.c else table.c.key
+    deleted = 0
+    while True:
+        batch = select([key]).where(table.c.user_id == user_id).limit(batch_size)
+        with engine.begin() as connection:
+            # postgres has no DELETE ... LIMIT, pick the batch first
+            ids = [row[0] for row in connection.execute(batch)]
+            if not ids:
+                return deleted
+            connection.execute(table.delete().where((table.c.user_id == user_id) & key.in_(ids)))
+        deleted += len(ids)
+
+
+def purge_accounts(batch_size=DEFAULT_BATCH_SIZE, now=None):
+    """
+    Delete the data of every disabled account in short transactions. The user
+    row itself goes once the tokens it was issued have expired, so its
+    username can not be taken over while they are still accepted.
+
+    :return: the number of rows deleted per table
+    """
+    now = now or datetime.datetime.utcnow()
+    users = User.__table__
+    deleted = {}
+    disabled = db.engine.execute(select([users.c.id, users.c.disabled_at, users.c.shard]).where(
+        users.c.disabled_at.isnot(None))).fetchall()
+    for user in disabled:
+        user_id, disabled_at = user.id, user.disabled_at
+        shard = shard_engine(shard_of(user))
+        for table in OWNED_TABLES:
+            engine = shard if table.name in SHARDED_TABLES else db.engine
+            deleted[table.name] = deleted.get(table.name, 0) + delete_in_batches(table, user_id, batch_size, engine)
+        if disabled_at <= now - TOKEN_LIFETIME:
+            with db.engine.begin() as connection:
+                connection.execute(users.delete().where(users.c.id == user_id))
+            deleted[users.name] = deleted.get(users.name, 0) + 1
+    return deleted
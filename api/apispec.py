@@ -0,0 +1,52 @@
+# coding=utf-8
+import json
+import os
+
+from flask import Response
+
+# endpoint of the spec flasgger builds from the Resource docstrings
+SPEC_ENDPOINT = 'flasgger.apispec_1'
+
+
+def build(app):
+    """
+    :param app: the application whose Resource docstrings to document
+    :return: the swagger spec flasgger generates for the app
+    """
+    view = app.view_functions[SPEC_ENDPOINT]
+    # never rebuild from a previously built file
+    view = getattr(view, 'live_view', view)
+    with app.test_request_context():
+        response = view()
+    return json.loads(response.get_data(as_text=True))
+
+
+def write(app, path):
+    """
+    Build the spec of `app` and store it as json in `path`
+    """
+    spec = build(app)
+    with open(path, 'w') as spec_file:
+        json.dump(spec, spec_file, indent=2, sort_keys=True)
+    return spec
+
+
+def init_app(app):
+    """
+    Serve the spec from the APISPEC_FILE built by `manage.py build_apispec`
+    instead of parsing every docstring on each request. Flasgger keeps
+    generating it live when the file does not exist.
+    """
+    path = app.config.get('APISPEC_FILE')
+    if not path or not os.path.exists(path):
+        return
+    cache = {}
+
+    def static_apispec():
+        if 'spec' not in cache:
+            with open(path, 'rb') as spec_file:
+                cache['spec'] = spec_file.read()
+        return Response(cache['spec'], mimetype='application/json')
+
+    static_apispec.live_view = app.view_functions[SPEC_ENDPOINT]
+    app.view_functions[SPEC_ENDPOINT] = static_apispec
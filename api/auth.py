@@ -1,9 +1,61 @@
 # coding=utf-8
+import datetime
+import hmac
 import jwt
 
-from flask import request, jsonify, make_response
+from flask import request, jsonify, make_response, current_app, abort, g
 from functools import wraps
 from api.models import User, DisableTokens
+from api.metrics import record_auth
+from api.sharding import shard_of
+from api.timing import timed
+
+# access tokens expire this long after login
+TOKEN_LIFETIME = datetime.timedelta(hours=2)
+
+
+def authenticate(token):
+    """
+    Check an access token
+
+    :return: the user the token was issued to and None, or None and the 401 response to send
+    """
+    if not token:
+        record_auth('missing')
+        return None, make_response(jsonify({'message': 'Token is missing!'}), 401)
+
+    try:
+        with timed('jwt'):
+            data = jwt.decode(token, 'topsecret')
+        with timed('blacklist'):
+            is_blacklisted_token = DisableTokens.check_blacklist(token)
+        if is_blacklisted_token:
+            record_auth('revoked')
+            return None, make_response(jsonify({'message': 'Logged out. log in again'}), 401)
+        else:
+            with timed('user'):
+                current_user = User.query.filter_by(username=data['username']).first()
+    except:
+        record_auth('invalid')
+        return None, make_response(jsonify({'message': 'Token is Invalid'}), 401)
+    if current_user is None or current_user.disabled_at is not None:
+        # the account was deleted, every token it was issued is void
+        record_auth('revoked')
+        return None, make_response(jsonify({'message': 'Token is Invalid'}), 401)
+
+    if current_user.shard_moving:
+        record_auth('moving')
+        response = make_response(jsonify({'message': 'Your data is being moved, try again shortly'}), 503)
+        response.headers['Retry-After'] = '5'
+        return None, response
+
+    record_auth('ok')
+    g.current_user_id = current_user.id
+    # replica_read keeps the user on the primary shortly after a write
+    g.last_write_at = current_user.last_write_at
+    # the user's categories and recipes are read from and written to their shard
+    g.shard = shard_of(current_user)
+    return current_user, None
 
 
 def token_required(f):
@@ -12,22 +64,33 @@ def token_required(f):
     """
     @wraps(f)
     def decorated(*args, **kwargs):
-        token = None
+        current_user, error = authenticate(request.headers.get('x-access-token'))
+        if error is not None:
+            return error
+        return f(current_user, *args, **kwargs)
+    return decorated
 
-        if 'x-access-token' in request.headers:
-            token = request.headers['x-access-token']
-        if not token:
-            return make_response(jsonify({'message': 'Token is missing!'}), 401)
 
-        try:
-            data = jwt.decode(token, 'topsecret')
-            is_blacklisted_token = DisableTokens.check_blacklist(token)
-            if is_blacklisted_token:
-                return make_response(jsonify({'message': 'Logged out. log in again'}), 401)
-            else:
-                current_user = User.query.filter_by(username=data['username']).first()
-        except:
-            return make_response(jsonify({'message': 'Token is Invalid'}), 401)
+def has_admin_token():
+    """
+    :return: True if the request carries the configured admin token
+    """
+    admin_token = current_app.config.get('ADMIN_TOKEN')
+    if not admin_token:
+        return False
+    token = request.headers.get('x-admin-token', '')
+    return hmac.compare_digest(token.encode('utf-8'), admin_token.encode('utf-8'))
 
-        return f(current_user, *args, **kwargs)
+
+def admin_required(f):
+    """
+    Restrict a resource to operators holding the configured admin token
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if not current_app.config.get('ADMIN_TOKEN'):
+            abort(404)
+        if not has_admin_token():
+            return make_response(jsonify({'message': 'Admin token is missing or invalid'}), 403)
+        return f(*args, **kwargs)
     return decorated
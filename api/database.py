@@ -0,0 +1,216 @@
+# coding=utf-8
+import datetime
+import os
+import sqlite3
+import time
+
+from functools import wraps
+from flask import current_app, g, has_app_context, has_request_context
+from flask_sqlalchemy import SQLAlchemy as BaseSQLAlchemy, SignallingSession, get_state
+from sqlalchemy import event, orm
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+# tables spread over the SHARDS binds by user, the others stay in the default database
+SHARDED_TABLES = frozenset(['category', 'recipe', 'tag', 'recipe_tag', 'change'])
+
+
+class ShardNotSelected(RuntimeError):
+    """
+    Raised when sharded tables are used before a shard was picked for the request or command
+    """
+
+
+class TimedQueuePool(QueuePool):
+    """
+    Queue pool that keeps track of how long checkouts wait for a connection
+    """
+    def __init__(self, *args, **kwargs):
+        super(TimedQueuePool, self).__init__(*args, **kwargs)
+        self.checkouts = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+
+    def _do_get(self):
+        start = time.time()
+        try:
+            return super(TimedQueuePool, self)._do_get()
+        finally:
+            waited = time.time() - start
+            self.checkouts += 1
+            self.wait_time += waited
+            self.max_wait_time = max(self.max_wait_time, waited)
+
+
+class RoutingSession(SignallingSession):
+    """
+    Session sending the user data to the shard of the current user and the
+    reads of replica_read resources to the replica of their database: the
+    'replica' bind, or '<shard>_replica' for a shard
+    """
+    def get_bind(self, mapper=None, clause=None):
+        shard = None
+        if self.app.config.get('SHARDS') and uses_sharded_tables(mapper, clause):
+            shard = current_shard()
+            if shard is None:
+                raise ShardNotSelected('No shard was selected for {0}'.format(mapper or clause))
+        if not self._flushing and reading_from_replica():
+            replica = replica_bind(shard)
+            if replica in (self.app.config['SQLALCHEMY_BINDS'] or {}):
+                return get_state(self.app).db.get_engine(self.app, bind=replica)
+        if shard is not None:
+            return get_state(self.app).db.get_engine(self.app, bind=shard)
+        return super(RoutingSession, self).get_bind(mapper, clause)
+
+
+class SQLAlchemy(BaseSQLAlchemy):
+    """
+    Flask-SQLAlchemy extension with pool tuning, timeouts and replica routing read from config
+    """
+    def init_app(self, app):
+        app.config.setdefault('SQLALCHEMY_POOL_PRE_PING', True)
+        app.config.setdefault('SQLALCHEMY_CONNECT_TIMEOUT', None)
+        app.config.setdefault('SQLALCHEMY_STATEMENT_TIMEOUT', None)
+        app.config.setdefault('SQLALCHEMY_REPLICA_STICKY_SECONDS', 5)
+        super(SQLAlchemy, self).init_app(app)
+
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+    def apply_driver_hacks(self, app, info, options):
+        """
+        Add pre-ping, the timed queue pool and postgres timeouts to the engine options
+        """
+        if info.drivername == 'sqlite':
+            # sqlite gets a static or null pool, neither takes queue sizing
+            for option in ('pool_size', 'pool_timeout', 'max_overflow'):
+                options.pop(option, None)
+        else:
+            options['poolclass'] = TimedQueuePool
+        super(SQLAlchemy, self).apply_driver_hacks(app, info, options)
+        options['pool_pre_ping'] = app.config['SQLALCHEMY_POOL_PRE_PING']
+
+        if info.drivername.startswith('postgresql'):
+            connect_args = options.setdefault('connect_args', {})
+            connect_timeout = app.config['SQLALCHEMY_CONNECT_TIMEOUT']
+            if connect_timeout:
+                connect_args['connect_timeout'] = connect_timeout
+            statement_timeout = app.config['SQLALCHEMY_STATEMENT_TIMEOUT']
+            if statement_timeout:
+                connect_args['options'] = '-c statement_timeout={0}'.format(statement_timeout)
+
+
+@event.listens_for(Engine, 'connect')
+def enable_sqlite_foreign_keys(dbapi_connection, connection_record):
+    """
+    sqlite ignores foreign keys, and their ON DELETE CASCADE, unless asked per connection
+    """
+    if isinstance(dbapi_connection, sqlite3.Connection):
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def note_write(session, flush_context, instances):
+    if has_request_context() and g.get('current_user_id') is not None:
+        g.wrote = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def record_write(session):
+    """
+    Store in the user's row that the authenticated user of this request wrote to
+    the primary, once per request. It is committed before the response is sent, and
+    every worker reads it back with the user when authenticating, whichever served
+    the write.
+    """
+    if not has_request_context() or not g.get('wrote') or g.get('write_recorded'):
+        return
+    g.write_recorded = True
+    from api.models import User
+    users = User.__table__
+    get_state(session.app).db.engine.execute(users.update().where(users.c.id == g.current_user_id).values(
+        last_write_at=datetime.datetime.utcnow()))
+
+
+def uses_sharded_tables(mapper, clause):
+    """
+    :return: True if a mapper or statement reads or writes a sharded table
+    """
+    if mapper is not None:
+        tables = mapper.tables
+    elif getattr(clause, 'table', None) is not None:
+        tables = [clause.table]
+    else:
+        tables = getattr(clause, 'froms', ())
+    return any(getattr(table, 'name', None) in SHARDED_TABLES for table in tables)
+
+
+def replica_bind(shard):
+    """
+    :return: the name of the bind replicating a shard, or the default database when shard is None
+    """
+    return 'replica' if shard is None else '{0}_replica'.format(shard)
+
+
+def current_shard():
+    """
+    :return: the bind of the shard selected by authentication or api.sharding.using_shard
+    """
+    return g.get('shard') if has_app_context() else None
+
+
+def reading_from_replica():
+    """
+    :return: True if the current request reads from the replica
+    """
+    return has_request_context() and g.get('read_from_replica', False)
+
+
+def replica_read(f):
+    """
+    Serve the queries of a read-only resource from the replica, unless the
+    authenticated user wrote within the sticky window so they read their writes
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        sticky = datetime.timedelta(seconds=current_app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'])
+        last_write = g.get('last_write_at')
+        g.read_from_replica = last_write is None or datetime.datetime.utcnow() - last_write >= sticky
+        try:
+            return f(*args, **kwargs)
+        finally:
+            g.read_from_replica = False
+    return decorated
+
+
+def pool_status(engine):
+    """
+    :param engine: the engine whose pool to inspect
+    :return: a dict describing the connections held by this worker's pool
+    """
+    pool = engine.pool
+    status = {
+        'worker_pid': os.getpid(),
+        'pool_class': type(pool).__name__,
+    }
+    if isinstance(pool, QueuePool):
+        max_overflow = pool._max_overflow
+        status.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'idle': pool.checkedin(),
+            'overflow': max(pool.overflow(), 0),
+            'max_overflow': max_overflow,
+            # every worker may open this many connections against max_connections
+            'max_connections': pool.size() + max_overflow,
+        })
+    if isinstance(pool, TimedQueuePool):
+        status.update({
+            'checkouts': pool.checkouts,
+            'wait_time_total': round(pool.wait_time, 6),
+            'wait_time_max': round(pool.max_wait_time, 6),
+            'wait_time_avg': round(pool.wait_time / pool.checkouts, 6) if pool.checkouts else 0.0,
+        })
+    return status
@@ -0,0 +1,71 @@
+# coding=utf-8
+from flask import Blueprint
+from flask_restful import Api, Resource
+
+from api.models import db
+from api.database import pool_status
+from api.slow_queries import slow_statements
+
+from api import status
+from api.auth import admin_required
+from api.representations import add_representations
+
+api_bp = Blueprint('api/admin', __name__)
+api = Api(api_bp)
+add_representations(api)
+
+
+class PoolStatusResource(Resource):
+    """
+    Resource reporting the database connection pool of the serving worker
+    """
+    @admin_required
+    def get(self):
+        """
+        Get the connection pool statistics of the worker handling the request
+        ---
+        tags:
+          - admin
+        parameters:
+          - in: header
+            name: x-admin-token
+            required: true
+            description: The operator admin token
+            type: string
+        responses:
+          200:
+            description: Checked out, idle and overflow connections and checkout wait times
+          403:
+            description: Missing or invalid admin token
+        """
+        return pool_status(db.engine), status.HTTP_200_OK
+
+
+class SlowQueryResource(Resource):
+    """
+    Resource listing the slow statements seen by the serving worker
+    """
+    @admin_required
+    def get(self):
+        """
+        Get the statements slower than SLOW_QUERY_MS, grouped by shape, with their plans
+        ---
+        tags:
+          - admin
+        parameters:
+          - in: header
+            name: x-admin-token
+            required: true
+            description: The operator admin token
+            type: string
+        responses:
+          200:
+            description: Slow statement shapes with counts, durations, endpoints and plans
+          403:
+            description: Missing or invalid admin token
+        """
+        return {'statements': slow_statements()}, status.HTTP_200_OK
+
+
+api.add_resource(PoolStatusResource, '/pool')
+api.add_resource(SlowQueryResource, '/slow-queries')
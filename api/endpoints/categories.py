@@ -1,17 +1,42 @@
-from flask import Blueprint, request, jsonify, make_response, abort
+from flask import Blueprint, request, abort
 from flask_restful import Api, Resource
+from sqlalchemy.exc import IntegrityError
 
-from api.models import Category
+from api.models import Category, Recipe
 from api.serializers import CategorySchema
 
 from api import status
 from api.pagination import Pagination
 from api.auth import token_required
-from api.validate_json import validate_json
+from api.database import replica_read
+from api.validation import Validator, Field, excludes, min_length, validates
+from api.idempotency import idempotent
+from api.representations import add_representations
+from api.timing import timed
 
 api_bp = Blueprint('api/categories', __name__)
 category_schema = CategorySchema()
 api = Api(api_bp)
+add_representations(api)
+
+category_fields = {
+    'name': Field(not_blank=True, checks=[min_length(3),
+                                          excludes(r' {2}', "The parameter has more than one spaces in: {}")]),
+}
+new_category = Validator(category_fields, empty_message='No output data provided')
+edit_category = Validator(category_fields, partial=True)
+
+
+def prefetch_recipes(categories):
+    """
+    Load the recipes of a page of categories in a single query
+    """
+    recipes = {}
+    if categories:
+        category_ids = [category.id for category in categories]
+        for recipe in Recipe.query.filter(Recipe.category_id.in_(category_ids)).order_by(Recipe.title):
+            recipes.setdefault(recipe.category_id, []).append(recipe)
+    return CategorySchema(context={'recipes': recipes})
 
 
 class CategoryResource(Resource):
@@ -19,6 +44,7 @@ class CategoryResource(Resource):
     Object to define endpoint for the category resource
     """
     @token_required
+    @replica_read
     def get(current_user, self, id):
         """
         Get a category with the specified id
@@ -47,12 +73,13 @@ class CategoryResource(Resource):
         if not category:
             response = {"Error": "Category with id {0} not found".format(id)}
             return response, status.HTTP_404_NOT_FOUND
-        result = category_schema.dump(category).data
+        with timed('dump'):
+            result = category_schema.dump(category).data
         return result
 
-    @validate_json
     @token_required
-    def put(current_user, self, id):
+    @validates(edit_category, force=True)
+    def put(current_user, self, id, payload):
         """
                       Edit a category with the specified id
                       ---
@@ -91,21 +118,12 @@ class CategoryResource(Resource):
         category = Category.query.filter_by(id=id, user_id=current_user.id).first()
         if not category:
             return {"Error": "A category with that Id does not exist"}, 404
-        category_dict = request.get_json(force=True)
-        if 'name' in category_dict:
-            category_name = category_dict['name'].strip()
-            errors = category_schema.validate(category_dict)
-            if errors:
-                abort(status.HTTP_400_BAD_REQUEST, errors)
-            error, validated_name = Category.validate_data(ctx=category_name)
-            if validated_name:
-                if Category.is_unique(id=id, name=category_name, user_id=current_user.id):
-                    category.name = category_name
-                else:
-                    abort(status.HTTP_409_CONFLICT, 'A category with the same name already exists')
-            else:
-                return {"errors": error}
-        category.update()
+        if 'name' in payload:
+            category.name = payload['name']
+        try:
+            category.update()
+        except IntegrityError:
+            abort(status.HTTP_409_CONFLICT, 'A category with the same name already exists')
         return {'message': 'Category successfully edited!'}, 201
 
     @token_required
@@ -133,8 +151,7 @@ class CategoryResource(Resource):
             return {"error": "No category with that id {0} exists".format(id)}, 404
 
         category.delete(category)
-        response = make_response(jsonify({"message": "Successfully deleted"}), status.HTTP_200_OK)
-        return response
+        return {"message": "Successfully deleted"}, status.HTTP_200_OK
 
 
 class CategoryListResource(Resource):
@@ -142,6 +159,7 @@ class CategoryListResource(Resource):
     This class is used to create endpoints for a list of categories
     """
     @token_required
+    @replica_read
     def get(current_user, self):
         """
         Get a list of categories
@@ -181,7 +199,8 @@ class CategoryListResource(Resource):
             key_name='results',
             page=page,
             results_per_page=per_page,
-            schema=category_schema
+            schema=category_schema,
+            prefetch=prefetch_recipes
         )
         search = request.args.get('q')
 
@@ -195,11 +214,12 @@ class CategoryListResource(Resource):
                 key_name='results',
                 page=page,
                 results_per_page=per_page,
-                schema=category_schema
+                schema=category_schema,
+                prefetch=prefetch_recipes
             )
             results = categories.paginate_query()
             if len(results['results']) <= 0:
-                return jsonify({"error": "No category match found for search term"})
+                return {"error": "No category match found for search term"}
             return results, 200
 
         result = pagination_helper.paginate_query()
@@ -208,15 +228,21 @@ class CategoryListResource(Resource):
             return res, 400
         return result, status.HTTP_200_OK
 
-    @validate_json
     @token_required
-    def post(current_user, self):
+    @validates(new_category)
+    @idempotent
+    def post(current_user, self, payload):
         """
         Create a category
         ---
         tags:
           - categories
         parameters:
+          - in: header
+            name: Idempotency-Key
+            required: false
+            description: Client chosen key, a retry with the same key gets the first response back
+            type: string
           - in: body
             name: category
             required: true
@@ -240,24 +266,13 @@ class CategoryListResource(Resource):
                   type: string
                   default: soup
         """
-        request_dict = request.get_json()
-        if not request_dict:
-            return {'message': 'No output data provided'}, 400
-        errors = category_schema.validate(request_dict)
-        if errors:
-            return {'message': errors}, 400
-
-        category_name = request_dict['name'].strip()
-        if not Category.is_unique(id=0, name=category_name, user_id=current_user.id):
-            return {'message': 'A category with the same name already exists'}, 400
-        error, validated_name = Category.validate_data(ctx=category_name)
-        if validated_name:
-            category = Category(category_name, user_id=current_user.id)
+        category = Category(payload['name'], user_id=current_user.id)
+        try:
             category.add(category)
-            result = {'message': 'Category successfully added!'}
-            return result, status.HTTP_201_CREATED
-        else:
-            return {'message': error}, 400
+        except IntegrityError:
+            return {'message': 'A category with the same name already exists'}, status.HTTP_409_CONFLICT
+        result = {'message': 'Category successfully added!'}
+        return result, status.HTTP_201_CREATED
 
 
 api.add_resource(CategoryListResource, '/')
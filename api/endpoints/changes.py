@@ -0,0 +1,214 @@
+# coding=utf-8
+import base64
+import binascii
+import datetime
+import json
+import time
+
+from collections import OrderedDict
+from flask import Blueprint, Response, request, current_app, stream_with_context
+from flask_restful import Api, Resource
+
+from api.models import db, Category, Recipe, Change
+from api.serializers import CategorySchema, RecipeSchema
+
+from api import status
+from api.auth import authenticate, token_required
+from api.database import replica_read
+from api.notifications import get_broker
+from api.representations import add_representations
+from api.timing import timed
+
+api_bp = Blueprint('api/changes', __name__)
+api = Api(api_bp)
+add_representations(api)
+
+SCHEMAS = {
+    'category': CategorySchema(exclude=('recipes',)),
+    'recipe': RecipeSchema(exclude=('category',)),
+}
+MODELS = {'category': Category, 'recipe': Recipe}
+
+
+class InvalidSyncToken(ValueError):
+    """
+    Raised for sync tokens that were tampered with
+    """
+
+
+def encode_sync_token(sequence, issued=None):
+    """
+    :return: an opaque token for the changes after `sequence`, stamped with the time it was issued
+    """
+    issued = issued or datetime.datetime.utcnow()
+    # microseconds, shard_moved_at is compared with it at that resolution
+    elapsed = issued - datetime.datetime(1970, 1, 1)
+    value = '{0}:{1}.{2:06d}'.format(sequence, elapsed.days * 86400 + elapsed.seconds, elapsed.microseconds)
+    return base64.urlsafe_b64encode(value.encode('ascii')).decode('ascii')
+
+
+def decode_sync_token(token):
+    """
+    :return: the sequence a token points at and the time it was issued
+    """
+    try:
+        sequence, issued = base64.urlsafe_b64decode(token.encode('ascii')).decode('ascii').split(':')
+        # tokens issued before microseconds were added carry whole seconds
+        seconds, _, microseconds = issued.partition('.')
+        if microseconds and len(microseconds) != 6:
+            raise ValueError(issued)
+        return int(sequence), datetime.datetime(1970, 1, 1) + datetime.timedelta(
+            seconds=int(seconds), microseconds=int(microseconds or 0))
+    except (ValueError, UnicodeError, binascii.Error):
+        raise InvalidSyncToken(token)
+
+
+def load_entities(changes):
+    """
+    Load the current state of the changed objects, one query per kind of object
+    """
+    ids = {}
+    for change in changes:
+        if change.action == 'upsert':
+            ids.setdefault(change.entity, set()).add(change.entity_id)
+    entities = {}
+    for entity, entity_ids in ids.items():
+        model = MODELS[entity]
+        for obj in model.query.filter(model.id.in_(entity_ids)):
+            entities[(entity, obj.id)] = obj
+    return entities
+
+
+class ChangeListResource(Resource):
+    """
+    Resource for syncing the categories and recipes changed since a sync token
+    """
+    @token_required
+    @replica_read
+    def get(current_user, self):
+        """
+        Get the categories and recipes created, updated or deleted since a sync token
+        ---
+        tags:
+          - sync
+        parameters:
+          - in: query
+            name: since
+            type: string
+            required: false
+            description: The `next` token of the previous sync, leave out for the first sync
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            description: Most changes to return, at most 500
+        security:
+          - TokenHeader: []
+        responses:
+          200:
+            description: The changes in the order they happened, the next sync token and whether more are waiting
+          400:
+            description: Invalid sync token
+          410:
+            description: The token is older than the retained changes, sync everything again
+        """
+        limit = request.args.get('limit', current_app.config['CHANGES_PAGE_SIZE'], type=int)
+        limit = min(max(limit, 1), current_app.config['CHANGES_MAX_PAGE_SIZE'])
+        since = 0
+        if request.args.get('since'):
+            try:
+                since, issued = decode_sync_token(request.args['since'])
+            except InvalidSyncToken:
+                return {'message': 'Invalid sync token'}, status.HTTP_400_BAD_REQUEST
+            retention = datetime.timedelta(days=current_app.config['CHANGES_RETENTION_DAYS'])
+            if issued < datetime.datetime.utcnow() - retention:
+                return {'message': 'The sync token expired, sync everything again'}, status.HTTP_410_GONE
+            if current_user.shard_moved_at and issued < current_user.shard_moved_at:
+                # the change log was renumbered when the user moved to another shard
+                return {'message': 'The sync token expired, sync everything again'}, status.HTTP_410_GONE
+
+        with timed('query'):
+            changes = Change.query.filter(Change.user_id == current_user.id, Change.id > since)\
+                .order_by(Change.id).limit(limit + 1).all()
+            has_more = len(changes) > limit
+            changes = changes[:limit]
+            entities = load_entities(changes)
+
+        # only the last change of an object in the batch matters
+        latest = OrderedDict()
+        for change in changes:
+            latest.pop((change.entity, change.entity_id), None)
+            latest[(change.entity, change.entity_id)] = change
+        results = []
+        with timed('dump'):
+            for (entity, entity_id), change in latest.items():
+                obj = entities.get((entity, entity_id))
+                if change.action == 'delete' or obj is None:
+                    results.append({'type': entity, 'id': entity_id, 'action': 'delete'})
+                else:
+                    results.append({'type': entity, 'id': entity_id, 'action': 'upsert',
+                                    'data': SCHEMAS[entity].dump(obj).data})
+        sequence = changes[-1].id if changes else since
+        return {'changes': results, 'next': encode_sync_token(sequence), 'has_more': has_more}, status.HTTP_200_OK
+
+
+def event_stream(subscription, heartbeat, lifetime):
+    """
+    Server-Sent Events for a subscription, a comment every `heartbeat` seconds
+    keeps proxies from closing an idle stream
+    """
+    deadline = time.time() + lifetime
+    try:
+        # reconnect after 5 seconds when the stream drops
+        yield 'retry: 5000\n\n'
+        while time.time() < deadline:
+            message = subscription.get(timeout=min(heartbeat, max(deadline - time.time(), 0)))
+            if message is None:
+                yield ': heartbeat\n\n'
+            elif message.get('resync'):
+                yield 'event: resync\ndata: {}\n\n'
+            else:
+                yield 'event: change\ndata: {0}\n\n'.format(json.dumps(message))
+    finally:
+        subscription.close()
+
+
+class ChangeStreamResource(Resource):
+    """
+    Resource pushing change notifications to the logged in user as Server-Sent Events
+    """
+    def get(self):
+        """
+        Stream a notification whenever the user's categories or recipes change
+        Browsers' EventSource can not send headers, so the token may also be passed as the token query argument.
+        A `change` event lists the changed objects, a `resync` event means notifications were dropped
+        because the client fell behind; fetch /api/changes with the last sync token in both cases.
+        ---
+        tags:
+          - sync
+        parameters:
+          - in: query
+            name: token
+            type: string
+            required: false
+            description: The access token, when it can not be sent in the x-access-token header
+        responses:
+          200:
+            description: A text/event-stream of change notifications
+          401:
+            description: Missing or invalid token
+        """
+        current_user, error = authenticate(request.headers.get('x-access-token') or request.args.get('token'))
+        if error is not None:
+            return error
+        subscription = get_broker().subscribe(current_user.id)
+        # a stream may stay open for minutes, it must not hold a pooled connection meanwhile
+        db.session.remove()
+        config = current_app.config
+        stream = event_stream(subscription, config['NOTIFICATIONS_HEARTBEAT'], config['NOTIFICATIONS_STREAM_SECONDS'])
+        return Response(stream_with_context(stream), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+api.add_resource(ChangeListResource, '')
+api.add_resource(ChangeStreamResource, '/stream')
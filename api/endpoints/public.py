@@ -0,0 +1,216 @@
+# coding=utf-8
+from flask import Blueprint, request, current_app, url_for
+from flask_restful import Api, Resource
+from sqlalchemy.orm import defer
+
+from api.models import User, Recipe, TrendingRecipe
+from api.serializers import PublicRecipeSchema
+
+from api import status
+from api.database import replica_read
+from api.sharding import each_shard, using_shard
+from api.representations import add_representations
+from api.timing import timed
+from api.trending import record_view
+
+api_bp = Blueprint('api/public', __name__)
+api = Api(api_bp)
+add_representations(api)
+
+
+@api_bp.after_request
+def cache_publicly(response):
+    """
+    Let browsers and reverse proxies keep the shared recipes, and revalidate them with the ETag
+    """
+    if request.method in ('GET', 'HEAD') and response.status_code == status.HTTP_200_OK:
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['PUBLIC_CACHE_MAX_AGE']
+        # serve the stale copy while one request refreshes it in the background
+        response.cache_control['stale-while-revalidate'] = current_app.config['PUBLIC_CACHE_STALE_SECONDS']
+        # json and msgpack bodies of the same url are cached apart
+        response.vary.add('Accept')
+        response.add_etag()
+        response.make_conditional(request)
+    return response
+
+
+def page_limit():
+    limit = request.args.get('limit', current_app.config['PUBLIC_PAGE_SIZE'], type=int)
+    return min(max(limit, 1), current_app.config['PUBLIC_MAX_PAGE_SIZE'])
+
+
+def deleted_authors():
+    """
+    :return: the ids of the accounts deleted and waiting for purge_accounts, their recipes are no longer shared
+    """
+    # the users live in the directory, apart from the recipes when sharded, and few wait for the purge
+    return [user_id for user_id, in User.query.with_entities(User.id).filter(User.disabled_at.isnot(None))]
+
+
+def shared_recipes(deleted):
+    """
+    :param deleted: the ids deleted_authors returned
+    :return: a query of the shared recipes of the accounts still open
+    """
+    query = Recipe.query.filter(Recipe.public)
+    if deleted:
+        query = query.filter(Recipe.user_id.notin_(deleted))
+    return query
+
+
+def dump_recipes(recipes, many=True):
+    """
+    Dump shared recipes with their authors' names, loaded in one query
+    """
+    with timed('query'):
+        user_ids = set(recipe.user_id for recipe in (recipes if many else [recipes]))
+        authors = dict(User.query.with_entities(User.id, User.username).filter(User.id.in_(user_ids))) \
+            if user_ids else {}
+    schema = PublicRecipeSchema(exclude=('body',) if many else (), context={'authors': authors})
+    with timed('dump'):
+        return schema.dump(recipes, many=many).data
+
+
+class PublicRecipeListResource(Resource):
+    """
+    Resource listing the recipes users shared, newest first
+    """
+    @replica_read
+    def get(self):
+        """
+        Get a page of the shared recipes, newest first
+        ---
+        tags:
+          - public
+        parameters:
+          - in: query
+            name: cursor
+            type: integer
+            required: false
+            description: The cursor in the `next` link of the previous page, leave out for the first page
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            description: Most recipes to return, at most 100
+        responses:
+          200:
+            description: The shared recipes with snippets of their bodies and the link to the next page
+        """
+        limit = page_limit()
+        cursor = request.args.get('cursor', type=int)
+
+        recipes = []
+        with timed('query'):
+            deleted = deleted_authors()
+            # the newest page of every shard, their ids are unique across shards
+            for _ in each_shard():
+                query = shared_recipes(deleted).options(defer(Recipe.body))
+                if cursor is not None:
+                    query = query.filter(Recipe.id < cursor)
+                # one extra row tells whether there is a next page, without counting the feed
+                recipes.extend(query.order_by(Recipe.id.desc()).limit(limit + 1))
+        recipes.sort(key=lambda recipe: recipe.id, reverse=True)
+        next_url = None
+        if len(recipes) > limit:
+            recipes = recipes[:limit]
+            next_url = url_for('api/public.publicrecipelistresource', cursor=recipes[-1].id, limit=limit,
+                               _external=True)
+        return {'results': dump_recipes(recipes), 'next': next_url}, status.HTTP_200_OK
+
+
+class PublicRecipeResource(Resource):
+    """
+    Resource for a shared recipe
+    """
+    @replica_read
+    def get(self, id):
+        """
+        Get a shared recipe, counting the view for the trending feed
+        ---
+        tags:
+          - public
+        parameters:
+          - in: path
+            name: id
+            required: true
+            description: The ID of the recipe
+            type: integer
+        responses:
+          200:
+            description: The recipe and its author
+          404:
+            description: No shared recipe has this id
+        """
+        with timed('query'):
+            deleted = deleted_authors()
+            for _ in each_shard():
+                recipe = shared_recipes(deleted).filter(Recipe.id == id).first()
+                if recipe is not None:
+                    break
+        if recipe is None:
+            return {"error": "A shared recipe with the id of {0} does not exist".format(id)}, \
+                status.HTTP_404_NOT_FOUND
+        record_view(recipe.id, recipe.user_id)
+        return dump_recipes(recipe, many=False), status.HTTP_200_OK
+
+
+class TrendingRecipeListResource(Resource):
+    """
+    Resource listing the most viewed recent shared recipes
+    """
+    @replica_read
+    def get(self):
+        """
+        Get a page of the trending shared recipes, as ranked by the last refresh_trending run
+        ---
+        tags:
+          - public
+        parameters:
+          - in: query
+            name: cursor
+            type: integer
+            required: false
+            description: The cursor in the `next` link of the previous page, leave out for the first page
+          - in: query
+            name: limit
+            type: integer
+            required: false
+            description: Most recipes to return, at most 100
+        responses:
+          200:
+            description: The trending recipes with their rank and the link to the next page
+        """
+        limit = page_limit()
+        cursor = request.args.get('cursor', 0, type=int)
+
+        with timed('query'):
+            # a page of the rank primary key, then its recipes from their shards
+            ranked = TrendingRecipe.query.filter(TrendingRecipe.rank > cursor).order_by(TrendingRecipe.rank)\
+                .limit(limit + 1).all()
+            recipe_ids = {}
+            for row in ranked:
+                recipe_ids.setdefault(row.shard, []).append(row.recipe_id)
+            recipes = {}
+            deleted = deleted_authors() if recipe_ids else []
+            for shard, ids in recipe_ids.items():
+                with using_shard(shard):
+                    recipes.update((recipe.id, recipe) for recipe in shared_recipes(deleted).options(defer(Recipe.body))
+                                   .filter(Recipe.id.in_(ids)))
+        next_url = None
+        if len(ranked) > limit:
+            ranked = ranked[:limit]
+            next_url = url_for('api/public.trendingrecipelistresource', cursor=ranked[-1].rank, limit=limit,
+                               _external=True)
+        # recipes unshared or deleted, or whose author deleted the account, since the ranking was built are left out
+        ranked = [row for row in ranked if row.recipe_id in recipes]
+        results = dump_recipes([recipes[row.recipe_id] for row in ranked])
+        for row, result in zip(ranked, results):
+            result['rank'] = row.rank
+        return {'results': results, 'next': next_url}, status.HTTP_200_OK
+
+
+api.add_resource(PublicRecipeListResource, '/recipes')
+api.add_resource(TrendingRecipeListResource, '/recipes/trending')
+api.add_resource(PublicRecipeResource, '/recipes/<int:id>')
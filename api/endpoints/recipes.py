@@ -1,18 +1,105 @@
 # coding=utf-8
-from flask import Blueprint, request, jsonify, make_response, abort
+from flask import Blueprint, request, abort
 from flask_restful import Api, Resource
+from sqlalchemy import and_, func, intersect, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import defer, joinedload
 
-from api.models import db, Category,Recipe
+from api.models import db, Category,Recipe, Tag, recipe_tag, unique_violation
 from api.serializers import RecipeSchema
 
 from api import status
 from api.pagination import Pagination
 from api.auth import token_required
-from api.validate_json import validate_json
+from api.database import replica_read
+from api.validation import Validator, Field, excludes, min_length, validates
+from api.idempotency import idempotent
+from api.representations import add_representations
+from api.timing import timed
 
 api_bp = Blueprint('api', __name__)
 recipe_schema = RecipeSchema()
+# list views show the snippet, the body is only sent when asked for
+recipe_list_schema = RecipeSchema(exclude=('body',))
 api = Api(api_bp)
+add_representations(api)
+
+# most tags a recipe may have
+MAX_TAGS = 10
+# the unique indexes a recipe save may hit, named as postgres and sqlite report them
+TITLE_INDEX = ('ix_recipe_user_id_lower_title',)
+TAG_INDEX = ('ix_tag_user_id_name', 'tag.user_id, tag.name')
+
+
+def save_conflict(error, retry):
+    """
+    Answer a recipe save a unique index rejected: 409 when the user has a recipe with the
+    title. A tag another request created after Tag.for_names looked for it is found by
+    saving again, when a retry is left; any other error is raised.
+    """
+    if unique_violation(error, *TITLE_INDEX):
+        abort(status.HTTP_409_CONFLICT, 'A recipe with the same title already exists')
+    if not (retry and unique_violation(error, *TAG_INDEX)):
+        raise error
+
+
+def parse_tags(names):
+    """
+    :param names: a list of tag names
+    :return: the names lower cased without duplicates, and an error message if one is invalid
+    """
+    if not isinstance(names, list) or not all(isinstance(name, str) for name in names):
+        return None, "The parameter tags must be a list of names"
+    tags = []
+    for name in names:
+        name = name.strip().lower()
+        if not name or len(name) > 50 or ',' in name:
+            return None, "Tag names must be 1 to 50 characters without commas: {0}".format(name)
+        if name not in tags:
+            tags.append(name)
+    if len(tags) > MAX_TAGS:
+        return None, "A recipe can have at most {0} tags".format(MAX_TAGS)
+    return tags, ""
+
+
+no_double_spaces = excludes(r' {2}', "The parameter category has more than one spaces in: {}")
+recipe_fields = {
+    'title': Field(not_blank=True, checks=[no_double_spaces]),
+    'body': Field(not_blank=True, checks=[min_length(3), no_double_spaces]),
+    'public': Field(bool, required=False, default=False, type_error="The parameter public must be true or false"),
+    'tags': Field(list, required=False, parse=parse_tags, default=list,
+                  type_error="The parameter tags must be a list of names"),
+}
+new_recipe = Validator(recipe_fields, empty_message="All fields are required")
+edit_recipe = Validator(recipe_fields, partial=True)
+
+
+def tagged_recipe_ids(user_id, names):
+    """
+    :return: a select of the ids of the user's recipes carrying every tag in names,
+        each tag read from the (user_id, name) and (tag_id, recipe_id) indexes and the results intersected
+    """
+    tags = Tag.__table__
+    selects = [select([recipe_tag.c.recipe_id]).select_from(recipe_tag.join(tags, tags.c.id == recipe_tag.c.tag_id))
+               .where((tags.c.user_id == user_id) & (tags.c.name == name)) for name in names]
+    return selects[0] if len(selects) == 1 else intersect(*selects)
+
+
+def recipe_filters(user_id, category_id):
+    """
+    :return: the conditions selecting the recipes of a category matching the q and tags arguments,
+        and an error message if tags is invalid
+    """
+    filters = [Recipe.user_id == user_id, Recipe.category_id == category_id]
+    search = request.args.get('q')
+    if search:
+        filters.append((Recipe.title.ilike("%" + search + "%")) | (Recipe.body.contains(search.title())))
+    if request.args.get('tags'):
+        tags, error = parse_tags(request.args['tags'].split(','))
+        if error:
+            return None, error
+        filters.append(Recipe.id.in_(tagged_recipe_ids(user_id, tags)))
+    return filters, ""
 
 
 class RecipeResource(Resource):
@@ -20,6 +107,7 @@ class RecipeResource(Resource):
     Resource for the recipe endpoints
     """
     @token_required
+    @replica_read
     def get(current_user, self, id):
         """
         Get a recipe with the specified id
@@ -49,15 +137,16 @@ class RecipeResource(Resource):
         """
 
         recipe = Recipe.query.filter_by(id=id, user_id=current_user.id).first()
-        result = recipe_schema.dump(recipe).data
+        with timed('dump'):
+            result = recipe_schema.dump(recipe).data
         if len(result) <= 0:
             response = {"Error": "A recipe with Id {0} does not exist".format(id)}
             return response, status.HTTP_404_NOT_FOUND
         return result
 
-    @validate_json
     @token_required
-    def put(current_user, self, id):
+    @validates(edit_recipe, force=True)
+    def put(current_user, self, id, payload):
         """
                       Edit and update a recipe with the specified id
                       ---
@@ -83,6 +172,13 @@ class RecipeResource(Resource):
                                 body:
                                     type: string
                                     default: Pour, mix, cook
+                                public:
+                                    type: boolean
+                                    default: false
+                                tags:
+                                    type: array
+                                    items:
+                                        type: string
                       security:
                          - TokenHeader: []
                       responses:
@@ -102,30 +198,21 @@ class RecipeResource(Resource):
         recipe = Recipe.query.filter_by(id=id, user_id=current_user.id).first()
         if not recipe:
             return {"Error": "A recipe with that Id does not exist"}, 404
-        recipe_dict = request.get_json(force=True)
-        if 'title' in recipe_dict:
-            recipe_title = recipe_dict['title'].strip()
-            error, validate_title = recipe.validate_recipe(ctx=recipe_title)
-            if validate_title:
-                if Recipe.is_unique(id=id, title=recipe_title, user_id=current_user.id):
-                    recipe.title = recipe_title
-                else:
-                    abort(status.HTTP_409_CONFLICT, 'A recipe with the same title already exists')
-            else:
-                abort(400, {"error": error})
-        if 'body' in recipe_dict:
-            recipe_body = recipe_dict['body'].strip()
-            body_errors, validate_body = recipe.validate_recipe(ctx=recipe_body)
-            if validate_body:
-                recipe.body = recipe_body
-            else:
-                abort(400, body_errors)
-
-        dumped_recipe, dumped_errors = recipe_schema.dump(recipe)
-        if dumped_errors:
-            abort(status.HTTP_400_BAD_REQUEST, dumped_errors)
-
-        recipe.update()
+        # a failed save rolls the changes back, a retry applies them again
+        for retry in (True, False):
+            if 'title' in payload:
+                recipe.title = payload['title']
+            if 'body' in payload:
+                recipe.body = payload['body']
+            if 'public' in payload:
+                recipe.public = payload['public']
+            if 'tags' in payload:
+                recipe.tags = Tag.for_names(current_user.id, payload['tags'])
+            try:
+                recipe.update()
+                break
+            except IntegrityError as error:
+                save_conflict(error, retry)
         return {"message": "Recipe successfully edited"}, 200
 
     @token_required
@@ -154,8 +241,7 @@ class RecipeResource(Resource):
             return res, status.HTTP_404_NOT_FOUND
 
         recipe.delete(recipe)
-        response = make_response(jsonify({"Message": "Recipe deleted"}), status.HTTP_200_OK)
-        return response
+        return {"Message": "Recipe deleted"}, status.HTTP_200_OK
 
 
 class RecipeListResource(Resource):
@@ -163,6 +249,7 @@ class RecipeListResource(Resource):
     This class describes the object to retrieve a collection of recipes
     """
     @token_required
+    @replica_read
     def get(current_user, self, category_id):
         """
         Get a list of recipes
@@ -182,6 +269,12 @@ class RecipeListResource(Resource):
           - in: query
             name: page
             description: The page to display
+          - in: query
+            name: tags
+            description: Comma separated tags, only recipes with all of them are listed
+          - in: query
+            name: full
+            description: Set to true to get the whole body of every recipe instead of its snippet
           - in: path
             name: category_id
             description: Category Id
@@ -194,60 +287,55 @@ class RecipeListResource(Resource):
                 title:
                   type: json
                   default: Meat Soup
-                body:
+                snippet:
                   type: json
                   default: Prepare it
         """
 
         per_page = request.args.get('limit', default=9, type=int)
         page = request.args.get('page', default=1, type=int)
-        category = Category.query.filter_by(id=category_id).first()
+        options, schema = [joinedload(Recipe.category)], recipe_schema
+        if request.args.get('full', '').lower() not in ('1', 'true'):
+            # the body is the largest column, leave it out of the page query
+            options.append(defer(Recipe.body))
+            schema = recipe_list_schema
+
+        filters, error = recipe_filters(current_user.id, category_id)
+        if error:
+            abort(status.HTTP_400_BAD_REQUEST, error)
 
         pagination_helper = Pagination(
             request,
-            query=Recipe.query.filter_by(category_id=category_id, user_id=current_user.id).order_by("id desc"),
+            query=Recipe.query.options(*options).filter(*filters).order_by(Recipe.id.desc()),
             resource_for_url='api.recipelistresource',
             results_per_page=per_page,
             page=page,
             key_name='results',
-            schema=recipe_schema
+            schema=schema
         )
-        search = request.args.get('q')
-
-        if search:
-            recipes = Pagination(
-                request,
-                query=Recipe.query.filter(
-                    Recipe.user_id == current_user.id,
-                    Recipe.category_id == category_id,
-                    (Recipe.title.ilike("%" + search + "%")) |
-                    (Recipe.body.contains(search.title()))),
-                resource_for_url='api.recipelistresource',
-                key_name='results',
-                page=page,
-                results_per_page=per_page,
-                schema=recipe_schema
-            )
-            results = recipes.paginate_query()
-            if len(results['results']) <= 0:
-                response = {"error": "No recipe found for that search."}
-                return response, 404
-            return results, status.HTTP_200_OK
         result = pagination_helper.paginate_query()
         if len(result['results']) <= 0:
+            if request.args.get('q'):
+                return {"error": "No recipe found for that search."}, 404
             response = {"error": "No recipes."}
             return response, 404
         return result, status.HTTP_200_OK
 
-    @validate_json
     @token_required
-    def post(current_user, self, category_id):
+    @validates(new_recipe)
+    @idempotent
+    def post(current_user, self, category_id, payload):
         """
         Create a recipe
         ---
         tags:
           - recipes
         parameters:
+          - in: header
+            name: Idempotency-Key
+            required: false
+            description: Client chosen key, a retry with the same key gets the first response back
+            type: string
           - in: path
             name: category_id
             required: true
@@ -267,6 +355,13 @@ class RecipeListResource(Resource):
                 body:
                   type: string
                   default: This is the process of making meat soup
+                public:
+                  type: boolean
+                  default: false
+                tags:
+                  type: array
+                  items:
+                    type: string
         security:
            - TokenHeader: []
         responses:
@@ -283,37 +378,66 @@ class RecipeListResource(Resource):
                   default: This is the process of making meat soup
         """
 
-        request_dict = request.get_json()
-
-        if not request_dict:
-            abort(status.HTTP_400_BAD_REQUEST, "All fields are required")
-        errors = recipe_schema.validate(request_dict)
-        if errors:
-            abort(status.HTTP_400_BAD_REQUEST, errors)
-        recipe_title = request_dict['title'].title()
-        recipe_body = request_dict['body'].strip()
-        if not Recipe.is_unique(id=0, title=recipe_title, user_id=current_user.id):
-            abort(status.HTTP_409_CONFLICT, 'A recipe with the same title already exists')
-        error, validated_title = Recipe.validate_recipe(ctx=recipe_title)
-        if not validated_title:
-            abort(400, error)
-        error_body, validated_body = Recipe.validate_recipe(ctx=recipe_body)
-        if not validated_body:
-            abort(400, error_body)
         category = Category.query.filter_by(id=category_id, user_id=current_user.id).first()
         if category:
-            recipe = Recipe(
-                title=recipe_title,
-                body=recipe_body,
-                category_id=category.id,
-                user=current_user
-            )
-            recipe.add(recipe)
-            response = "Recipe uccessfully added!"
-            return make_response(jsonify(response), status.HTTP_201_CREATED)
+            for retry in (True, False):
+                recipe = Recipe(
+                    title=payload['title'].title(),
+                    body=payload['body'],
+                    category_id=category.id,
+                    user=current_user,
+                    public=payload['public']
+                )
+                recipe.tags = Tag.for_names(current_user.id, payload['tags'])
+                try:
+                    recipe.add(recipe)
+                    break
+                except IntegrityError as error:
+                    save_conflict(error, retry)
+            return "Recipe uccessfully added!", status.HTTP_201_CREATED
         else:
             abort(400, "A category with Id {0} does not exist".format(category_id))
 
 
+class RecipeTagCountResource(Resource):
+    """
+    Resource counting the tags of the recipes a listing would return
+    """
+    @token_required
+    @replica_read
+    def get(current_user, self, category_id):
+        """
+        Count the recipes carrying each tag among the recipes matching the filters
+        ---
+        tags:
+          - recipes
+        security:
+           - TokenHeader: []
+        parameters:
+          - in: path
+            name: category_id
+            description: Category Id
+          - in: query
+            name: q
+            description: Search parameter q
+          - in: query
+            name: tags
+            description: Comma separated tags the counted recipes must all have
+        responses:
+          200:
+            description: The tags of the matching recipes with their number of recipes, most used first
+        """
+        filters, error = recipe_filters(current_user.id, category_id)
+        if error:
+            abort(status.HTTP_400_BAD_REQUEST, error)
+        count = func.count(recipe_tag.c.recipe_id)
+        with timed('query'):
+            counts = db.session.query(Tag.name, count).join(recipe_tag, recipe_tag.c.tag_id == Tag.id).filter(
+                recipe_tag.c.recipe_id.in_(select([Recipe.id]).where(and_(*filters)))).group_by(Tag.name)\
+                .order_by(count.desc(), Tag.name).all()
+        return {'tags': [{'name': name, 'count': number} for name, number in counts]}, status.HTTP_200_OK
+
+
 api.add_resource(RecipeListResource, '/category/<int:category_id>/recipes/')
+api.add_resource(RecipeTagCountResource, '/category/<int:category_id>/recipes/tags')
 api.add_resource(RecipeResource, '/recipes/<int:id>')
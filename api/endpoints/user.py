@@ -1,57 +1,72 @@
 import datetime
 import jwt
-import re
-import os
 import random
 import string
 
-from flask import Blueprint, request, jsonify, make_response, abort, Flask
+from flask import Blueprint, request, abort
 from flask_restful import Api, Resource
 from flask_mail import Message, Mail
+from sqlalchemy.exc import IntegrityError
 from passlib.apps import custom_app_context as password_context
 
 
-from api.models import db, User, DisableTokens
-from api.serializers import UserSchema
+from api.models import db, User, DisableTokens, unique_violation
 
 from api import status
-from api.auth import token_required
-from api.validate_json import validate_json
+from api.auth import token_required, TOKEN_LIFETIME
+from api.validation import Validator, Field, excludes, matches, min_length, max_length, validates
+from api.idempotency import idempotent
+from api.representations import add_representations
 
 
-app = Flask(__name__)
-
 api_bp = Blueprint('api/auth', __name__)
 
-app_context = app.app_context()
-app_context.push()
-
-user_schema = UserSchema()
 api = Api(api_bp)
-
-app.config.update(
-    DEBUG=True,
-    MAIL_SERVER=os.getenv("MAIL_SERVER"),
-    MAIL_PORT=465,
-    MAIL_USE_SSL=True,
-    MAIL_USERNAME=os.getenv("MAIL_USERNAME"),
-    MAIL_PASSWORD=os.getenv("MAIL_PASSWORD")
-)
-mail = Mail(app)
+add_representations(api)
+
+mail = Mail()
+
+password_field = Field(strip=False, checks=[
+    min_length(8, "The password is too short"),
+    max_length(32, "The password is too long"),
+    matches(r'[A-Z]', "The password must include at least one uppercase letter"),
+    matches(r'[a-z]', 'The password must include at least one lowercase letter'),
+    matches(r'\d', "The password must include at least one number"),
+    matches(r"[@!#$%&'()*+,-./[\\\]^_`{|}~"+r'"]', "The password must include at least one symbol"),
+    excludes(r' ', "The parameter password has spaces in: {}"),
+])
+new_user = Validator({
+    'username': Field(strip=False, checks=[min_length(3), matches(
+        r'^[A-Za-z]+$', "Non-alphabetic characters for username are not allowed")]),
+    'password': password_field,
+    'email': Field(strip=False, checks=[matches(r"(^\w+@[a-zA-Z0-9_]+?\.[a-zA-Z0-9]{3,3}$)", "Invalid email")]),
+}, empty_message={'error': 'No input data provided'})
+credentials = Validator({
+    'username': Field(strip=False, checks=[min_length(1)]),
+    'password': Field(strip=False, checks=[min_length(1)]),
+}, empty_message='All fields are required')
+password_reset = Validator({'email': Field(strip=False)})
+password_change = Validator({'new_password': password_field})
 
 
 class RegisterUser(Resource):
     """"
     Class to register a new user
     """
-    @validate_json
-    def post(self):
+    @validates(new_user)
+    @idempotent
+    def post(self, payload):
         """
          Register a user
         ---
         tags:
           - auth
         parameters:
+          - in: header
+            name: Idempotency-Key
+            required: false
+            description: Client chosen key, a retry with the same key gets the first response back
+            type: string
           - in: body
             name: body
             required: true
@@ -84,51 +99,25 @@ class RegisterUser(Resource):
                   type: string
                   default: samoeikev@gmail.com
         """
-        request_dict = request.get_json()
-        if not request_dict:
-            response = {'error': 'No input data provided'}
-            abort(status.HTTP_400_BAD_REQUEST, response)
-        errors = user_schema.validate(request_dict)
-        if errors:
-            abort(status.HTTP_400_BAD_REQUEST, errors)
+        user = User(username=payload['username'].lower(), email=payload['email'])
+        user.hash_password(payload['password'])
         try:
-            username = request_dict['username'].lower()
-            if re.match(r'[A-Za-z]+$', username) is None:
-                return {"error": "Non-alphabetic characters for username are not allowed"}, 400
-            password = request_dict['password']
-            email = request_dict['email']
-        except KeyError as error:
-            res = {"error": str(error)}
-            abort(400, res)
-        existing_email = User.query.filter_by(email=email).first()
-        if existing_email:
-            abort(409, {"error": "A user with the same email already exists"})
-        if not User.is_unique(username=username):
+            user.add(user)
+        except IntegrityError as error:
+            if unique_violation(error, 'ix_user_lower_email', 'user.email', 'user_email_key'):
+                abort(409, {"error": "A user with the same email already exists"})
             response = {"error": "A user with the same name already exists"}
             abort(status.HTTP_409_CONFLICT, response)
-        error, validated_name = User.validate_data(ctx=username)
-        if validated_name:
-            user = User(username=username, email=email)
-            error_message, password_ok = \
-                user.check_password_strength_and_hash_if_ok(password)
-            if password_ok:
-                user.add(user)
-                result = {"message": "User successfully registered"}
-                return result, status.HTTP_201_CREATED
-            else:
-                res = {'error': error_message}
-                abort(status.HTTP_400_BAD_REQUEST, res)
-        else:
-            response = {"error": error}
-            abort(response, 400)
+        result = {"message": "User successfully registered"}
+        return result, status.HTTP_201_CREATED
 
 
 class LoginUser(Resource):
     """
     Defines methods for manipulating a single user
     """
-    @validate_json
-    def post(self):
+    @validates(credentials)
+    def post(self, payload):
         """
         Log in a user and get a token
         ---
@@ -163,24 +152,17 @@ class LoginUser(Resource):
                   default: P@ssword1
 
                 """
-        auth = request.get_json()
-        try:
-            if not auth or not auth['username'] or not auth['password']:
-                abort(status.HTTP_400_BAD_REQUEST, 'All fields are required')
-        except KeyError as e:
-            abort(status.HTTP_400_BAD_REQUEST, str(e))
-
-        user = User.query.filter_by(username=auth['username']).first()
+        user = User.query.filter_by(username=payload['username']).first()
 
-        if not user:
+        if not user or user.disabled_at is not None:
             return {'error': 'No user with that name exists'}, 400
 
-        if user.verify_password(auth['password']):
+        if user.verify_password(payload['password']):
             token = jwt.encode(
-                {'username': user.username, 'exp': datetime.datetime.utcnow() + datetime.timedelta(hours=2)},
+                {'username': user.username, 'exp': datetime.datetime.utcnow() + TOKEN_LIFETIME},
                 'topsecret')
 
-            return jsonify({"token": token.decode('UTF-8'), "username": user.username})
+            return {"token": token.decode('UTF-8'), "username": user.username}
 
         return {'error': 'Could not verify. Wrong password'}, 401
 
@@ -204,18 +186,42 @@ class LogoutUser(Resource):
         # Get the auth token
         token = request.headers['x-access-token']
         if token:
-            disable_token = DisableTokens(token=token)
+            disable_token = DisableTokens(token=token, user_id=current.id)
             db.session.add(disable_token)
             db.session.commit()
-            return make_response(jsonify({"Message": "Successfully logged out"}), 200)
+            return {"Message": "Successfully logged out"}, 200
+
+
+class AccountResource(Resource):
+    """
+    Resource to delete the account of the logged in user
+    """
+    @token_required
+    def delete(current_user, self):
+        """
+        Delete the account of the logged in user
+        The account is disabled at once, its categories and recipes are deleted in the background
+        ---
+        tags:
+          - auth
+        responses:
+          202:
+            description: The account is disabled and scheduled for deletion
+          401:
+            description: Missing or invalid token
+        """
+        current_user.disabled_at = datetime.datetime.utcnow()
+        db.session.add(DisableTokens(token=request.headers['x-access-token'], user_id=current_user.id))
+        current_user.update()
+        return {'message': 'Account scheduled for deletion'}, status.HTTP_202_ACCEPTED
 
 
 class SendResetPassword(Resource):
     """
     Resource to reset a user's password
     """
-    @validate_json
-    def post(self):
+    @validates(password_reset)
+    def post(self, payload):
         """Reset a user's password
         ---
         tags:
@@ -240,18 +246,7 @@ class SendResetPassword(Resource):
 
         """
 
-        request_dict = request.get_json()
-
-        if not request_dict:
-            resp = {'error': 'No input data provided'}
-            return resp, status.HTTP_400_BAD_REQUEST
-
-        try:
-            email = request_dict['email']
-        except Exception:
-            response = {"error": 'Missing field'}
-            return response, status.HTTP_400_BAD_REQUEST
-
+        email = payload['email']
         user = User.query.filter_by(email=email).first()
         if not user:
             return {'error': "Invalid email"}, 400
@@ -272,8 +267,7 @@ class SendResetPassword(Resource):
                                                                             "<p> Make sure to change your password " \
                                                                              "on Login</p>" \
                                                                              "<p> \n\nCheers, Kevin Samoei </p>"
-            with app_context:
-                mail.send(msg)
+            mail.send(msg)
             return {"message": 'Password Reset successful. Mail sent! Check email'}, 200
         except Exception as e:
             return {"error": str(e)}, 400
@@ -283,9 +277,9 @@ class ChangePassword(Resource):
     """
     Resource to reset a user's password
     """
-    @validate_json
     @token_required
-    def post(current_user, self):
+    @validates(password_change)
+    def post(current_user, self, payload):
         """Reset a user's password
         ---
         tags:
@@ -308,30 +302,15 @@ class ChangePassword(Resource):
 
         """
 
-        request_dict = request.get_json()
-
-        try:
-            password = request_dict['new_password']
-        except Exception as e:
-            response = {"error": str(e)}
-            return response, status.HTTP_400_BAD_REQUEST
-
-        user = User.query.filter_by(id=current_user.id).first()
-        if not request_dict:
-            resp = {'message': 'No input data provided'}
-            return resp, status.HTTP_400_BAD_REQUEST
-        error_message, password_ok = \
-            user.check_password_strength_and_hash_if_ok(password)
-        if password_ok:
-                user.update()
-                result = {"Message": "Password successfully changed!"}
-                return result, status.HTTP_201_CREATED
-        else:
-            return {'error': error_message}, status.HTTP_400_BAD_REQUEST
+        current_user.hash_password(payload['new_password'])
+        current_user.update()
+        result = {"Message": "Password successfully changed!"}
+        return result, status.HTTP_201_CREATED
 
 
 api.add_resource(RegisterUser, '/register/')
 api.add_resource(LoginUser, '/login/')
 api.add_resource(LogoutUser, '/logout/')
+api.add_resource(AccountResource, '/account')
 api.add_resource(SendResetPassword, '/reset-password/')
 api.add_resource(ChangePassword, '/change-password/')
@@ -0,0 +1,114 @@
+# coding=utf-8
+import datetime
+import hashlib
+import json
+
+from functools import wraps
+from flask import current_app, request, g, after_this_request
+from sqlalchemy.exc import IntegrityError
+
+from api import status
+from api.models import db, IdempotencyKey
+from api.representations import json_body
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+IN_PROGRESS = 'A request with this {0} is still being processed'.format(HEADER)
+# seconds a stored response is replayed for
+DEFAULT_TTL = 24 * 3600
+# seconds retries are turned away while the first request runs, in case its worker dies
+PENDING_TTL = 60
+
+idempotency_keys = IdempotencyKey.__table__
+
+
+def fingerprint():
+    """
+    :return: a digest of the method, url and body of the current request
+    """
+    digest = hashlib.sha256()
+    for part in (request.method, request.full_path):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def idempotent(f):
+    """
+    Handle a create request once per Idempotency-Key header. Retries carrying
+    the same key get the stored response back without running the handler.
+    Place it below token_required so keys are scoped to the user.
+
+    The key table is written on its own connection, outside the session of the
+    handler, so a handler's rollback does not lose the key.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return f(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            message = '{0} must hold 1 to {1} characters'.format(HEADER, MAX_KEY_LENGTH)
+            return {'message': message}, status.HTTP_400_BAD_REQUEST
+
+        scope = {'user_id': g.get('current_user_id') or 0, 'key': key}
+        request_fingerprint = fingerprint()
+        now = datetime.datetime.utcnow()
+        with db.engine.begin() as connection:
+            stored = connection.execute(idempotency_keys.select().where(
+                (idempotency_keys.c.user_id == scope['user_id']) & (idempotency_keys.c.key == key))).first()
+            if stored is not None and stored.expires_at <= now:
+                connection.execute(idempotency_keys.delete().where(
+                    (idempotency_keys.c.user_id == scope['user_id']) & (idempotency_keys.c.key == key)))
+                stored = None
+        if stored is not None:
+            return replay(stored, request_fingerprint)
+
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(idempotency_keys.insert().values(
+                    fingerprint=request_fingerprint, expires_at=now + datetime.timedelta(seconds=PENDING_TTL),
+                    **scope))
+        except IntegrityError:
+            # a concurrent request with the same key got there first
+            return {'message': IN_PROGRESS}, status.HTTP_409_CONFLICT
+
+        @after_this_request
+        def store_response(response):
+            with db.engine.begin() as connection:
+                where = (idempotency_keys.c.user_id == scope['user_id']) & (idempotency_keys.c.key == key)
+                if response.status_code >= status.HTTP_500_INTERNAL_SERVER_ERROR:
+                    # failures are not replayed, the client may retry them
+                    connection.execute(idempotency_keys.delete().where(where))
+                else:
+                    ttl = current_app.config.get('IDEMPOTENCY_KEY_TTL', DEFAULT_TTL)
+                    connection.execute(idempotency_keys.update().where(where).values(
+                        status_code=response.status_code, body=json_body(response),
+                        expires_at=datetime.datetime.utcnow() + datetime.timedelta(seconds=ttl)))
+            return response
+
+        return f(*args, **kwargs)
+    return decorated
+
+
+def replay(stored, request_fingerprint):
+    if stored.fingerprint != request_fingerprint:
+        message = '{0} was already used for a different request'.format(HEADER)
+        return {'message': message}, status.HTTP_422_UNPROCESSABLE_ENTITY
+    if stored.status_code is None:
+        return {'message': IN_PROGRESS}, status.HTTP_409_CONFLICT
+    # encoded again in the representation the retry asks for
+    return json.loads(stored.body), stored.status_code, {'Idempotent-Replayed': 'true'}
+
+
+def purge_expired():
+    """
+    Delete the keys whose responses are no longer replayed
+
+    :return: the number of keys deleted
+    """
+    with db.engine.begin() as connection:
+        result = connection.execute(idempotency_keys.delete().where(
+            idempotency_keys.c.expires_at <= datetime.datetime.utcnow()))
+    return result.rowcount
@@ -0,0 +1,84 @@
+# coding=utf-8
+import os
+import time
+
+from flask import Response, g, request, has_request_context
+from prometheus_client import (CollectorRegistry, Counter, Gauge, Histogram, REGISTRY,
+                               CONTENT_TYPE_LATEST, generate_latest, multiprocess)
+
+from api.database import pool_status
+from api.models import db
+from api.query_events import on_query
+
+# gunicorn workers write their samples to memory mapped files in this directory,
+# it must be set in the environment before the app is imported
+MULTIPROCESS_DIR = os.environ.get('prometheus_multiproc_dir')
+
+REQUEST_DURATION = Histogram('http_request_duration_seconds', 'Time spent serving a request',
+                             ['endpoint', 'method', 'status'])
+DB_QUERIES = Counter('db_queries_total', 'SQL statements executed', ['endpoint'])
+DB_QUERY_DURATION = Histogram('db_query_duration_seconds', 'Time spent executing SQL statements', ['endpoint'],
+                              buckets=(.0005, .001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5))
+AUTH_CHECKS = Counter('auth_token_checks_total', 'Access token checks by outcome', ['result'])
+POOL_CONNECTIONS = Gauge('db_pool_connections', 'Connections held by the database pools of all workers',
+                         ['state'], multiprocess_mode='livesum')
+
+
+def record_auth(result):
+    """
+    Count the outcome of an access token check: ok, missing, invalid, revoked or moving
+    """
+    AUTH_CHECKS.labels(result).inc()
+
+
+def init_app(app):
+    """
+    Record request, database and pool metrics and serve them on /metrics to
+    holders of the admin token when METRICS is enabled
+    """
+    if not app.config.get('METRICS'):
+        return
+    # api.auth records its token checks here, so it is imported late
+    from api.auth import admin_required
+    on_query(_record_query)
+    app.before_request(_start_request)
+    app.after_request(_record_request)
+    app.add_url_rule('/metrics', 'metrics', admin_required(metrics_view))
+
+
+def metrics_view():
+    """
+    Serve every metric in the prometheus text exposition format
+    """
+    registry = REGISTRY
+    if MULTIPROCESS_DIR:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def _endpoint():
+    if has_request_context():
+        return request.endpoint or 'unmatched'
+    return 'none'
+
+
+def _record_query(conn, statement, parameters, context, duration):
+    endpoint = _endpoint()
+    DB_QUERIES.labels(endpoint).inc()
+    DB_QUERY_DURATION.labels(endpoint).observe(duration)
+
+
+def _start_request():
+    g.metrics_start = time.time()
+
+
+def _record_request(response):
+    start = g.pop('metrics_start', None)
+    if start is not None:
+        REQUEST_DURATION.labels(_endpoint(), request.method, response.status_code).observe(time.time() - start)
+    status = pool_status(db.engine)
+    for state in ('checked_out', 'idle', 'overflow'):
+        if state in status:
+            POOL_CONNECTIONS.labels(state).set(status[state])
+    return response
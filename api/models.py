@@ -1,13 +1,39 @@
 # coding=utf-8
 import datetime
-import re
 
-from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import func
+from sqlalchemy import event, exists, false, func, inspect, literal, select
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import IntegrityError
 from passlib.apps import custom_app_context as password_context
 
+from api.database import SQLAlchemy
+
 db = SQLAlchemy()
 
+# characters of a recipe body shown in list views
+SNIPPET_LENGTH = 120
+
+
+def commit():
+    """
+    Commit the session, rolling it back when a constraint rejects the changes
+    """
+    try:
+        return db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        raise
+
+
+def unique_violation(error, *names):
+    """
+    :param error: the IntegrityError raised by a commit
+    :param names: index, constraint or column names as the database reports them
+    :return: True if the error was raised by one of the named unique indexes
+    """
+    message = str(error.orig)
+    return any(name in message for name in names)
+
 
 class AddUpdateDelete():
     """ Object to define methods for add, update and delete resources
@@ -17,13 +43,13 @@ class AddUpdateDelete():
         Create a new resource
         """
         db.session.add(resource)
-        return db.session.commit()
+        return commit()
 
     def update(self):
         """
         Update a particular resource
         """
-        return db.session.commit()
+        return commit()
 
     def delete(self, resource):
         """
@@ -32,31 +58,33 @@ class AddUpdateDelete():
         db.session.delete(resource)
         return db.session.commit()
 
-    @staticmethod
-    def validate_data(ctx):
-        """
-        :param ctx:
-        :return: True if pattern is matched otherwise return false
-        """
-        if re.search(r'[a-zA-Z0-9]', ctx) is None:
-            return "No input data provided", False
-        if '  ' in ctx:
-            return "The parameter has more than one spaces in: {}".format(ctx), False
-        return "", True
-
 
 class User(db.Model, AddUpdateDelete):
     """
     A model to create a user object
     """
     id = db.Column(db.Integer, primary_key=True)
-    email = db.Column(db.String(120), unique=True, nullable=False)
+    email = db.Column(db.String(120), nullable=False)
     username = db.Column(db.String(50), unique=True, nullable=False)
     hashed_password = db.Column(db.String(120), nullable=False)
-    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.now)
+    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    # set when the account is deleted, its data is then purged in the background
+    disabled_at = db.Column(db.DateTime)
+    # the SHARDS bind holding the user's data, placed by the id when the user is created
+    shard = db.Column(db.String(50))
+    # set while the data is copied to another shard, and when it got there
+    shard_moving = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
+    shard_moved_at = db.Column(db.DateTime)
+    # UTC time of the user's last write, replica_read keeps them on the primary shortly after it
+    last_write_at = db.Column(db.DateTime)
 
+    # the database deletes the recipes of a deleted user, they are never loaded for it
     recipes = db.relationship('Recipe', backref='user', lazy='dynamic',
-                              cascade="all, delete-orphan")
+                              cascade="all, delete-orphan", passive_deletes=True)
+
+    __table_args__ = (
+        db.Index('ix_user_lower_email', func.lower(email), unique=True),
+    )
 
     def verify_password(self, password):
         """
@@ -64,40 +92,11 @@ class User(db.Model, AddUpdateDelete):
         """
         return password_context.verify(password, self.hashed_password)
 
-    def check_password_strength_and_hash_if_ok(self, password):
-        """
-        Validate password strength
-        """
-        if len(password) < 8:
-            return "The password is too short", False
-        if len(password) > 32:
-            return "The password is too long", False
-        if re.search(r'[A-Z]', password) is None:
-            return "The password must include at least one uppercase letter", False
-        if re.search(r'[a-z]', password) is None:
-            return 'The password must include at least one lowercase letter', False
-        if re.search(r'\d', password) is None:
-            return "The password must include at least one number", False
-        if re.search(r"[@!#$%&'()*+,-./[\\\]^_`{|}~"+r'"]', password) is None:
-            return "The password must include at least one symbol", False
-        if ' ' in password:
-            return "The parameter password has spaces in: {}".format(password), False
-        self.hashed_password = password_context.encrypt(password)
-        return "", True
-
-    @classmethod
-    def is_unique(cls, username):
+    def hash_password(self, password):
         """
-        Ensure the recipe to be created will be unique
+        Store the hash of a password, api.endpoints.user checks its strength
         """
-        existing_user = cls.query.filter_by(username=username).first()
-        if existing_user is None:
-            return True
-        else:
-            if existing_user.id == id:
-                return True
-            else:
-                return False
+        self.hashed_password = password_context.encrypt(password)
 
     def __init__(self, username, email):
         self.username = username
@@ -110,27 +109,39 @@ class Category(db.Model, AddUpdateDelete):
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(150), nullable=False)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
-    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.now)
-    modified_timestamp = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete='CASCADE'))
+    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    modified_timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
+    # kept up to date by the recipe mapper events below
+    recipe_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    # category names are unique per user whatever their case
+    __table_args__ = (
+        db.Index('ix_category_user_id_lower_name', user_id, func.lower(name), unique=True),
+    )
 
     def __init__(self, name, user_id):
         self.name = name
         self.user_id = user_id
 
-    @classmethod
-    def is_unique(cls, id, name, user_id):
+    @staticmethod
+    def recount_recipes():
         """
-        Ensure that a category to be created is unique
+        Recompute the recipe count of every category from the recipe table
         """
-        existing_category = cls.query.filter(func.lower(cls.name) == func.lower(name), cls.user_id == user_id).first()
-        if existing_category is None:
-            return True
-        else:
-            if existing_category.id == id:
-                return True
-            else:
-                return False
+        recipes = Recipe.__table__
+        count = select([func.count(recipes.c.id)]).where(recipes.c.category_id == Category.id).as_scalar()
+        db.session.execute(Category.__table__.update().values(recipe_count=count))
+        db.session.commit()
+
+
+# tags of every recipe, looked up by tag when filtering
+recipe_tag = db.Table(
+    'recipe_tag',
+    db.Column('recipe_id', db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey('tag.id', ondelete='CASCADE'), primary_key=True),
+    db.Index('ix_recipe_tag_tag_id_recipe_id', 'tag_id', 'recipe_id'),
+)
 
 
 class Recipe(db.Model, AddUpdateDelete):
@@ -140,45 +151,118 @@ class Recipe(db.Model, AddUpdateDelete):
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100))
     body = db.Column(db.String(500))
-    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.now)
-    modified_timestamp = db.Column(db.DateTime, default=datetime.datetime.now, onupdate=datetime.datetime.now)
+    # start of the body for list views, stored when the body is written
+    snippet = db.Column(db.String(SNIPPET_LENGTH))
+    created_timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow)
+    modified_timestamp = db.Column(db.DateTime, default=datetime.datetime.utcnow, onupdate=datetime.datetime.utcnow)
     category_id = db.Column(db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'))
     category = db.relationship('Category', backref=db.backref('recipes',
                                                               lazy='dynamic', order_by='Recipe.title',
-                                                              cascade="all, delete-orphan"))
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"))
+                                                              cascade="all, delete-orphan",
+                                                              passive_deletes=True))
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete='CASCADE'))
+    # the tags of a page of recipes are loaded in one query
+    tags = db.relationship('Tag', secondary=recipe_tag, lazy='selectin', order_by='Tag.name',
+                           passive_deletes=True)
+    # shared recipes are listed in the public feed
+    public = db.Column(db.Boolean, nullable=False, default=False, server_default=false())
+    # views of the shared recipe, ranks it in the trending feed
+    view_count = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        # recipe titles are unique per user whatever their case
+        db.Index('ix_recipe_user_id_lower_title', user_id, func.lower(title), unique=True),
+        # the public feed pages through the few shared recipes newest first
+        db.Index('ix_recipe_public_id', id, postgresql_where=public, sqlite_where=public),
+    )
 
-    def __init__(self, title, body, category_id, user):
+    def __init__(self, title, body, category_id, user, public=False):
         self.title = title
         self.body = body
         self.category_id = category_id
         self.user = user
+        self.public = public
 
-    @classmethod
-    def is_unique(cls, id, title, user_id):
-        """
-        Ensure the recipe to be created will be unique
-        """
-        existing_recipe = cls.query.filter(func.lower(cls.title) == func.lower(title), cls.user_id == user_id).first()
-        if existing_recipe is None:
-            return True
-        else:
-            if existing_recipe.id == id:
-                return True
-            else:
-                return False
 
-    @classmethod
-    def validate_recipe(cls, ctx):
+class Tag(db.Model):
+    """
+    A label users put on any number of their recipes
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    name = db.Column(db.String(50), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_tag_user_id_name', user_id, name, unique=True),
+    )
+
+    def __init__(self, name, user_id):
+        self.name = name
+        self.user_id = user_id
+
+    @staticmethod
+    def for_names(user_id, names):
         """
-        :param ctx:
-        :return: True if pattern is matched otherwise return false
+        :return: the user's tags with these names, creating the missing ones
         """
-        if re.search(r'[a-zA-Z0-9]', ctx) is None:
-            return "No input data provided", False
-        if '  ' in ctx:
-            return "The parameter category has more than one spaces in: {}".format(ctx), False
-        return "", True
+        if not names:
+            return []
+        # the recipe being tagged is flushed with the rest of the request, not by this lookup
+        with db.session.no_autoflush:
+            tags = {tag.name: tag for tag in Tag.query.filter(Tag.user_id == user_id, Tag.name.in_(names))}
+        return [tags.get(name) or Tag(name, user_id) for name in names]
+
+
+def make_snippet(body):
+    """
+    :return: the start of a recipe body, cut at a word and at most SNIPPET_LENGTH characters long
+    """
+    if body is None or len(body) <= SNIPPET_LENGTH:
+        return body
+    snippet = body[:SNIPPET_LENGTH - 3]
+    if ' ' in snippet:
+        snippet = snippet.rsplit(' ', 1)[0]
+    return snippet.rstrip() + '...'
+
+
+@event.listens_for(Recipe, 'before_insert')
+@event.listens_for(Recipe, 'before_update')
+def store_snippet(mapper, connection, recipe):
+    if inspect(recipe).attrs.body.history.has_changes():
+        recipe.snippet = make_snippet(recipe.body)
+
+
+def change_recipe_count(connection, recipe, category_id, delta):
+    """
+    Add `delta` to the recipe count of a category in the flush that changed its recipes,
+    logging the change for syncing clients since the core update skips log_category_upsert
+    """
+    if category_id is None:
+        return
+    categories = Category.__table__
+    connection.execute(categories.update().where(categories.c.id == category_id).values(
+        recipe_count=categories.c.recipe_count + delta))
+    record_change(connection, recipe.user_id, 'category', category_id, 'upsert')
+
+
+@event.listens_for(Recipe, 'after_insert')
+def count_inserted_recipe(mapper, connection, recipe):
+    change_recipe_count(connection, recipe, recipe.category_id, 1)
+
+
+@event.listens_for(Recipe, 'after_delete')
+def count_deleted_recipe(mapper, connection, recipe):
+    change_recipe_count(connection, recipe, recipe.category_id, -1)
+
+
+@event.listens_for(Recipe, 'after_update')
+def count_moved_recipe(mapper, connection, recipe):
+    history = inspect(recipe).attrs.category_id.history
+    if history.has_changes():
+        for category_id in history.deleted:
+            change_recipe_count(connection, recipe, category_id, -1)
+        for category_id in history.added:
+            change_recipe_count(connection, recipe, category_id, 1)
 
 
 class DisableTokens(db.Model):
@@ -190,10 +274,12 @@ class DisableTokens(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     token = db.Column(db.String(500), unique=True, nullable=False)
     blacklisted_on = db.Column(db.DateTime, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), index=True)
 
-    def __init__(self, token):
+    def __init__(self, token, user_id=None):
         self.token = token
-        self.blacklisted_on = datetime.datetime.now()
+        self.user_id = user_id
+        self.blacklisted_on = datetime.datetime.utcnow()
 
     def __repr__(self):
         return '<id: token: {}'.format(self.token)
@@ -205,3 +291,158 @@ class DisableTokens(db.Model):
             return True
         else:
             return False
+
+
+class IdempotencyKey(db.Model):
+    """
+    Response stored for an Idempotency-Key, replayed when a client retries the same request
+    """
+    __tablename__ = 'idempotency_key'
+
+    # 0 for requests made without an access token
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    key = db.Column(db.String(255), primary_key=True)
+    fingerprint = db.Column(db.String(64), nullable=False)
+    # null while the first request is still being handled
+    status_code = db.Column(db.Integer)
+    body = db.Column(db.Text)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class TrendingRecipe(db.Model):
+    """
+    Top shared recipes by views and recency, rebuilt periodically by refresh_trending
+    so the trending feed reads a page of it by rank instead of ranking every recipe
+    """
+    __tablename__ = 'trending_recipe'
+
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    recipe_id = db.Column(db.Integer, db.ForeignKey('recipe.id', ondelete='CASCADE'), nullable=False)
+    # the shard holding the recipe when the database is sharded
+    shard = db.Column(db.String(50))
+    view_count = db.Column(db.Integer, nullable=False)
+    refreshed_at = db.Column(db.DateTime, nullable=False)
+
+
+class IdBlock(db.Model):
+    """
+    Next free id of a sharded table, handed out in blocks so ids stay unique across shards
+    """
+    __tablename__ = 'id_block'
+
+    name = db.Column(db.String(50), primary_key=True)
+    next_id = db.Column(db.Integer, nullable=False)
+
+
+class Change(db.Model):
+    """
+    Log of the categories and recipes created, updated and deleted, read by syncing clients.
+    Its id is the sequence the sync tokens point into.
+    """
+    __tablename__ = 'change'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, nullable=False)
+    entity = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    # 'upsert' or 'delete'
+    action = db.Column(db.String(6), nullable=False)
+    created = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow, index=True)
+
+    __table_args__ = (
+        db.Index('ix_change_user_id_id', user_id, id),
+    )
+
+    @staticmethod
+    def purge(before):
+        """
+        Delete the changes logged before `before`, tokens issued before then get a 410.
+        The last upsert of every object is kept whatever its age, so a client syncing
+        everything again from the start of the log still gets every object.
+
+        :return: the number of changes deleted
+        """
+        changes = Change.__table__
+        later = changes.alias('later')
+        superseded = exists().where((later.c.user_id == changes.c.user_id) & (later.c.entity == changes.c.entity) &
+                                    (later.c.entity_id == changes.c.entity_id) & (later.c.id > changes.c.id))
+        deleted = db.session.execute(changes.delete().where(
+            (changes.c.created < before) & ((changes.c.action == 'delete') | superseded))).rowcount
+        db.session.commit()
+        return deleted
+
+
+# first key of the advisory locks serialising a user's change log, the second is the user id
+CHANGE_LOG_LOCK = 1
+
+
+@event.listens_for(Category, 'before_insert')
+@event.listens_for(Category, 'before_update')
+@event.listens_for(Category, 'before_delete')
+@event.listens_for(Recipe, 'before_insert')
+@event.listens_for(Recipe, 'before_update')
+@event.listens_for(Recipe, 'before_delete')
+@event.listens_for(Tag, 'before_insert')
+def lock_change_log(mapper, connection, target):
+    """
+    Make the transactions changing a user's data log their changes one after the other
+
+    Sync tokens point after the last change id a client read, so a lower id committed
+    after a higher one was read would be skipped. The lock is taken before the first
+    row of the user is written and held until the transaction ends, the next one
+    writing for the user takes its change ids once this one committed. sqlite
+    serialises every write transaction already.
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    locked = connection.info.setdefault('change_log_locks', set())
+    if target.user_id not in locked:
+        connection.execute(select([func.pg_advisory_xact_lock(CHANGE_LOG_LOCK, target.user_id)]))
+        locked.add(target.user_id)
+
+
+@event.listens_for(Engine, 'commit')
+@event.listens_for(Engine, 'rollback')
+def forget_change_log_locks(connection):
+    # transaction level locks end with the transaction
+    connection.info.pop('change_log_locks', None)
+
+
+def record_change(connection, user_id, entity, entity_id, action):
+    connection.execute(Change.__table__.insert().values(
+        user_id=user_id, entity=entity, entity_id=entity_id, action=action, created=datetime.datetime.utcnow()))
+
+
+def log_change(connection, entity, target, action):
+    """
+    Record a change of `target` in the flush that made it
+    """
+    record_change(connection, target.user_id, entity, target.id, action)
+
+
+@event.listens_for(Category, 'after_insert')
+@event.listens_for(Category, 'after_update')
+def log_category_upsert(mapper, connection, category):
+    log_change(connection, 'category', category, 'upsert')
+
+
+@event.listens_for(Category, 'before_delete')
+def log_category_delete(mapper, connection, category):
+    log_change(connection, 'category', category, 'delete')
+    # the database deletes the recipes, write their tombstones while they still exist
+    recipes = Recipe.__table__
+    tombstones = select([recipes.c.user_id, literal('recipe'), recipes.c.id, literal('delete'),
+                         literal(datetime.datetime.utcnow())]).where(recipes.c.category_id == category.id)
+    connection.execute(Change.__table__.insert().from_select(
+        ['user_id', 'entity', 'entity_id', 'action', 'created'], tombstones))
+
+
+@event.listens_for(Recipe, 'after_insert')
+@event.listens_for(Recipe, 'after_update')
+def log_recipe_upsert(mapper, connection, recipe):
+    log_change(connection, 'recipe', recipe, 'upsert')
+
+
+@event.listens_for(Recipe, 'after_delete')
+def log_recipe_delete(mapper, connection, recipe):
+    log_change(connection, 'recipe', recipe, 'delete')
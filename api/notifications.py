@@ -0,0 +1,210 @@
+# coding=utf-8
+import json
+import logging
+import queue
+import select
+import threading
+import time
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import object_session
+from werkzeug.utils import import_string
+
+from api.database import RoutingSession
+from api.models import db, Category, Recipe
+
+logger = logging.getLogger('api.notifications')
+
+# sent to a subscriber whose queue overflowed, it should catch up through /api/changes
+RESYNC = {'resync': True}
+
+
+class Subscription(object):
+    """
+    Bounded queue of the notifications of one user for one stream
+    """
+    def __init__(self, broker, user_id, queue_size):
+        self.broker = broker
+        self.user_id = user_id
+        self.messages = queue.Queue(queue_size)
+        self.overflowed = False
+
+    def put(self, message):
+        try:
+            self.messages.put_nowait(message)
+        except queue.Full:
+            # a slow client must not hold memory or block the publisher, it resyncs instead
+            self.overflowed = True
+
+    def get(self, timeout):
+        """
+        :return: the next notification, RESYNC after an overflow, or None when nothing came within `timeout`
+        """
+        if self.overflowed:
+            self.overflowed = False
+            with self.messages.mutex:
+                self.messages.queue.clear()
+            return RESYNC
+        try:
+            return self.messages.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class MemoryBroker(object):
+    """
+    Fans notifications out to the streams of this process only
+    """
+    def __init__(self, app):
+        self.queue_size = app.config['NOTIFICATIONS_QUEUE_SIZE']
+        self.subscriptions = {}
+        self.lock = threading.Lock()
+
+    def subscribe(self, user_id):
+        subscription = Subscription(self, user_id, self.queue_size)
+        with self.lock:
+            self.subscriptions.setdefault(user_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.subscriptions.get(subscription.user_id, set())
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                self.subscriptions.pop(subscription.user_id, None)
+
+    def publish(self, user_id, message):
+        self.deliver(user_id, message)
+
+    def deliver(self, user_id, message):
+        with self.lock:
+            subscriptions = list(self.subscriptions.get(user_id, ()))
+        for subscription in subscriptions:
+            subscription.put(message)
+
+
+class PostgresBroker(MemoryBroker):
+    """
+    Sends notifications through postgres LISTEN/NOTIFY so the streams of every worker receive them
+    """
+    channel = 'recipe_changes'
+    # NOTIFY payloads are limited to 8000 bytes
+    max_payload = 7900
+
+    def __init__(self, app):
+        super(PostgresBroker, self).__init__(app)
+        self.app = app
+        self.listener = None
+
+    def publish(self, user_id, message):
+        payload = json.dumps({'user_id': user_id, 'message': message})
+        if len(payload) > self.max_payload:
+            payload = json.dumps({'user_id': user_id, 'message': RESYNC})
+        with db.get_engine(self.app).connect() as connection:
+            connection.execution_options(autocommit=True).execute(
+                text('SELECT pg_notify(:channel, :payload)'), channel=self.channel, payload=payload)
+
+    def subscribe(self, user_id):
+        # started on first use so every forked worker listens on its own connection
+        with self.lock:
+            if self.listener is None:
+                self.listener = threading.Thread(target=self.listen)
+                self.listener.daemon = True
+                self.listener.start()
+        return super(PostgresBroker, self).subscribe(user_id)
+
+    def listen(self):
+        while True:
+            try:
+                self.listen_once()
+            except Exception:
+                logger.exception('Lost the postgres notification connection, reconnecting')
+                time.sleep(1)
+
+    def listen_once(self):
+        connection = db.get_engine(self.app).raw_connection()
+        # keep this long lived connection out of the request pool
+        connection.detach()
+        dbapi_connection = connection.connection
+        try:
+            dbapi_connection.autocommit = True
+            cursor = dbapi_connection.cursor()
+            cursor.execute('LISTEN {0}'.format(self.channel))
+            while True:
+                if select.select([dbapi_connection], [], [], 5) == ([], [], []):
+                    continue
+                dbapi_connection.poll()
+                while dbapi_connection.notifies:
+                    notification = json.loads(dbapi_connection.notifies.pop(0).payload)
+                    self.deliver(notification['user_id'], notification['message'])
+        finally:
+            connection.close()
+
+
+BROKERS = {
+    'memory': MemoryBroker,
+    'postgres': PostgresBroker,
+}
+
+
+def init_app(app):
+    """
+    Set up the broker named by NOTIFICATIONS_BROKER, 'memory', 'postgres' or the import path of a broker class
+    """
+    app.config.setdefault('NOTIFICATIONS_BROKER', 'memory')
+    app.config.setdefault('NOTIFICATIONS_QUEUE_SIZE', 100)
+    app.config.setdefault('NOTIFICATIONS_HEARTBEAT', 15)
+    app.config.setdefault('NOTIFICATIONS_STREAM_SECONDS', 300)
+    name = app.config['NOTIFICATIONS_BROKER']
+    broker_class = BROKERS[name] if name in BROKERS else import_string(name)
+    app.extensions['notifications'] = broker_class(app)
+
+
+def get_broker():
+    return current_app.extensions['notifications']
+
+
+def _pending(target):
+    session = object_session(target)
+    return session.info.setdefault('notifications', []) if session is not None else []
+
+
+def _notify(entity, action):
+    def listener(mapper, connection, target):
+        _pending(target).append((target.user_id, {'type': entity, 'id': target.id, 'action': action}))
+    return listener
+
+
+for model, entity in ((Category, 'category'), (Recipe, 'recipe')):
+    event.listen(model, 'after_insert', _notify(entity, 'upsert'))
+    event.listen(model, 'after_update', _notify(entity, 'upsert'))
+    event.listen(model, 'after_delete', _notify(entity, 'delete'))
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+def publish_committed(session):
+    """
+    Tell the streams of every user whose categories or recipes the transaction changed
+    """
+    pending = session.info.pop('notifications', None)
+    if not pending or not has_app_context() or 'notifications' not in current_app.extensions:
+        return
+    changes = {}
+    for user_id, change in pending:
+        changes.setdefault(user_id, []).append(change)
+    broker = get_broker()
+    for user_id, user_changes in changes.items():
+        try:
+            broker.publish(user_id, {'changes': user_changes})
+        except Exception:
+            # the change is committed, clients still get it from /api/changes
+            logger.exception('Could not publish the changes of user %s', user_id)
+
+
+@event.listens_for(RoutingSession, 'after_soft_rollback')
+def discard_rolled_back(session, previous_transaction):
+    session.info.pop('notifications', None)
@@ -1,38 +1,56 @@
 # coding=utf-8
 from flask import url_for
 from flask import current_app
+from flask_sqlalchemy import Pagination as Page
+
+from api.timing import timed
 
 
 class Pagination:
     """
     This is a helper method to create pagination
     """
-    def __init__(self, request, query, resource_for_url, key_name, schema, results_per_page, page):
+    def __init__(self, request, query, resource_for_url, key_name, schema, results_per_page, page, prefetch=None):
         self.request = request
         self.query = query
         self.resource_for_url = resource_for_url
         self.key_name = key_name
         self.schema = schema
         self.page = page
+        # called with the objects of the page, returns the schema to dump them with
+        self.prefetch = prefetch
         self.results_per_page = results_per_page
         self.page_argument_name = current_app.config['PAGINATION_PAGE_ARGUMENT_NAME']
 
+    def paginate(self, page_number):
+        """
+        Fetch a page of the query, timing the page query and the count separately
+        """
+        page_number = max(page_number, 1)
+        per_page = self.results_per_page if self.results_per_page >= 0 else 20
+        with timed('query'):
+            items = self.query.limit(per_page).offset((page_number - 1) * per_page).all()
+        # the first page tells the total when it is not full
+        if page_number == 1 and len(items) < per_page:
+            total = len(items)
+        else:
+            with timed('count'):
+                total = self.query.order_by(None).count()
+        return Page(self.query, page_number, per_page, total, items)
+
     def paginate_query(self):
         """
         create paginated queries of the resources
         """
         page_number = self.request.args.get(self.page_argument_name, 1, type=int)
-        paginated_objects = self.query.paginate(
-            page_number,
-            per_page=self.results_per_page,
-            error_out=False
-        )
+        paginated_objects = self.paginate(page_number)
         objects = paginated_objects.items
         if paginated_objects.has_prev:
             previous_page_url = url_for(
                 self.resource_for_url,
                 page=page_number-1,
-                _external=True
+                _external=True,
+                **self.request.view_args
             )
         else:
             previous_page_url = None
@@ -40,11 +58,17 @@ class Pagination:
             next_page_url = url_for(
                 self.resource_for_url,
                 page=page_number+1,
-                _external=True
+                _external=True,
+                **self.request.view_args
             )
         else:
             next_page_url = None
-        dumped_objects = self.schema.dump(objects, many=True).data
+        schema = self.schema
+        if self.prefetch is not None:
+            with timed('query'):
+                schema = self.prefetch(objects)
+        with timed('dump'):
+            dumped_objects = schema.dump(objects, many=True).data
         return ({
             self.key_name: dumped_objects,
             'previous': previous_page_url,
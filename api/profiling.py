@@ -0,0 +1,215 @@
+# coding=utf-8
+import cProfile
+import datetime
+import os
+import random
+import sys
+import threading
+import uuid
+
+from collections import Counter
+from flask import g, request
+
+from api.auth import has_admin_token
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StackSampler(object):
+    """
+    Samples the stack of one thread at a fixed interval and counts the
+    collapsed stacks, the input format of flamegraphs
+    """
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run)
+        self._thread.daemon = True
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def write(self, path):
+        with open(path, 'w') as output:
+            for stack, count in self.stacks.most_common():
+                output.write('{0} {1}\n'.format(stack, count))
+
+
+class CProfiler(object):
+    """
+    Deterministic profiler, use it when green thread workers make sampling unreliable
+    """
+    def __init__(self):
+        self.profile = cProfile.Profile()
+
+    def start(self):
+        self.profile.enable()
+
+    def stop(self):
+        self.profile.disable()
+
+    def write(self, path):
+        self.profile.dump_stats(path)
+
+
+def green_threads():
+    """
+    :return: True when gevent or eventlet patched threading, thread idents then
+        name greenlets and sys._current_frames() never holds their stacks
+    """
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is not None and gevent_monkey.is_module_patched('threading'):
+        return True
+    eventlet_patcher = sys.modules.get('eventlet.patcher')
+    return eventlet_patcher is not None and eventlet_patcher.is_monkey_patched('thread')
+
+
+def profile_mode(configured):
+    """
+    :return: 'sample' or 'cprofile', cprofile unless sampling was asked for and can see the request's stack
+    """
+    if configured == 'cprofile' or green_threads():
+        return 'cprofile'
+    return 'sample'
+
+
+def collapse(frame):
+    """
+    :return: the stack ending at `frame` as `file:function` names joined by ';', outermost first
+    """
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        filename = code.co_filename
+        if filename.startswith(ROOT):
+            filename = os.path.relpath(filename, ROOT)
+        else:
+            filename = os.path.basename(filename)
+        names.append('{0}:{1}'.format(filename, code.co_name))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+def init_app(app):
+    """
+    Profile requests asking for it with the X-Profile header and the admin
+    token, and a random PROFILER_SAMPLE_RATE fraction of all requests.
+    Nothing is hooked unless PROFILER_ENABLED is set.
+    """
+    if not app.config.get('PROFILER_ENABLED'):
+        return
+    app.config.setdefault('PROFILER_DIR', os.path.join(ROOT, 'profiles'))
+    app.config.setdefault('PROFILER_SAMPLE_RATE', 0.0)
+    # None samples stacks unless the worker runs green threads
+    app.config.setdefault('PROFILER_MODE', None)
+    app.config.setdefault('PROFILER_INTERVAL', 0.005)
+
+    def start_profile():
+        requested = request.headers.get('X-Profile') and has_admin_token()
+        if not requested and random.random() >= app.config['PROFILER_SAMPLE_RATE']:
+            return
+        # workers patch threading after the app was preloaded, so decide per request
+        if profile_mode(app.config['PROFILER_MODE']) == 'cprofile':
+            profiler, extension = CProfiler(), 'prof'
+        else:
+            profiler = StackSampler(threading.current_thread().ident, app.config['PROFILER_INTERVAL'])
+            extension = 'collapsed'
+        g.profile_name = '{0}-{1}-{2}-{3}.{4}'.format(
+            datetime.datetime.utcnow().strftime('%Y%m%dT%H%M%S'),
+            (request.endpoint or 'unmatched').replace('/', '.'),
+            request.method, uuid.uuid4().hex[:8], extension)
+        g.profiler = profiler
+        profiler.start()
+
+    def name_profile(response):
+        if g.get('profile_name'):
+            response.headers['X-Profile-Id'] = g.profile_name
+        return response
+
+    def finish_profile(exception):
+        profiler = g.pop('profiler', None)
+        if profiler is None:
+            return
+        profiler.stop()
+        directory = app.config['PROFILER_DIR']
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        profiler.write(os.path.join(directory, g.pop('profile_name')))
+
+    app.before_request(start_profile)
+    app.after_request(name_profile)
+    app.teardown_request(finish_profile)
+
+
+def list_profiles(directory):
+    """
+    :return: (name, size in bytes, modified time) of every stored profile, newest first
+    """
+    profiles = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            if name.endswith(('.collapsed', '.prof')):
+                path = os.path.join(directory, name)
+                profiles.append((name, os.path.getsize(path),
+                                 datetime.datetime.fromtimestamp(os.path.getmtime(path))))
+    return sorted(profiles, key=lambda profile: profile[2], reverse=True)
+
+
+def render_flamegraph(collapsed_path, width=1200, frame_height=16):
+    """
+    :return: an svg flamegraph of a collapsed stack file
+    """
+    root = {'count': 0, 'children': {}}
+    with open(collapsed_path) as collapsed:
+        for line in collapsed:
+            stack, _, count = line.rstrip('\n').rpartition(' ')
+            node = root
+            root['count'] += int(count)
+            for name in stack.split(';'):
+                node = node['children'].setdefault(name, {'count': 0, 'children': {}})
+                node['count'] += int(count)
+
+    rects = []
+
+    def depth_of(node):
+        return 1 + max([depth_of(child) for child in node['children'].values()] or [0])
+
+    height = depth_of(root) * frame_height
+    scale = float(width) / max(root['count'], 1)
+
+    def place(node, name, x, depth):
+        node_width = node['count'] * scale
+        if name is not None and node_width >= 0.5:
+            y = height - (depth + 1) * frame_height
+            hue = 20 + (hash(name) % 40)
+            label = name if node_width > 7 * len(name) else name[:max(int(node_width / 7) - 2, 0)]
+            rects.append(
+                '<g><title>{0} ({1} samples)</title>'
+                '<rect x="{2:.1f}" y="{3}" width="{4:.1f}" height="{5}" fill="hsl({6},90%,60%)" stroke="white"/>'
+                '<text x="{7:.1f}" y="{8}" font-size="11" font-family="monospace">{9}</text></g>'.format(
+                    escape(name), node['count'], x, y, node_width, frame_height, hue,
+                    x + 2, y + frame_height - 4, escape(label)))
+        child_x = x
+        for child_name, child in sorted(node['children'].items()):
+            place(child, child_name, child_x, depth + 1 if name is not None else depth)
+            child_x += child['count'] * scale
+
+    place(root, None, 0, 0)
+    return ('<svg xmlns="http://www.w3.org/2000/svg" width="{0}" height="{1}">{2}</svg>'.format(
+        width, height, ''.join(rects)))
+
+
+def escape(text):
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;')
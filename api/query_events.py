@@ -0,0 +1,38 @@
+# coding=utf-8
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+_callbacks = []
+
+
+def on_query(callback):
+    """
+    Call `callback(conn, statement, parameters, context, duration)` after every
+    statement any engine executes. The cursor hooks are only installed once the
+    first callback is registered.
+    """
+    if not _callbacks:
+        event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+        event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    if callback not in _callbacks:
+        _callbacks.append(callback)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # the execution context lives as long as the statement, a statement that raises
+    # drops its start time with it. Only the dialect's own checks run without one.
+    if context is not None:
+        if not hasattr(context, 'query_start'):
+            context.query_start = []
+        context.query_start.append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if context is None:
+        return
+    started = context.query_start.pop()
+    duration = time.perf_counter() - started
+    for callback in _callbacks:
+        callback(conn, statement, parameters, context, duration)
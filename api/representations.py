@@ -0,0 +1,101 @@
+# coding=utf-8
+import datetime
+import json
+
+from flask import current_app, make_response
+
+from api.timing import timed
+
+try:
+    import orjson
+except ImportError:
+    # the stdlib encoder is used instead
+    orjson = None
+try:
+    import msgpack
+except ImportError:
+    # responses are only offered as json
+    msgpack = None
+
+JSON = 'application/json'
+MSGPACK = 'application/msgpack'
+
+
+def add_representations(api):
+    """
+    Encode the resources of a flask_restful.Api as json, or as msgpack for
+    clients sending `Accept: application/msgpack` when msgpack is installed
+    """
+    api.representation(JSON)(output_json)
+    if msgpack is not None:
+        api.representation(MSGPACK)(output_msgpack)
+
+
+def utc(value):
+    """
+    :return: the datetime as UTC, the database holds naive UTC datetimes
+    """
+    return value.replace(tzinfo=datetime.timezone.utc) if value.tzinfo is None else value
+
+
+def json_default(value):
+    """
+    Encode the values the stdlib json module does not know
+    """
+    if isinstance(value, datetime.datetime):
+        return utc(value).isoformat()
+    raise TypeError('{0!r} is not JSON serializable'.format(value))
+
+
+def dumps_json(data):
+    """
+    :return: data encoded as json bytes, with orjson when installed. Datetimes
+        are written as ISO 8601 in UTC, by orjson without going through Python
+    """
+    if orjson is not None:
+        option = orjson.OPT_NAIVE_UTC | orjson.OPT_NON_STR_KEYS
+        if current_app.debug:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(data, default=json_default, option=option) + b'\n'
+    settings = dict(current_app.config.get('RESTFUL_JSON', {}))
+    if current_app.debug:
+        settings.setdefault('indent', 4)
+    return (json.dumps(data, default=json_default, **settings) + '\n').encode('utf-8')
+
+
+def msgpack_default(value):
+    """
+    Encode datetimes as msgpack timestamps
+    """
+    if isinstance(value, datetime.datetime):
+        return msgpack.Timestamp.from_datetime(utc(value))
+    raise TypeError('{0!r} is not msgpack serializable'.format(value))
+
+
+def output_json(data, code, headers=None):
+    """
+    Encode a resource's response as json, timing the encoding
+    """
+    with timed('json'):
+        response = make_response(dumps_json(data), code)
+    response.headers.extend(headers or {})
+    return response
+
+
+def output_msgpack(data, code, headers=None):
+    """
+    Encode a resource's response as msgpack, timing the encoding
+    """
+    with timed('msgpack'):
+        response = make_response(msgpack.packb(data, default=msgpack_default, use_bin_type=True), code)
+    response.headers.extend(headers or {})
+    return response
+
+
+def json_body(response):
+    """
+    :return: the body of a response as json text, whichever representation encoded it
+    """
+    if response.mimetype == MSGPACK:
+        return dumps_json(msgpack.unpackb(response.get_data(), raw=False, timestamp=3)).decode('utf-8')
+    return response.get_data(as_text=True)
@@ -0,0 +1,188 @@
+# coding=utf-8
+import csv
+import datetime
+import io
+import math
+import random
+import time
+
+from passlib.apps import custom_app_context as password_context
+from sqlalchemy import func, select
+
+from api import sharding
+from api.models import db, User, Category, Recipe, make_snippet
+
+SEED_PASSWORD = 'P@ssword1'
+# a fixed salt keeps the password hash, and so the whole load, the same for a seed
+SEED_SALT = 'seedsalt'
+# sqlite refuses statements with more bound parameters than this
+SQLITE_MAX_VARIABLES = 999
+
+CATEGORY_NAMES = ['breakfast', 'lunch', 'dinner', 'soups', 'stews', 'salads', 'desserts', 'drinks',
+                  'snacks', 'baking', 'vegan', 'grill', 'seafood', 'pasta', 'sauces', 'sides']
+ADJECTIVES = ['spicy', 'creamy', 'roast', 'grilled', 'fresh', 'sweet', 'smoky', 'crispy', 'slow cooked',
+              'lemon', 'garlic', 'honey', 'herb', 'classic', 'quick', 'easy', 'homemade', 'tangy']
+INGREDIENTS = ['beef', 'chicken', 'bean', 'lentil', 'tomato', 'potato', 'mushroom', 'pumpkin', 'rice',
+               'fish', 'prawn', 'spinach', 'cabbage', 'carrot', 'onion', 'pork', 'lamb', 'chickpea',
+               'coconut', 'mango', 'banana', 'apple', 'cheese', 'egg', 'noodle', 'corn', 'pepper']
+DISHES = ['soup', 'stew', 'curry', 'salad', 'pie', 'bake', 'stir fry', 'roll', 'cake', 'bread',
+          'pilau', 'chapati', 'sandwich', 'smoothie', 'tart', 'skewers', 'pancakes', 'risotto']
+STEPS = ['chop the {0}', 'fry the {0} until golden', 'boil the {0} for ten minutes', 'season the {0}',
+         'mix in the {0}', 'simmer with the {0}', 'bake the {0} until done', 'garnish with {0}',
+         'serve the {0} warm', 'marinate the {0} overnight', 'stir the {0} gently', 'drain the {0}']
+
+
+def zipf_choice(rng, words):
+    """
+    Pick a word with a zipf-like bias towards the front of the list
+    """
+    return words[min(int(rng.paretovariate(1.2)) - 1, len(words) - 1)]
+
+
+def letters_for(number):
+    """
+    :return: an alphabetic name for a number, usernames may only hold letters
+    """
+    letters = ''
+    number += 1
+    while number:
+        number, remainder = divmod(number - 1, 26)
+        letters = chr(ord('a') + remainder) + letters
+    return letters
+
+
+class Seeder(object):
+    """
+    Loads synthetic users, categories and recipes in bulk, deterministically by seed.
+    Every user shares one password hash, computed once with a fixed salt, so no hashing
+    happens per row. Postgres is loaded with COPY, other databases with multi-row inserts.
+    Only unsharded databases are loaded, rows are not routed to shards.
+    """
+    def __init__(self, seed=0, batch_size=10000, password=SEED_PASSWORD):
+        self.rng = random.Random(seed)
+        self.batch_size = batch_size
+        self.hashed_password = password_context.handler().using(salt=SEED_SALT).hash(password)
+        self.now = datetime.datetime(2018, 3, 1)
+        self.stats = {}
+
+    def title(self, seen):
+        words = [zipf_choice(self.rng, INGREDIENTS), zipf_choice(self.rng, DISHES)]
+        if self.rng.random() < 0.6:
+            words.insert(0, zipf_choice(self.rng, ADJECTIVES))
+        title = ' '.join(words).title()
+        if title.lower() in seen:
+            title = '{0} {1}'.format(title, len(seen) + 1)
+        seen.add(title.lower())
+        return title
+
+    def body(self):
+        # step counts are log-normal, most recipes are short and a few are long
+        steps = max(1, int(self.rng.lognormvariate(1.4, 0.5)))
+        text = '. '.join(self.rng.choice(STEPS).format(self.rng.choice(INGREDIENTS)).capitalize()
+                         for _ in range(steps)) + '.'
+        return text[:500]
+
+    def timestamp(self):
+        return self.now - datetime.timedelta(seconds=self.rng.randint(0, 2 * 365 * 24 * 3600))
+
+    def run(self, users, categories, recipes):
+        """
+        Load `users` users with `categories` categories each and `recipes` recipes per category
+
+        :return: the number of rows and seconds spent per table
+        """
+        if sharding.enabled():
+            raise RuntimeError('The seeder loads unsharded databases only')
+        user_id = self.next_id(User)
+        category_id = self.next_id(Category)
+        recipe_id = self.next_id(Recipe)
+        buffers = {User: [], Category: [], Recipe: []}
+
+        for _ in range(users):
+            username = 'seed' + letters_for(user_id)
+            created = self.timestamp()
+            buffers[User].append({'id': user_id, 'username': username, 'email': username + '@seed.com',
+                                  'hashed_password': self.hashed_password, 'created_timestamp': created})
+            names, titles = set(), set()
+            for _ in range(categories):
+                name = zipf_choice(self.rng, CATEGORY_NAMES)
+                if name in names:
+                    name = '{0} {1}'.format(name, len(names) + 1)
+                names.add(name)
+                buffers[Category].append({'id': category_id, 'name': name, 'user_id': user_id,
+                                          'created_timestamp': created, 'modified_timestamp': created,
+                                          'recipe_count': recipes})
+                for _ in range(recipes):
+                    stamp = self.timestamp()
+                    body = self.body()
+                    buffers[Recipe].append({'id': recipe_id, 'title': self.title(titles), 'body': body,
+                                            'snippet': make_snippet(body), 'created_timestamp': stamp, 'modified_timestamp': stamp,
+                                            'category_id': category_id, 'user_id': user_id})
+                    recipe_id += 1
+                category_id += 1
+            user_id += 1
+            if len(buffers[Recipe]) + len(buffers[Category]) >= self.batch_size:
+                self.flush(buffers)
+        self.flush(buffers)
+        self.reset_sequences()
+        return self.stats
+
+    def next_id(self, model):
+        return (db.engine.execute(select([func.max(model.id)])).scalar() or 0) + 1
+
+    def flush(self, buffers):
+        # parents first so foreign keys are satisfied
+        for model in (User, Category, Recipe):
+            rows = buffers[model]
+            if not rows:
+                continue
+            start = time.time()
+            if db.engine.dialect.name == 'postgresql':
+                self.copy(model.__table__, rows)
+            else:
+                self.insert(model.__table__, rows)
+            count, seconds = self.stats.get(model.__tablename__, (0, 0.0))
+            self.stats[model.__tablename__] = (count + len(rows), seconds + time.time() - start)
+            del rows[:]
+
+    def copy(self, table, rows):
+        columns = list(rows[0])
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([row[column] for column in columns])
+        buffer.seek(0)
+        connection = db.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            cursor.copy_expert('COPY "{0}" ({1}) FROM STDIN WITH (FORMAT csv)'.format(
+                table.name, ', '.join(columns)), buffer)
+            connection.commit()
+        finally:
+            connection.close()
+
+    def insert(self, table, rows):
+        per_statement = max(1, SQLITE_MAX_VARIABLES // len(rows[0]))
+        with db.engine.begin() as connection:
+            for start in range(0, len(rows), per_statement):
+                connection.execute(table.insert().values(rows[start:start + per_statement]))
+
+    def reset_sequences(self):
+        if db.engine.dialect.name != 'postgresql':
+            return
+        # ids were assigned explicitly, move the sequences past them
+        for model in (User, Category, Recipe):
+            db.session.execute("SELECT setval(pg_get_serial_sequence('\"{0}\"', 'id'), "
+                               "(SELECT COALESCE(MAX(id), 1) FROM \"{0}\"))".format(model.__tablename__))
+        db.session.commit()
+
+
+def report(stats):
+    """
+    :return: lines describing rows loaded and rows per second for every table
+    """
+    lines = []
+    for table, (rows, seconds) in sorted(stats.items()):
+        lines.append('{0:<10}{1:>12} rows {2:>10.1f}s {3:>12.0f} rows/s'.format(
+            table, rows, seconds, rows / seconds if seconds else math.inf))
+    return lines
@@ -7,6 +7,14 @@ from flask_marshmallow import Marshmallow
 ma = Marshmallow()
 
 
+class NativeDateTime(fields.Field):
+    """
+    Datetime left as is for the response encoder, which writes it as ISO 8601 in UTC
+    """
+    def _serialize(self, value, attr, obj):
+        return value
+
+
 class UserSchema(ma.Schema):
     """
     User model schema
@@ -31,11 +39,21 @@ class CategorySchema(ma.Schema):
     id = fields.Integer(dump_only=True)
     name = fields.String(required=True, validate=validate.Length(3))
     url = ma.URLFor('api/categories.categoryresource', id='<id>', _external=True)
-    created_timestamp = ma.DateTime(format("rfc"), dump_only=True)
-    modified_timestamp = ma.DateTime(dump_only=True)
+    created_timestamp = NativeDateTime(dump_only=True)
+    modified_timestamp = NativeDateTime(dump_only=True)
+    recipe_count = fields.Integer(dump_only=True)
     recipes = fields.Nested('RecipeSchema', many=True,
                             exclude=('category',))
 
+    def get_attribute(self, attr, obj, default):
+        """
+        Read the recipes preloaded for a page of categories instead of querying per category
+        """
+        recipes = self.context.get('recipes')
+        if attr == 'recipes' and recipes is not None:
+            return recipes.get(obj.id, [])
+        return super(CategorySchema, self).get_attribute(attr, obj, default)
+
 
 class RecipeSchema(ma.Schema):
     """
@@ -44,6 +62,9 @@ class RecipeSchema(ma.Schema):
     id = fields.Integer(dump_only=True)
     title = fields.String(required=True, validate=validate.Length(1))
     body = fields.String(required=True, validate=validate.Length(3))
+    snippet = fields.String(dump_only=True)
+    public = fields.Boolean()
+    tags = fields.Function(lambda recipe: [tag.name for tag in recipe.tags])
     category_id = fields.Integer(dump_only=True)
     user_id = fields.Integer(dump_only=True)
     # url = ma.URLFor('api.reciperesource', id='<id>', _external=True)
@@ -66,3 +87,24 @@ class RecipeSchema(ma.Schema):
             category_dict = {}
         data['category'] = category_dict
         return data
+
+
+class PublicRecipeSchema(ma.Schema):
+    """
+    Schema of the shared recipes anyone can read
+    """
+    id = fields.Integer(dump_only=True)
+    title = fields.String(dump_only=True)
+    snippet = fields.String(dump_only=True)
+    body = fields.String(dump_only=True)
+    author = fields.String(dump_only=True)
+    created_timestamp = NativeDateTime(dump_only=True)
+    url = ma.URLFor('api/public.publicreciperesource', id='<id>', _external=True)
+
+    def get_attribute(self, attr, obj, default):
+        """
+        Read the author names loaded for the page from the users table, which may live in another database
+        """
+        if attr == 'author':
+            return self.context['authors'].get(obj.user_id)
+        return super(PublicRecipeSchema, self).get_attribute(attr, obj, default)
@@ -0,0 +1,332 @@
+# coding=utf-8
+import datetime
+import time
+
+from contextlib import contextmanager
+from itertools import chain
+from flask import current_app, g, has_request_context
+from sqlalchemy import MetaData, event, func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import set_committed_value
+from werkzeug.exceptions import ServiceUnavailable
+
+from api.database import SHARDED_TABLES, RoutingSession
+from api.models import db, User, Category, Recipe, Tag, Change, IdBlock, TrendingRecipe, recipe_tag
+
+# ids reserved per round trip to the directory
+ID_BLOCK_SIZE = 100
+# the user's rows in the order they are copied to another shard, parents first
+MOVED_TABLES = (Category.__table__, Tag.__table__, Recipe.__table__, recipe_tag, Change.__table__)
+
+# table name -> iterator over the ids left in the block this process reserved
+_id_blocks = {}
+
+
+class ShardMoving(ServiceUnavailable):
+    """
+    Raised when a write reaches a shard the user's data is moving off, answered like authentication does
+    """
+    description = 'Your data is being moved, try again shortly'
+
+    def get_headers(self, *args, **kwargs):
+        return super(ShardMoving, self).get_headers(*args, **kwargs) + [('Retry-After', '5')]
+
+
+def init_app(app):
+    """
+    Check the SHARDS setting, a list of SQLALCHEMY_BINDS holding the user data, empty when unsharded
+    """
+    app.config.setdefault('SHARDS', [])
+    missing = [shard for shard in app.config['SHARDS'] if shard not in (app.config.get('SQLALCHEMY_BINDS') or {})]
+    if missing:
+        raise ValueError('SHARDS names binds missing from SQLALCHEMY_BINDS: {0}'.format(', '.join(missing)))
+
+
+def enabled():
+    return bool(current_app.config.get('SHARDS'))
+
+
+def initial_shard(user_id):
+    """
+    :return: the shard a new user's data is placed on, only used to fill User.shard
+    """
+    shards = current_app.config['SHARDS']
+    return shards[user_id % len(shards)]
+
+
+def shard_of(user):
+    """
+    :return: the bind of the shard holding the user's data, as the directory says, None when unsharded
+    """
+    if not enabled():
+        return None
+    return user.shard
+
+
+@event.listens_for(User, 'after_insert')
+def pin_shard(mapper, connection, user):
+    """
+    Store the shard of a new user in the directory, adding or removing shards later must not move it
+    """
+    if user.shard is None and enabled():
+        shard = initial_shard(user.id)
+        users = User.__table__
+        connection.execute(users.update().where(users.c.id == user.id).values(shard=shard))
+        set_committed_value(user, 'shard', shard)
+
+
+def unpinned_users():
+    """
+    :return: the number of users without a shard in the directory
+    """
+    users = User.__table__
+    return db.engine.execute(select([func.count()]).select_from(users).where(users.c.shard.is_(None))).scalar()
+
+
+def check_directory():
+    """
+    Refuse to serve a sharded database while users lack a shard, their data could not be found
+    """
+    unpinned = unpinned_users() if enabled() else 0
+    if unpinned:
+        raise RuntimeError('{0} users have no shard, run `python manage.py pin_shards` before starting'.format(
+            unpinned))
+
+
+def pin_shards(batch_size=1000):
+    """
+    Store the shard of the users created before shards were pinned, where their id placed them
+
+    :return: the number of users pinned
+    """
+    users = User.__table__
+    pinned = 0
+    while True:
+        ids = [row[0] for row in db.engine.execute(select([users.c.id]).where(users.c.shard.is_(None)).order_by(
+            users.c.id).limit(batch_size))]
+        if not ids:
+            return pinned
+        with db.engine.begin() as connection:
+            for shard in current_app.config['SHARDS']:
+                connection.execute(users.update().where(users.c.id.in_(
+                    [user_id for user_id in ids if initial_shard(user_id) == shard])).values(shard=shard))
+        pinned += len(ids)
+
+
+def shard_engine(shard):
+    return db.get_engine(current_app, bind=shard) if shard else db.engine
+
+
+@contextmanager
+def using_shard(shard):
+    """
+    Send the session's queries on sharded tables to `shard` within the block
+    """
+    previous = g.get('shard')
+    g.shard = shard
+    try:
+        yield
+    finally:
+        g.shard = previous
+
+
+def each_shard():
+    """
+    Select every shard in turn, or the single database when unsharded
+    """
+    for shard in current_app.config['SHARDS'] or [None]:
+        with using_shard(shard):
+            yield shard
+
+
+def allocate_id(name):
+    """
+    :return: an id of table `name` no shard has used, reserving a block of them in the directory
+
+    No lock is held: a lock made in the preloaded master is not a gevent one and
+    would block the worker while a greenlet waits on the directory. next() hands
+    every id of a block out once; when requests run out of a block together each
+    reserves its own, the ids left in the block it replaces are skipped.
+    """
+    next_id = next(_id_blocks.get(name, iter(())), None)
+    if next_id is not None:
+        return next_id
+    end = reserve_ids(name, ID_BLOCK_SIZE)
+    _id_blocks[name] = iter(range(end - ID_BLOCK_SIZE + 1, end))
+    return end - ID_BLOCK_SIZE
+
+
+def reserve_ids(name, count):
+    """
+    :return: the end of `count` ids reserved for this process
+    """
+    blocks = IdBlock.__table__
+    reserve = blocks.update().where(blocks.c.name == name).values(next_id=blocks.c.next_id + count)
+    while True:
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                # one atomic statement per block
+                end = connection.execute(reserve.returning(blocks.c.next_id)).scalar()
+                if end is not None:
+                    return end
+            elif connection.execute(reserve).rowcount:
+                # sqlite holds the write lock of the update until the transaction ends
+                return connection.execute(select([blocks.c.next_id]).where(blocks.c.name == name)).scalar()
+        try:
+            with db.engine.begin() as connection:
+                connection.execute(blocks.insert().values(name=name, next_id=1 + count))
+            return 1 + count
+        except IntegrityError:
+            # another process created the row first, reserve after its block
+            continue
+
+
+@event.listens_for(Category, 'before_insert')
+@event.listens_for(Recipe, 'before_insert')
+@event.listens_for(Tag, 'before_insert')
+def assign_global_id(mapper, connection, target):
+    if target.id is None and enabled():
+        target.id = allocate_id(mapper.local_table.name)
+
+
+def fenced_users(connection, user_ids, shard):
+    """
+    Fence the writes of `connection`'s transaction on `shard` against moves of these users
+
+    On postgres the transaction holds a shared advisory lock per user until it ends,
+    move_user takes it exclusively on the source shard before copying, so a write
+    either sees the move in the directory or is copied by it.
+
+    :return: the ids of the users whose data is moving or no longer on `shard`
+    """
+    if connection.dialect.name == 'postgresql':
+        for user_id in sorted(user_ids):
+            connection.execute(select([func.pg_advisory_xact_lock_shared(user_id)]))
+    users = User.__table__
+    rows = db.engine.execute(select([users.c.id, users.c.shard, users.c.shard_moving]).where(
+        users.c.id.in_(user_ids)))
+    return set(row.id for row in rows if row.shard_moving or row.shard != shard)
+
+
+@event.listens_for(RoutingSession, 'before_flush')
+def fence_flush(session, flush_context, instances):
+    """
+    Check in the write transaction of a request that its user's data is still on the request's shard
+    """
+    if not (enabled() and has_request_context() and g.get('current_user_id') and g.get('shard')):
+        return
+    if any(type(instance).__table__.name in SHARDED_TABLES
+           for instance in chain(session.new, session.dirty, session.deleted)):
+        connection = session.connection(bind=shard_engine(g.shard))
+        if fenced_users(connection, [g.current_user_id], g.shard):
+            raise ShardMoving()
+
+
+def wait_for_writes(shard, user_id):
+    """
+    Wait for the write transactions of the user running on `shard` to end, on postgres
+    """
+    with shard_engine(shard).begin() as connection:
+        if connection.dialect.name == 'postgresql':
+            connection.execute(select([func.pg_advisory_xact_lock(user_id)]))
+
+
+def schema_tables(names):
+    """
+    :return: copies of the named tables without their foreign keys to tables outside of them
+    """
+    metadata = MetaData()
+    tables = [table.tometadata(metadata) for table in db.metadata.sorted_tables if table.name in names]
+    for table in tables:
+        for constraint in list(table.foreign_key_constraints):
+            if constraint.elements[0].target_fullname.split('.')[0] not in names:
+                table.constraints.discard(constraint)
+                table.foreign_keys.difference_update(constraint.elements)
+                for column in constraint.columns:
+                    column.foreign_keys.difference_update(constraint.elements)
+    return metadata
+
+
+def create_schema():
+    """
+    Create the directory tables in the default database and the user data tables in every shard
+    """
+    directory = set(db.metadata.tables) - SHARDED_TABLES
+    schema_tables(directory).create_all(db.engine)
+    for shard in current_app.config['SHARDS']:
+        schema_tables(SHARDED_TABLES).create_all(shard_engine(shard))
+
+
+def copy_rows(source, target, table, where, batch_size, keep_ids=True):
+    columns = [column for column in table.c if keep_ids or not column.primary_key]
+    query = select(columns).where(where)
+    if not keep_ids:
+        # new ids in the order of the old ones
+        query = query.order_by(*table.primary_key.columns)
+    result = source.execute(query)
+    copied = 0
+    while True:
+        rows = result.fetchmany(batch_size)
+        if not rows:
+            return copied
+        target.execute(table.insert(), [dict(zip([column.name for column in columns], row)) for row in rows])
+        copied += len(rows)
+
+
+def move_user(user_id, target_shard, batch_size=1000, grace=0):
+    """
+    Move the data of a user to another shard. Requests of the user get a 503
+    while the rows are copied, writes already past authentication are fenced
+    by fenced_users; the rows are deleted from the old shard once the user
+    points at the new one. Sync tokens issued before the move are rejected
+    with a 410, the change log is renumbered on the new shard. A failed move
+    can be run again, rows a previous attempt left on the target are replaced.
+
+    :param grace: seconds to let requests already past authentication finish before copying,
+        databases other than postgres rely on it to fence writes
+    :return: the number of rows moved per table
+    """
+    if target_shard not in current_app.config['SHARDS']:
+        raise ValueError('{0} is not one of the SHARDS'.format(target_shard))
+    user = User.query.get(user_id)
+    if user is None:
+        raise ValueError('There is no user {0}'.format(user_id))
+    source_shard = shard_of(user)
+    if source_shard == target_shard:
+        return {}
+    user.shard_moving = True
+    db.session.commit()
+    time.sleep(grace)
+    wait_for_writes(source_shard, user_id)
+
+    recipes = Recipe.__table__
+    user_recipes = select([recipes.c.id]).where(recipes.c.user_id == user_id)
+    moved = {}
+    try:
+        with shard_engine(source_shard).connect() as source, shard_engine(target_shard).begin() as target:
+            # children first, what an interrupted move copied before
+            for table in reversed(MOVED_TABLES):
+                target.execute(table.delete().where(
+                    table.c.recipe_id.in_(user_recipes) if table is recipe_tag else table.c.user_id == user_id))
+            for table in MOVED_TABLES:
+                where = table.c.recipe_id.in_(user_recipes) if table is recipe_tag else table.c.user_id == user_id
+                moved[table.name] = copy_rows(source, target, table, where, batch_size,
+                                              keep_ids=table is not Change.__table__)
+
+        user.shard = target_shard
+        user.shard_moved_at = datetime.datetime.utcnow()
+        user.shard_moving = False
+        trending = TrendingRecipe.__table__
+        db.session.execute(trending.update().where(trending.c.recipe_id.in_(
+            [row[0] for row in shard_engine(target_shard).execute(user_recipes)])).values(shard=target_shard))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        user.shard_moving = False
+        db.session.commit()
+        raise
+
+    from api.accounts import delete_in_batches
+    for table in (recipes, Tag.__table__, Category.__table__, Change.__table__):
+        delete_in_batches(table, user_id, batch_size, shard_engine(source_shard))
+    return moved
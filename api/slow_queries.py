@@ -0,0 +1,112 @@
+# coding=utf-8
+import json
+import logging
+import re
+
+from collections import OrderedDict
+from flask import current_app, g, request, has_app_context, has_request_context
+
+from api.query_events import on_query
+
+logger = logging.getLogger('api.slow_queries')
+
+# statement shape -> what is known about its slow executions in this worker
+_slow_statements = OrderedDict()
+
+_WHITESPACE = re.compile(r'\s+')
+# IN lists of any length share one shape
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%\(\w+\)s)\s*,)+\s*(?:\?|%\(\w+\)s)\s*\)')
+_EXPLAINABLE = ('SELECT', 'WITH', 'UPDATE', 'DELETE')
+
+
+def init_app(app):
+    """
+    Log statements slower than SLOW_QUERY_MS milliseconds with the endpoint and
+    user that ran them, and keep the plan of every slow statement shape when
+    SLOW_QUERY_EXPLAIN is enabled
+    """
+    if not app.config.get('SLOW_QUERY_MS'):
+        return
+    app.config.setdefault('SLOW_QUERY_EXPLAIN', False)
+    app.config.setdefault('SLOW_QUERY_MAX_STATEMENTS', 200)
+    on_query(_record_query)
+
+
+def statement_shape(statement):
+    """
+    :return: the statement with whitespace and IN lists normalized
+    """
+    return _PLACEHOLDER_LIST.sub('(?)', _WHITESPACE.sub(' ', statement).strip())
+
+
+def slow_statements():
+    """
+    :return: the slow statement shapes of this worker, the slowest in total first
+    """
+    return sorted(_slow_statements.values(), key=lambda entry: entry['total_ms'], reverse=True)
+
+
+def reset():
+    _slow_statements.clear()
+
+
+def _record_query(conn, statement, parameters, context, duration):
+    if not has_app_context():
+        return
+    threshold = current_app.config.get('SLOW_QUERY_MS')
+    duration_ms = duration * 1000
+    if not threshold or duration_ms < threshold:
+        return
+    endpoint = request.endpoint if has_request_context() else None
+    user_id = g.get('current_user_id')
+    logger.warning(json.dumps({'duration_ms': round(duration_ms, 2), 'endpoint': endpoint,
+                               'user_id': user_id, 'statement': statement}, sort_keys=True))
+
+    shape = statement_shape(statement)
+    entry = _slow_statements.get(shape)
+    if entry is None:
+        if len(_slow_statements) >= current_app.config['SLOW_QUERY_MAX_STATEMENTS']:
+            _slow_statements.popitem(last=False)
+        entry = _slow_statements[shape] = {'statement': shape, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                           'endpoints': [], 'plan': None}
+        if current_app.config['SLOW_QUERY_EXPLAIN'] and not getattr(context, 'executemany', False):
+            entry['plan'] = explain(conn, statement, parameters)
+    entry['count'] += 1
+    entry['total_ms'] = round(entry['total_ms'] + duration_ms, 2)
+    entry['max_ms'] = round(max(entry['max_ms'], duration_ms), 2)
+    if endpoint and endpoint not in entry['endpoints']:
+        entry['endpoints'].append(endpoint)
+
+
+def explain(conn, statement, parameters):
+    """
+    :return: the plan of `statement` as a list of lines, or None when it can not be explained.
+    The plan is read on a raw DBAPI cursor of the same connection, so the
+    statement sees the same data and the cursor hooks do not fire again.
+    """
+    if not statement.lstrip().upper().startswith(_EXPLAINABLE):
+        return None
+    dialect = conn.dialect.name
+    cursor = conn.connection.cursor()
+    try:
+        if dialect == 'postgresql':
+            # a failing EXPLAIN must not abort the request's transaction
+            cursor.execute('SAVEPOINT explain_slow_query')
+            try:
+                cursor.execute('EXPLAIN (ANALYZE off) ' + statement, parameters)
+                plan = [row[0] for row in cursor.fetchall()]
+            except Exception:
+                cursor.execute('ROLLBACK TO SAVEPOINT explain_slow_query')
+                raise
+            finally:
+                cursor.execute('RELEASE SAVEPOINT explain_slow_query')
+            return plan
+        if dialect == 'sqlite':
+            cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+            return [row[-1] for row in cursor.fetchall()]
+        return None
+    except Exception as error:
+        logger.info('Could not explain %s: %s', statement, error)
+        return None
+    finally:
+        cursor.close()
@@ -0,0 +1,83 @@
+# coding=utf-8
+import json
+import logging
+import time
+
+from contextlib import contextmanager
+from flask import g, request, has_request_context
+
+from api.query_events import on_query
+
+logger = logging.getLogger('api.timing')
+
+
+@contextmanager
+def timed(phase):
+    """
+    Add the time spent in the block to `phase` of the current request's
+    Server-Timing breakdown, does nothing when timing is off
+    """
+    timings = _current_timings()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[phase] = timings.get(phase, 0.0) + time.perf_counter() - start
+
+
+def init_app(app):
+    """
+    Record the phases of every request when SERVER_TIMING is enabled
+    """
+    if not app.config.get('SERVER_TIMING'):
+        return
+    on_query(_record_query)
+    app.before_request(_start_timing)
+    app.after_request(_emit_timing)
+
+
+def _current_timings():
+    if not has_request_context():
+        return None
+    return g.get('server_timing')
+
+
+def _record_query(conn, statement, parameters, context, duration):
+    timings = _current_timings()
+    if timings is not None:
+        timings['db'] = timings.get('db', 0.0) + duration
+        g.server_timing_queries += 1
+
+
+def _start_timing():
+    g.server_timing = {}
+    g.server_timing_queries = 0
+    g.server_timing_start = time.perf_counter()
+
+
+def _emit_timing(response):
+    timings = g.pop('server_timing', None)
+    if timings is None:
+        return response
+    timings['total'] = time.perf_counter() - g.server_timing_start
+    metrics = []
+    for phase, seconds in timings.items():
+        if phase == 'db':
+            metrics.append('db;desc="{0} queries";dur={1:.2f}'.format(g.server_timing_queries, seconds * 1000))
+        else:
+            metrics.append('{0};dur={1:.2f}'.format(phase, seconds * 1000))
+    response.headers['Server-Timing'] = ', '.join(metrics)
+
+    line = dict(('{0}_ms'.format(phase), round(seconds * 1000, 2)) for phase, seconds in timings.items())
+    line.update({
+        'method': request.method,
+        'endpoint': request.endpoint,
+        'status': response.status_code,
+        'user_id': g.get('current_user_id'),
+        'queries': g.server_timing_queries,
+    })
+    logger.info(json.dumps(line, sort_keys=True))
+    return response
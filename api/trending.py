@@ -0,0 +1,113 @@
+# coding=utf-8
+import datetime
+import time
+
+from flask import current_app
+from sqlalchemy import bindparam, select
+
+from api.models import db, Recipe, TrendingRecipe, User
+from api.sharding import each_shard, enabled, fenced_users, shard_engine
+
+# (owner id, recipe id) -> views counted by this process and not written yet
+_pending_views = {}
+# when the pending views were last written
+_last_flush = [0.0]
+
+
+def init_app(app):
+    # gunicorn_config.worker_exit writes the views a worker still holds when it stops
+    app.config.setdefault('VIEW_FLUSH_SECONDS', 10)
+
+
+def record_view(recipe_id, user_id):
+    """
+    Count a view of a shared recipe. Views are added up in the process and
+    written at most every VIEW_FLUSH_SECONDS, so a popular recipe costs one
+    update per window instead of one per view. Views of a process that dies
+    before writing them are lost, like the views a cache answers.
+
+    :param user_id: the owner of the recipe, the directory tells which shard holds it
+    """
+    key = (user_id, recipe_id)
+    _pending_views[key] = _pending_views.get(key, 0) + 1
+    now = time.time()
+    if now - _last_flush[0] >= current_app.config['VIEW_FLUSH_SECONDS']:
+        _last_flush[0] = now
+        flush_views()
+
+
+def flush_views():
+    """
+    Write the pending views, straight on the primary so a replica read request can
+    still count them, one transaction per database. Views go to the shard holding
+    the owner when they are written, those of owners whose data is moving wait
+    for the next flush.
+    """
+    pending = {}
+    # popitem does not lose views counted while the writes below wait on the database
+    while _pending_views:
+        key, views = _pending_views.popitem()
+        pending[key] = views
+    if not pending:
+        return
+    shards = {}
+    if enabled():
+        users = User.__table__
+        shards = dict(db.engine.execute(select([users.c.id, users.c.shard]).where(
+            users.c.id.in_(set(user_id for user_id, _ in pending)))).fetchall())
+    by_shard = {}
+    for (user_id, recipe_id), views in pending.items():
+        # the views of purged accounts are dropped with their recipes
+        if not enabled() or user_id in shards:
+            by_shard.setdefault(shards.get(user_id), {})[user_id, recipe_id] = views
+
+    recipes = Recipe.__table__
+    # keep the modified timestamp, a view is not an edit
+    update = recipes.update().where(recipes.c.id == bindparam('recipe_id')).values(
+        view_count=recipes.c.view_count + bindparam('views'), modified_timestamp=recipes.c.modified_timestamp)
+    for shard, views in by_shard.items():
+        with shard_engine(shard).begin() as connection:
+            fenced = fenced_users(connection, set(user_id for user_id, _ in views), shard) if shard else set()
+            rows = [{'recipe_id': recipe_id, 'views': count}
+                    for (user_id, recipe_id), count in views.items() if user_id not in fenced]
+            if rows:
+                connection.execute(update, rows)
+        for (user_id, recipe_id), count in views.items():
+            if user_id in fenced:
+                _pending_views[user_id, recipe_id] = _pending_views.get((user_id, recipe_id), 0) + count
+
+
+def refresh_trending(now=None):
+    """
+    Rebuild the trending table from the shared recipes of the last TRENDING_DAYS,
+    most viewed and then newest first, merging the top of every shard. The rows
+    are replaced in one transaction, readers keep seeing the previous ranking
+    until it commits.
+
+    A materialized view refreshed CONCURRENTLY would give readers the same
+    guarantee on a single Postgres database, but it can only rank the recipes of
+    the database it lives in, while with DATABASE_SHARD_URLS the candidates come
+    from every shard and are merged here.
+
+    :return: the number of ranked recipes
+    """
+    # recipes are stamped in local time
+    now = now or datetime.datetime.utcnow()
+    since = now - datetime.timedelta(days=current_app.config['TRENDING_DAYS'])
+    size = current_app.config['TRENDING_SIZE']
+    recipes = Recipe.__table__
+    trending = TrendingRecipe.__table__
+    top = select([recipes.c.id, recipes.c.view_count]).where(
+        recipes.c.public & (recipes.c.created_timestamp >= since)).order_by(
+        recipes.c.view_count.desc(), recipes.c.id.desc()).limit(size)
+    candidates = []
+    for shard in each_shard():
+        candidates.extend((view_count, recipe_id, shard) for recipe_id, view_count in shard_engine(shard).execute(top))
+    candidates.sort(key=lambda candidate: candidate[:2], reverse=True)
+    rows = [{'rank': rank, 'recipe_id': recipe_id, 'shard': shard, 'view_count': view_count, 'refreshed_at': now}
+            for rank, (view_count, recipe_id, shard) in enumerate(candidates[:size], 1)]
+    with db.engine.begin() as connection:
+        connection.execute(trending.delete())
+        if rows:
+            connection.execute(trending.insert(), rows)
+    return len(rows)
@@ -0,0 +1,155 @@
+# coding=utf-8
+import re
+
+from functools import wraps
+from flask import request
+from werkzeug.exceptions import BadRequest
+
+from api import status
+
+INVALID_JSON = {"error": "payload must be a valid json"}
+REQUIRED = 'Missing data for required field.'
+BLANK = 'No input data provided'
+TYPE_ERRORS = {str: 'Not a valid string.', bool: 'Not a valid boolean.', list: 'Not a valid list.'}
+
+# values without a letter or digit count as blank
+HAS_CONTENT = re.compile(r'[a-zA-Z0-9]')
+
+
+class Check(object):
+    """
+    A test of a field value and the message reported when it fails, built once per endpoint
+    """
+    def __init__(self, test, message):
+        self.test = test
+        self.message = message
+
+    def __call__(self, value):
+        return None if self.test(value) else self.message.format(value)
+
+
+def matches(pattern, message):
+    """
+    :return: a check passing when the compiled pattern is found in the value
+    """
+    search = re.compile(pattern).search
+    return Check(lambda value: search(value) is not None, message)
+
+
+def excludes(pattern, message):
+    """
+    :return: a check passing when the compiled pattern is not found in the value
+    """
+    search = re.compile(pattern).search
+    return Check(lambda value: search(value) is None, message)
+
+
+def min_length(length, message=None):
+    return Check(lambda value: len(value) >= length, message or 'Shorter than minimum length {0}.'.format(length))
+
+
+def max_length(length, message=None):
+    return Check(lambda value: len(value) <= length, message or 'Longer than maximum length {0}.'.format(length))
+
+
+class Field(object):
+    """
+    A field of a request body: its type, whether it is required, and the checks its value must pass
+
+    :param strip: strip the whitespace around strings before checking them
+    :param not_blank: reject strings without a letter or digit, before any other check
+    :param checks: Check instances, every failing one is reported
+    :param parse: a function turning the value into the payload's, returning it and an error message
+    :param default: the payload's value when an optional field is left out
+    """
+    def __init__(self, type=str, required=True, strip=True, not_blank=False, checks=(), parse=None,
+                 default=None, type_error=None):
+        self.type = type
+        self.required = required
+        self.strip = strip and type is str
+        self.not_blank = not_blank
+        self.checks = tuple(checks)
+        self.parse = parse
+        self.default = default
+        self.type_error = type_error or TYPE_ERRORS[type]
+
+    def load(self, value):
+        """
+        :return: the value for the payload and the list of its errors
+        """
+        # an exact match, json's true must not pass for a number nor 1 for true
+        if type(value) is not self.type:
+            return None, [self.type_error]
+        if self.strip:
+            value = value.strip()
+        if self.not_blank and HAS_CONTENT.search(value) is None:
+            return None, [BLANK]
+        errors = [error for error in (check(value) for check in self.checks) if error is not None]
+        if errors:
+            return None, errors
+        if self.parse is not None:
+            value, error = self.parse(value)
+            if error:
+                return None, [error]
+        return value, []
+
+
+class Validator(object):
+    """
+    Validates a request body against the fields of an endpoint in one pass, reporting the errors of all fields
+
+    :param fields: field name -> Field
+    :param empty_message: the message answering a missing or empty body
+    :param partial: make every field optional and accept an empty body, for updates
+    """
+    def __init__(self, fields, empty_message=BLANK, partial=False):
+        self.fields = fields
+        self.empty_message = empty_message
+        self.partial = partial
+
+    def load(self, data):
+        """
+        :return: the payload holding the loaded value of every field sent or with a default,
+            and the errors by field name
+        """
+        payload, errors = {}, {}
+        for name, field in self.fields.items():
+            if name not in data:
+                if field.required and not self.partial:
+                    errors[name] = [REQUIRED]
+                elif field.default is not None and not self.partial:
+                    payload[name] = field.default() if callable(field.default) else field.default
+                continue
+            value, field_errors = field.load(data[name])
+            if field_errors:
+                errors[name] = field_errors
+            else:
+                payload[name] = value
+        return payload, errors
+
+
+def validates(validator, force=False):
+    """
+    Parse the json body of the request once and validate it, passing the payload to
+    the handler as the `payload` keyword argument. Invalid bodies get a 400 listing
+    the errors of every field.
+
+    :param force: parse the body whatever its content type
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                data = request.get_json(force=force)
+            except BadRequest:
+                return INVALID_JSON, status.HTTP_400_BAD_REQUEST
+            if not data and not validator.partial:
+                return {'message': validator.empty_message}, status.HTTP_400_BAD_REQUEST
+            if not isinstance(data, dict):
+                return INVALID_JSON, status.HTTP_400_BAD_REQUEST
+            payload, errors = validator.load(data)
+            if errors:
+                return {'message': errors}, status.HTTP_400_BAD_REQUEST
+            return f(*args, payload=payload, **kwargs)
+        return decorated
+    return decorator
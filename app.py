@@ -30,17 +30,47 @@ def create_app(config_filename):
                              ],
                              "produces": [
                                  "application/json",
+                                 "application/msgpack",
                        ], }
 
     Swagger(app)
+    from api import apispec
+    apispec.init_app(app)
 
     from api.models import db
+    from api import sharding
     db.init_app(app)
+    sharding.init_app(app)
+    app.config.setdefault('CHANGES_PAGE_SIZE', 100)
+    app.config.setdefault('CHANGES_MAX_PAGE_SIZE', 500)
+    app.config.setdefault('CHANGES_RETENTION_DAYS', 30)
+    app.config.setdefault('PUBLIC_PAGE_SIZE', 20)
+    app.config.setdefault('PUBLIC_MAX_PAGE_SIZE', 100)
+    app.config.setdefault('PUBLIC_CACHE_MAX_AGE', 60)
+    app.config.setdefault('PUBLIC_CACHE_STALE_SECONDS', 600)
+    app.config.setdefault('TRENDING_DAYS', 7)
+    app.config.setdefault('TRENDING_SIZE', 1000)
+    from api import notifications, trending
+    notifications.init_app(app)
+    trending.init_app(app)
+
+    from api import timing, metrics, profiling, slow_queries
+    timing.init_app(app)
+    metrics.init_app(app)
+    profiling.init_app(app)
+    slow_queries.init_app(app)
 
     from api.endpoints.recipes import api_bp
     app.register_blueprint(api_bp, url_prefix='/api')
-    from api.endpoints.user import api_bp
+    from api.endpoints.user import api_bp, mail
+    mail.init_app(app)
     app.register_blueprint(api_bp,url_prefix='/api/auth')
     from api.endpoints.categories import api_bp
     app.register_blueprint(api_bp, url_prefix='/api/categories')
+    from api.endpoints.changes import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/changes')
+    from api.endpoints.public import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/public')
+    from api.endpoints.admin import api_bp
+    app.register_blueprint(api_bp, url_prefix='/api/admin')
     return app
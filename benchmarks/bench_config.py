@@ -0,0 +1,11 @@
+# coding=utf-8
+import os
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+DEBUG = False
+SQLALCHEMY_ECHO = False
+SQLALCHEMY_TRACK_MODIFICATIONS = False
+SQLALCHEMY_DATABASE_URI = os.getenv("BENCH_DATABASE_URL", "sqlite:///" + os.path.join(basedir, 'bench.db'))
+PAGINATION_PAGE_SIZE = 5
+PAGINATION_PAGE_ARGUMENT_NAME = 'page'
+SECRET_KEY = "benchmarksecret"
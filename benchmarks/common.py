@@ -0,0 +1,63 @@
+# coding=utf-8
+import json
+import os
+import subprocess
+import sys
+import time
+
+from urllib.error import HTTPError, URLError
+from urllib.request import Request, urlopen
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def call(url, data=None, headers=None, method=None):
+    """
+    :return: the status code and decoded json body of a request
+    """
+    headers = dict(headers or {})
+    body = None
+    if data is not None:
+        body = json.dumps(data).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    request = Request(url, data=body, headers=headers, method=method)
+    try:
+        with urlopen(request, timeout=60) as response:
+            return response.status, json.loads(response.read().decode('utf-8') or 'null')
+    except HTTPError as error:
+        return error.code, None
+
+
+def wait_until_up(base_url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urlopen(base_url + '/apidocs/', timeout=1)
+            return
+        except (URLError, ConnectionError, OSError):
+            time.sleep(0.2)
+    raise RuntimeError('gunicorn did not start on {0}'.format(base_url))
+
+
+def start_gunicorn(port, **env):
+    """
+    Start gunicorn with gunicorn_config.py and wait until it serves requests
+    """
+    env = dict(os.environ, PORT=str(port), **env)
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn_config.py', 'run:app'],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until_up('http://127.0.0.1:{0}'.format(port))
+    except RuntimeError:
+        server.terminate()
+        raise
+    return server
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))
+    return ordered[index]
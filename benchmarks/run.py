@@ -0,0 +1,218 @@
+# coding=utf-8
+"""
+HTTP load benchmark of the API
+
+Seeds the benchmark database (benchmarks/bench_config.py, BENCH_DATABASE_URL)
+with a deterministic dataset, replays a weighted mix of login, list, search,
+create and delete requests through the WSGI app or a local gunicorn, and
+reports throughput and p50/p95/p99 latencies per operation.
+
+    python -m benchmarks.run --users 20 --categories 5 --recipes 20 --requests 2000
+    python -m benchmarks.run --target gunicorn --concurrency 20
+    python -m benchmarks.run --save-baseline      # store benchmarks/baseline.json
+    python -m benchmarks.run --baseline benchmarks/baseline.json
+
+When a baseline is given, an operation whose p95 grew, or a run whose
+throughput dropped, by more than --tolerance is reported as a regression and
+the command exits with status 1.
+"""
+import argparse
+import json
+import os
+import queue
+import random
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+
+from app import create_app
+from benchmarks import seed
+from benchmarks.common import call, percentile, start_gunicorn
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+# relative weight of every operation in the request mix
+MIX = OrderedDict([
+    ('login', 5),
+    ('list_categories', 30),
+    ('list_recipes', 25),
+    ('search_recipes', 20),
+    ('create_recipe', 10),
+    ('delete_recipe', 10),
+])
+
+
+def plan(dataset, requests, rng):
+    """
+    :return: the deterministic list of (operation, user, method, url, body) to replay
+    """
+    operations = list(MIX)
+    weights = list(MIX.values())
+    deletable = [list(user['recipes']) for user in dataset]
+    steps = []
+    for number in range(requests):
+        operation = rng.choices(operations, weights)[0]
+        user = rng.randrange(len(dataset))
+        category = rng.choice(dataset[user]['categories'])
+        if operation == 'delete_recipe' and not deletable[user]:
+            operation = 'list_recipes'
+        if operation == 'login':
+            steps.append((operation, user, 'POST', '/api/auth/login/',
+                          {'username': dataset[user]['username'], 'password': seed.PASSWORD}))
+        elif operation == 'list_categories':
+            steps.append((operation, user, 'GET', '/api/categories/?page={0}'.format(rng.randint(1, 2)), None))
+        elif operation == 'list_recipes':
+            steps.append((operation, user, 'GET', '/api/category/{0}/recipes/'.format(category), None))
+        elif operation == 'search_recipes':
+            steps.append((operation, user, 'GET', '/api/category/{0}/recipes/?q={1}'.format(
+                category, rng.choice(seed.WORDS)), None))
+        elif operation == 'create_recipe':
+            steps.append((operation, user, 'POST', '/api/category/{0}/recipes/'.format(category),
+                          {'title': 'benchmark recipe {0}'.format(number), 'body': 'Mix and bake it well'}))
+        else:
+            recipe = deletable[user].pop(rng.randrange(len(deletable[user])))
+            steps.append((operation, user, 'DELETE', '/api/recipes/{0}'.format(recipe), None))
+    return steps
+
+
+def replay_wsgi(app, steps, tokens):
+    client = app.test_client()
+    samples = []
+    for operation, user, method, url, body in steps:
+        data = json.dumps(body) if body is not None else None
+        start = time.perf_counter()
+        response = client.open(url, method=method, data=data, content_type='application/json',
+                               headers={'x-access-token': tokens[user]})
+        samples.append((operation, time.perf_counter() - start, response.status_code))
+    return samples
+
+
+def replay_http(base_url, steps, tokens, concurrency):
+    pending = queue.Queue()
+    for step in steps:
+        pending.put(step)
+    samples = []
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            try:
+                operation, user, method, url, body = pending.get_nowait()
+            except queue.Empty:
+                return
+            start = time.perf_counter()
+            code, _ = call(base_url + url, body, {'x-access-token': tokens[user]}, method)
+            with lock:
+                samples.append((operation, time.perf_counter() - start, code))
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return samples
+
+
+def summarize(samples, elapsed):
+    operations = OrderedDict()
+    for operation in MIX:
+        latencies = [latency for name, latency, _ in samples if name == operation]
+        if not latencies:
+            continue
+        operations[operation] = {
+            'requests': len(latencies),
+            'errors': len([code for name, _, code in samples if name == operation and code >= 500]),
+            'throughput': round(len(latencies) / elapsed, 2),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+        }
+    return {'requests': len(samples), 'seconds': round(elapsed, 2),
+            'throughput': round(len(samples) / elapsed, 2), 'operations': operations}
+
+
+def regressions(report, baseline, tolerance):
+    """
+    :return: descriptions of the metrics that got worse than the baseline allows
+    """
+    found = []
+    if report['throughput'] < baseline['throughput'] * (1 - tolerance):
+        found.append('throughput {0}/s is below the baseline {1}/s'.format(
+            report['throughput'], baseline['throughput']))
+    for operation, stats in report['operations'].items():
+        base = baseline['operations'].get(operation)
+        if base and stats['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+            found.append('{0} p95 {1}ms is above the baseline {2}ms'.format(
+                operation, stats['p95_ms'], base['p95_ms']))
+    return found
+
+
+def print_report(report):
+    print('{0:<18}{1:>9}{2:>8}{3:>12}{4:>10}{5:>10}{6:>10}'.format(
+        'operation', 'requests', 'errors', 'req/s', 'p50 ms', 'p95 ms', 'p99 ms'))
+    for operation, stats in report['operations'].items():
+        print('{0:<18}{1:>9}{2:>8}{3:>12}{4:>10}{5:>10}{6:>10}'.format(
+            operation, stats['requests'], stats['errors'], stats['throughput'],
+            stats['p50_ms'], stats['p95_ms'], stats['p99_ms']))
+    print('{0} requests in {1}s, {2} req/s'.format(report['requests'], report['seconds'], report['throughput']))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--users', type=int, default=10)
+    parser.add_argument('--categories', type=int, default=5, help='categories per user')
+    parser.add_argument('--recipes', type=int, default=20, help='recipes per category')
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--target', choices=('wsgi', 'gunicorn'), default='wsgi')
+    parser.add_argument('--concurrency', type=int, default=10, help='clients for the gunicorn target')
+    parser.add_argument('--port', type=int, default=8766)
+    parser.add_argument('--baseline', help='baseline json to compare against')
+    parser.add_argument('--save-baseline', nargs='?', const=BASELINE, help='store the report as the baseline')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed relative slowdown')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    app = create_app('benchmarks.bench_config')
+    with app.app_context():
+        dataset = seed.seed(args.users, args.categories, args.recipes, args.seed)
+    steps = plan(dataset, args.requests, rng)
+
+    client = app.test_client()
+    tokens = []
+    for user in dataset:
+        response = client.post('/api/auth/login/', content_type='application/json',
+                               data=json.dumps({'username': user['username'], 'password': seed.PASSWORD}))
+        tokens.append(json.loads(response.get_data(as_text=True))['token'])
+
+    start = time.perf_counter()
+    if args.target == 'wsgi':
+        samples = replay_wsgi(app, steps, tokens)
+    else:
+        server = start_gunicorn(args.port, DATABASE_URL=app.config['SQLALCHEMY_DATABASE_URI'])
+        try:
+            start = time.perf_counter()
+            samples = replay_http('http://127.0.0.1:{0}'.format(args.port), steps, tokens, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+    report = summarize(samples, time.perf_counter() - start)
+    report['settings'] = {'users': args.users, 'categories': args.categories, 'recipes': args.recipes,
+                          'requests': args.requests, 'seed': args.seed, 'target': args.target}
+    print_report(report)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            found = regressions(report, json.load(baseline_file), args.tolerance)
+        for regression in found:
+            print('REGRESSION: ' + regression)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,30 @@
+# coding=utf-8
+from api.models import db
+from api.seed import Seeder, SEED_PASSWORD, INGREDIENTS, letters_for
+
+PASSWORD = SEED_PASSWORD
+# search terms, every one of them appears in recipe titles
+WORDS = INGREDIENTS
+
+
+def seed(users, categories, recipes, seed=0):
+    """
+    Recreate the schema and load `users` users with `categories` categories
+    each and `recipes` recipes per category. All users share one password hash.
+
+    :return: the usernames, the category ids and the recipe ids of every user
+    """
+    db.drop_all()
+    db.create_all()
+    Seeder(seed).run(users, categories, recipes)
+
+    dataset = []
+    for number in range(users):
+        first_category = number * categories + 1
+        first_recipe = number * categories * recipes + 1
+        dataset.append({
+            'username': 'seed' + letters_for(number + 1),
+            'categories': list(range(first_category, first_category + categories)),
+            'recipes': list(range(first_recipe, first_recipe + categories * recipes)),
+        })
+    return dataset
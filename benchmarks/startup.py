@@ -0,0 +1,87 @@
+# coding=utf-8
+"""
+Measure application startup
+
+Cold starts run `create_app` in a fresh interpreter, so they include importing
+Flask, SQLAlchemy and every endpoint module, the way a gunicorn worker boots.
+Warm starts call `create_app` again in an interpreter that already imported
+everything, the way every test case does. The first swagger spec request is
+timed with the spec generated from the docstrings and served from the file
+built by `manage.py build_apispec`.
+
+    python -m benchmarks.startup --runs 10
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.common import ROOT, percentile
+
+COLD_START = ("import time; start = time.perf_counter(); from app import create_app; "
+              "create_app('benchmarks.bench_config'); print(time.perf_counter() - start)")
+
+
+def cold_starts(runs):
+    timings = []
+    for _ in range(runs):
+        output = subprocess.check_output([sys.executable, '-c', COLD_START], cwd=ROOT)
+        timings.append(float(output.decode().strip().splitlines()[-1]))
+    return timings
+
+
+def warm_starts(runs):
+    from app import create_app
+    create_app('benchmarks.bench_config')
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        create_app('benchmarks.bench_config')
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def first_apispec_requests(runs, apispec_file=None):
+    from app import create_app
+    from benchmarks import bench_config
+    timings = []
+    for _ in range(runs):
+        bench_config.APISPEC_FILE = apispec_file
+        app = create_app('benchmarks.bench_config')
+        start = time.perf_counter()
+        app.test_client().get('/apispec_1.json')
+        timings.append(time.perf_counter() - start)
+    bench_config.APISPEC_FILE = None
+    return timings
+
+
+def summary(timings):
+    return {'min_ms': round(min(timings) * 1000, 1),
+            'p50_ms': round(percentile(timings, 0.50) * 1000, 1),
+            'max_ms': round(max(timings) * 1000, 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    from app import create_app
+    from api.apispec import write
+    with tempfile.TemporaryDirectory() as directory:
+        apispec_file = os.path.join(directory, 'apispec.json')
+        write(create_app('benchmarks.bench_config'), apispec_file)
+        results = {
+            'create_app_cold': summary(cold_starts(args.runs)),
+            'create_app_warm': summary(warm_starts(args.runs)),
+            'apispec_generated': summary(first_apispec_requests(args.runs)),
+            'apispec_static': summary(first_apispec_requests(args.runs, apispec_file)),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# coding=utf-8
+"""
+Measure the cost of validating the body of a write request
+
+Times the validation of the recipe, category and registration bodies with the
+declarative validators of api.validation, against the checks the handlers ran
+before them: validate_json, a second get_json, the marshmallow schema and the
+re.search calls of the models, copied below. Every run parses the body of a
+fresh request context, only the validation itself is timed.
+
+    python -m benchmarks.validation --runs 20000
+"""
+import argparse
+import json
+import re
+import time
+
+from flask import request
+from werkzeug.exceptions import BadRequest
+
+from benchmarks.common import percentile
+
+BODIES = {
+    'recipe': {'title': 'meat soup', 'body': 'Pour, mix and cook the meat', 'public': True,
+               'tags': ['dinner', 'soup']},
+    'category': {'name': 'soups'},
+    'register': {'username': 'kevin', 'password': 'P@ssword1', 'email': 'samoeikev@gmail.com'},
+}
+
+
+def legacy_validate_json():
+    try:
+        request.json
+    except BadRequest:
+        return False
+    return True
+
+
+def legacy_validate_data(ctx, message="The parameter has more than one spaces in: {}"):
+    if re.search(r'[a-zA-Z0-9]', ctx) is None:
+        return "No input data provided", False
+    if '  ' in ctx:
+        return message.format(ctx), False
+    return "", True
+
+
+def legacy_password(password):
+    if len(password) < 8:
+        return "The password is too short", False
+    if len(password) > 32:
+        return "The password is too long", False
+    if re.search(r'[A-Z]', password) is None:
+        return "The password must include at least one uppercase letter", False
+    if re.search(r'[a-z]', password) is None:
+        return 'The password must include at least one lowercase letter', False
+    if re.search(r'\d', password) is None:
+        return "The password must include at least one number", False
+    if re.search(r"[@!#$%&'()*+,-./[\\\]^_`{|}~"+r'"]', password) is None:
+        return "The password must include at least one symbol", False
+    if ' ' in password:
+        return "The parameter password has spaces in: {}".format(password), False
+    return "", True
+
+
+def legacy_checks():
+    """
+    :return: name -> the checks a handler ran on its body before api.validation
+    """
+    from api.endpoints.recipes import parse_tags
+    from api.serializers import CategorySchema, RecipeSchema, UserSchema
+    recipe_schema, category_schema, user_schema = RecipeSchema(), CategorySchema(), UserSchema()
+
+    def recipe():
+        legacy_validate_json()
+        data = request.get_json()
+        if recipe_schema.validate(data):
+            return
+        legacy_validate_data(data['title'].title())
+        legacy_validate_data(data['body'].strip())
+        isinstance(data.get('public', False), bool)
+        parse_tags(data.get('tags', []))
+
+    def category():
+        legacy_validate_json()
+        data = request.get_json()
+        if category_schema.validate(data):
+            return
+        legacy_validate_data(data['name'].strip())
+
+    def register():
+        legacy_validate_json()
+        data = request.get_json()
+        if user_schema.validate(data):
+            return
+        re.match(r'[A-Za-z]+$', data['username'].lower())
+        legacy_validate_data(data['username'].lower())
+        legacy_password(data['password'])
+
+    return {'recipe': recipe, 'category': category, 'register': register}
+
+
+def declarative_checks():
+    """
+    :return: name -> the validating decorator of the handler around a no-op
+    """
+    from api.endpoints.categories import new_category
+    from api.endpoints.recipes import new_recipe
+    from api.endpoints.user import new_user
+    from api.validation import validates
+    return {name: validates(validator)(lambda payload: payload)
+            for name, validator in (('recipe', new_recipe), ('category', new_category), ('register', new_user))}
+
+
+def time_checks(app, checks, runs):
+    results = {}
+    for name, check in sorted(checks.items()):
+        body = json.dumps(BODIES[name])
+        timings = []
+        for _ in range(runs):
+            with app.test_request_context(method='POST', data=body, content_type='application/json'):
+                start = time.perf_counter()
+                check()
+                timings.append(time.perf_counter() - start)
+        results[name] = {'p50_us': round(percentile(timings, 0.50) * 1e6, 1),
+                         'p99_us': round(percentile(timings, 0.99) * 1e6, 1),
+                         'mean_us': round(sum(timings) / len(timings) * 1e6, 1)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=20000)
+    args = parser.parse_args()
+
+    from app import create_app
+    app = create_app('benchmarks.bench_config')
+    with app.app_context():
+        results = {
+            'before': time_checks(app, legacy_checks(), args.runs),
+            'after': time_checks(app, declarative_checks(), args.runs),
+        }
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
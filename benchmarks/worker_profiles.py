@@ -0,0 +1,117 @@
+# coding=utf-8
+"""
+Compare gunicorn worker profiles under concurrent load
+
+Starts gunicorn with gunicorn_config.py once per worker class, with the same
+number of workers, then keeps `--concurrency` clients busy against one
+endpoint for `--duration` seconds. For every profile it reports completed
+requests per second, requests per second per worker, latency percentiles and
+the resident memory of the workers, so profiles can be compared at equal
+memory.
+
+    DATABASE_URL=postgresql://localhost/recipe \\
+        python -m benchmarks.worker_profiles --workers 2 --concurrency 50
+
+The difference shows on endpoints that wait on I/O (postgres, SMTP); CPU bound
+work such as password hashing gains nothing from green threads.
+"""
+import argparse
+import json
+import threading
+import time
+import uuid
+
+from benchmarks.common import call, percentile, start_gunicorn
+
+
+def worker_rss_kb(master_pid):
+    """
+    :return: the summed resident memory of the gunicorn workers, in kilobytes
+    """
+    total = 0
+    with open('/proc/{0}/task/{0}/children'.format(master_pid)) as children:
+        for pid in children.read().split():
+            with open('/proc/{0}/status'.format(pid)) as status:
+                for line in status:
+                    if line.startswith('VmRSS:'):
+                        total += int(line.split()[1])
+    return total
+
+
+def load(base_url, path, token, concurrency, duration):
+    """
+    Keep `concurrency` clients busy and collect request latencies
+    """
+    latencies = []
+    errors = []
+    deadline = time.time() + duration
+    lock = threading.Lock()
+
+    def client():
+        while time.time() < deadline:
+            start = time.time()
+            code, _ = call(base_url + path, headers={'x-access-token': token})
+            elapsed = time.time() - start
+            with lock:
+                if code < 500:
+                    latencies.append(elapsed)
+                else:
+                    errors.append(code)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors
+
+
+def run_profile(worker_class, args):
+    server = start_gunicorn(args.port, GUNICORN_WORKER_CLASS=worker_class,
+                            WEB_CONCURRENCY=str(args.workers))
+    base_url = 'http://127.0.0.1:{0}'.format(args.port)
+    try:
+        username = 'bench' + uuid.uuid4().hex[:8].translate(str.maketrans('0123456789', 'abcdefghij'))
+        password = 'P@ssword1'
+        call(base_url + '/api/auth/register/',
+             {'username': username, 'password': password, 'email': username + '@bench.com'})
+        _, login = call(base_url + '/api/auth/login/', {'username': username, 'password': password})
+        token = login['token']
+        call(base_url + '/api/categories/', {'name': 'soup'}, {'x-access-token': token})
+
+        latencies, errors = load(base_url, args.path, token, args.concurrency, args.duration)
+        rss = worker_rss_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    throughput = len(latencies) / float(args.duration)
+    return {
+        'worker_class': worker_class,
+        'workers': args.workers,
+        'requests_per_second': round(throughput, 1),
+        'requests_per_second_per_worker': round(throughput / args.workers, 1),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1),
+        'errors': len(errors),
+        'worker_rss_mb': round(rss / 1024.0, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--profiles', default='sync,gevent', help='comma separated worker classes')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--concurrency', type=int, default=50, help='concurrent clients')
+    parser.add_argument('--duration', type=int, default=20, help='seconds of load per profile')
+    parser.add_argument('--path', default='/api/categories/', help='endpoint to load')
+    parser.add_argument('--port', type=int, default=8765)
+    args = parser.parse_args()
+
+    results = [run_profile(worker_class, args) for worker_class in args.profiles.split(',')]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
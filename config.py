@@ -9,7 +9,81 @@ SQLALCHEMY_ECHO = False
 SQLALCHEMY_TRACK_MODIFICATIONS = True
 SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL")
 # SQLALCHEMY_DATABASE_URI = os.environ['DATABASE_URL']
+SQLALCHEMY_BINDS = {}
+# optional read replica serving the GET endpoints
+if os.getenv("DATABASE_REPLICA_URL"):
+    SQLALCHEMY_BINDS['replica'] = os.getenv("DATABASE_REPLICA_URL")
+# optional comma separated databases the users' categories and recipes are spread over,
+# DATABASE_URL then only holds the users, tokens and other directory tables
+SHARDS = []
+for number, url in enumerate(filter(None, os.getenv("DATABASE_SHARD_URLS", "").split(","))):
+    SHARDS.append('shard{0}'.format(number))
+    SQLALCHEMY_BINDS['shard{0}'.format(number)] = url.strip()
+# optional read replicas of the shards, in the order of DATABASE_SHARD_URLS, empty for none
+for number, url in enumerate(os.getenv("DATABASE_SHARD_REPLICA_URLS", "").split(",")[:len(SHARDS)]):
+    if url.strip():
+        SQLALCHEMY_BINDS['shard{0}_replica'.format(number)] = url.strip()
+# seconds a user keeps reading from the primary after a write
+SQLALCHEMY_REPLICA_STICKY_SECONDS = int(os.getenv("DB_REPLICA_STICKY_SECONDS", 5))
+# connection pool sizing, per worker process
+SQLALCHEMY_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", 5))
+SQLALCHEMY_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", 5))
+SQLALCHEMY_POOL_TIMEOUT = int(os.getenv("DB_POOL_TIMEOUT", 10))
+SQLALCHEMY_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", 1800))
+SQLALCHEMY_POOL_PRE_PING = True
+# seconds to wait for postgres to accept a connection
+SQLALCHEMY_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", 5))
+# milliseconds a single statement may run before postgres cancels it
+SQLALCHEMY_STATEMENT_TIMEOUT = int(os.getenv("DB_STATEMENT_TIMEOUT", 30000))
 SQLALCHEMY_MIGRATE_REPO = os.path.join(basedir, 'db_repository')
 PAGINATION_PAGE_SIZE = 5
 PAGINATION_PAGE_ARGUMENT_NAME = 'page'
+# swagger spec built by `manage.py build_apispec`, generated from the docstrings on every request when missing
+APISPEC_FILE = os.getenv("APISPEC_FILE", os.path.join(basedir, 'apispec.json'))
 SECRET_KEY = "Thisistopsecretstuff"
+MAIL_SERVER = os.getenv("MAIL_SERVER")
+MAIL_PORT = 465
+MAIL_USE_SSL = True
+MAIL_USERNAME = os.getenv("MAIL_USERNAME")
+MAIL_PASSWORD = os.getenv("MAIL_PASSWORD")
+# add a Server-Timing header and a timing log line to every response
+SERVER_TIMING = os.getenv("SERVER_TIMING", "false").lower() == "true"
+# serve prometheus metrics on /metrics, set prometheus_multiproc_dir when running several workers
+METRICS = os.getenv("METRICS", "false").lower() == "true"
+# log statements slower than this many milliseconds, 0 disables the slow query log
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", 0))
+# keep the EXPLAIN plan of every slow statement shape, served on /api/admin/slow-queries
+SLOW_QUERY_EXPLAIN = os.getenv("SLOW_QUERY_EXPLAIN", "false").lower() == "true"
+# changes returned per /api/changes request, by default and at most
+CHANGES_PAGE_SIZE = 100
+CHANGES_MAX_PAGE_SIZE = 500
+# days of changes kept for syncing clients, older sync tokens must sync everything again
+CHANGES_RETENTION_DAYS = int(os.getenv("CHANGES_RETENTION_DAYS", 30))
+# shared recipes per page of the public feed, and the most a client may ask for
+PUBLIC_PAGE_SIZE = 20
+PUBLIC_MAX_PAGE_SIZE = 100
+# seconds caches may serve the public feed without revalidating, and serve it stale while refreshing it
+PUBLIC_CACHE_MAX_AGE = int(os.getenv("PUBLIC_CACHE_MAX_AGE", 60))
+PUBLIC_CACHE_STALE_SECONDS = int(os.getenv("PUBLIC_CACHE_STALE_SECONDS", 600))
+# the trending feed ranks the shared recipes of the last TRENDING_DAYS days, keeping the top TRENDING_SIZE
+TRENDING_DAYS = int(os.getenv("TRENDING_DAYS", 7))
+TRENDING_SIZE = int(os.getenv("TRENDING_SIZE", 1000))
+# seconds the views of shared recipes are added up in a worker before being written, 0 writes every view
+VIEW_FLUSH_SECONDS = int(os.getenv("VIEW_FLUSH_SECONDS", 10))
+# 'memory' pushes change notifications to the streams of the same worker only, 'postgres' to every worker
+NOTIFICATIONS_BROKER = os.getenv("NOTIFICATIONS_BROKER", "memory")
+# notifications buffered per stream before a slow client is told to resync
+NOTIFICATIONS_QUEUE_SIZE = 100
+# seconds between heartbeats of an idle stream, and before a stream is closed for the client to reconnect
+NOTIFICATIONS_HEARTBEAT = 15
+NOTIFICATIONS_STREAM_SECONDS = 300
+# seconds the response of a request sent with an Idempotency-Key is replayed to retries
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", 24 * 3600))
+# token required by the /api/admin endpoints, they are disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+# profile requests carrying the X-Profile header and the admin token, plus a random fraction of all requests
+PROFILER_ENABLED = os.getenv("PROFILER_ENABLED", "false").lower() == "true"
+PROFILER_SAMPLE_RATE = float(os.getenv("PROFILER_SAMPLE_RATE", 0))
+# 'sample' writes collapsed stacks, 'cprofile' writes pstats files; gevent and eventlet workers always use cprofile
+PROFILER_MODE = os.getenv("PROFILER_MODE")
+PROFILER_DIR = os.getenv("PROFILER_DIR", os.path.join(basedir, 'profiles'))
@@ -0,0 +1,67 @@
+# coding=utf-8
+"""
+Gunicorn settings, used with `gunicorn -c gunicorn_config.py run:app`
+
+GUNICORN_WORKER_CLASS picks the worker profile: 'gevent' (default) runs every
+request in a green thread so a slow query, SMTP send or password hash waiting
+on I/O only blocks that request, 'sync' restores the one-request-per-process
+workers.
+"""
+import os
+
+bind = '0.0.0.0:{0}'.format(os.getenv('PORT', '5000'))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'gevent')
+workers = int(os.getenv('WEB_CONCURRENCY', 2))
+# green threads per worker, keep DB_POOL_SIZE + DB_MAX_OVERFLOW in mind since
+# requests beyond that wait up to DB_POOL_TIMEOUT for a connection
+worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 100))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+# import the app once in the master so workers fork with it already loaded
+preload_app = True
+
+
+def on_starting(server):
+    """
+    Refuse to start while the sharded directory has users without a shard
+    """
+    from run import app
+    from api.sharding import check_directory
+    with app.app_context():
+        check_directory()
+
+
+def post_fork(server, worker):
+    """
+    Make psycopg2 cooperative and drop database connections inherited from the master
+    """
+    if worker_class == 'gevent':
+        from psycogreen.gevent import patch_psycopg
+        patch_psycopg()
+
+    from run import app
+    from api.models import db
+    with app.app_context():
+        # sockets opened before the fork must not be shared between workers,
+        # whichever database they point at: primary, replica or shards
+        db.engine.dispose()
+        for bind in app.config.get('SQLALCHEMY_BINDS') or {}:
+            db.get_engine(app, bind=bind).dispose()
+
+
+def worker_exit(server, worker):
+    """
+    Write the recipe views the worker added up and did not write yet
+    """
+    from run import app
+    from api.trending import flush_views
+    with app.app_context():
+        flush_views()
+
+
+def child_exit(server, worker):
+    """
+    Drop the live gauges of a worker that exited from the shared metrics directory
+    """
+    if os.environ.get('prometheus_multiproc_dir'):
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
@@ -9,5 +9,164 @@ migrate = Migrate(app, db)
 manager = Manager(app)
 manager.add_command('db', MigrateCommand)
 
+
+@manager.option('-u', '--users', dest='users', type=int, default=1000, help='users to create')
+@manager.option('-c', '--categories', dest='categories', type=int, default=5, help='categories per user')
+@manager.option('-r', '--recipes', dest='recipes', type=int, default=20, help='recipes per category')
+@manager.option('-s', '--seed', dest='seed', type=int, default=0, help='random seed')
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=10000, help='rows per load batch')
+def seed(users, categories, recipes, seed, batch_size):
+    """
+    Load synthetic users, categories and recipes in bulk
+    """
+    from api.seed import Seeder, SEED_PASSWORD, report
+    if app.config['SHARDS']:
+        print('The seeder loads unsharded databases only')
+        return
+    stats = Seeder(seed, batch_size).run(users, categories, recipes)
+    for line in report(stats):
+        print(line)
+    print('Every seeded user logs in with the password {0}'.format(SEED_PASSWORD))
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000, help='rows per transaction')
+@manager.option('-l', '--loop', dest='loop', action='store_true', help='keep purging every --interval seconds')
+@manager.option('-i', '--interval', dest='interval', type=int, default=60, help='seconds between purges')
+def purge_accounts(batch_size, loop, interval):
+    """
+    Delete the data of deleted accounts in small batches
+    """
+    import time
+    from api.accounts import purge_accounts as purge
+    while True:
+        for table, rows in sorted(purge(batch_size).items()):
+            print('Deleted {0} rows from {1}'.format(rows, table))
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@manager.command
+def recount_recipes():
+    """
+    Recompute the recipe count of every category
+    """
+    from api.models import Category
+    from api.sharding import each_shard
+    for _ in each_shard():
+        Category.recount_recipes()
+    print('Recounted the recipes of every category')
+
+
+@manager.command
+def purge_changes():
+    """
+    Delete the changes older than CHANGES_RETENTION_DAYS
+    """
+    import datetime
+    from api.models import Change
+    from api.sharding import each_shard
+    before = datetime.datetime.utcnow() - datetime.timedelta(days=app.config['CHANGES_RETENTION_DAYS'])
+    print('Deleted {0} changes'.format(sum(Change.purge(before) for _ in each_shard())))
+
+
+@manager.option('-l', '--loop', dest='loop', action='store_true', help='keep refreshing every --interval seconds')
+@manager.option('-i', '--interval', dest='interval', type=int, default=300, help='seconds between refreshes')
+def refresh_trending(loop, interval):
+    """
+    Rebuild the ranking of the trending feed
+    """
+    import time
+    from api.trending import refresh_trending as refresh
+    while True:
+        print('Ranked {0} trending recipes'.format(refresh()))
+        if not loop:
+            break
+        time.sleep(interval)
+
+
+@manager.command
+def create_sharded_schema():
+    """
+    Create the directory tables and the tables of every shard, without foreign keys between databases
+    """
+    from api.sharding import create_schema
+    create_schema()
+    print('Created the directory and {0} shards'.format(len(app.config['SHARDS'])))
+
+
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000, help='users per transaction')
+def pin_shards(batch_size):
+    """
+    Store the shard of the users created before it was stored at sign up
+    """
+    from api.sharding import pin_shards as pin
+    print('Pinned {0} users to their shard'.format(pin(batch_size)))
+
+
+@manager.option('shard', help='bind name of the target shard, one of SHARDS')
+# positional options are read bottom up: move_user <user_id> <shard>
+@manager.option('user_id', type=int, help='id of the user to move')
+@manager.option('-b', '--batch-size', dest='batch_size', type=int, default=1000, help='rows per statement')
+@manager.option('-g', '--grace', dest='grace', type=float, default=5,
+                help='seconds to let running requests of the user finish before copying')
+def move_user(user_id, shard, batch_size, grace):
+    """
+    Move the categories, recipes and tags of a user to another shard
+    """
+    from api.sharding import move_user as move
+    for table, rows in sorted(move(user_id, shard, batch_size, grace).items()):
+        print('Moved {0} rows of {1}'.format(rows, table))
+
+
+@manager.command
+def purge_idempotency_keys():
+    """
+    Delete the expired Idempotency-Key responses
+    """
+    from api.idempotency import purge_expired
+    print('Deleted {0} expired idempotency keys'.format(purge_expired()))
+
+
+@manager.option('-o', '--output', dest='output', default=None, help='defaults to the APISPEC_FILE setting')
+def build_apispec(output):
+    """
+    Generate the swagger spec from the Resource docstrings into a static json file
+    """
+    from api.apispec import write
+    output = output or app.config['APISPEC_FILE']
+    spec = write(app, output)
+    print('Wrote {0} paths to {1}'.format(len(spec['paths']), output))
+
+
+@manager.command
+def profiles():
+    """
+    List the stored request profiles, newest first
+    """
+    from api.profiling import list_profiles
+    for name, size, modified in list_profiles(app.config['PROFILER_DIR']):
+        print('{0:%Y-%m-%d %H:%M:%S}{1:>10}  {2}'.format(modified, size, name))
+
+
+@manager.option('name', help='profile file name, as listed by the profiles command')
+@manager.option('-o', '--output', dest='output', default=None, help='svg file for collapsed stack profiles')
+def render_profile(name, output):
+    """
+    Render a collapsed stack profile as an svg flamegraph, or print the top functions of a cProfile one
+    """
+    import os
+    import pstats
+    from api.profiling import render_flamegraph
+    path = os.path.join(app.config['PROFILER_DIR'], name)
+    if name.endswith('.prof'):
+        pstats.Stats(path).sort_stats('cumulative').print_stats(30)
+        return
+    output = output or os.path.splitext(path)[0] + '.svg'
+    with open(output, 'w') as svg:
+        svg.write(render_flamegraph(path))
+    print('Wrote {0}'.format(output))
+
+
 if __name__ == '__main__':
     manager.run()
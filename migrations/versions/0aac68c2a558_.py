@@ -0,0 +1,36 @@
+"""change log for syncing clients
+
+Revision ID: 0aac68c2a558
+Revises: 6e68a31808f2
+Create Date: 2018-04-17 10:05:44.381902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0aac68c2a558'
+down_revision = '6e68a31808f2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=10), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('action', sa.String(length=6), nullable=False),
+    sa.Column('created', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_change_created'), 'change', ['created'], unique=False)
+    op.create_index('ix_change_user_id_id', 'change', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_change_user_id_id', table_name='change')
+    op.drop_index(op.f('ix_change_created'), table_name='change')
+    op.drop_table('change')
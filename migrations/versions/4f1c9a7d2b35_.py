@@ -0,0 +1,53 @@
+"""recipe snippets
+
+Revision ID: 4f1c9a7d2b35
+Revises: 0aac68c2a558
+Create Date: 2018-04-09 10:21:37.104512
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4f1c9a7d2b35'
+down_revision = '0aac68c2a558'
+branch_labels = None
+depends_on = None
+
+SNIPPET_LENGTH = 120
+BATCH_SIZE = 1000
+
+
+def make_snippet(body):
+    """
+    A copy of api.models.make_snippet as of this revision, later changes to the
+    model must not change what this migration writes
+    """
+    if body is None or len(body) <= SNIPPET_LENGTH:
+        return body
+    snippet = body[:SNIPPET_LENGTH - 3]
+    if ' ' in snippet:
+        snippet = snippet.rsplit(' ', 1)[0]
+    return snippet.rstrip() + '...'
+
+
+def upgrade():
+    op.add_column('recipe', sa.Column('snippet', sa.String(length=SNIPPET_LENGTH), nullable=True))
+    recipe = sa.table('recipe', sa.column('id', sa.Integer), sa.column('body', sa.String),
+                      sa.column('snippet', sa.String))
+    connection = op.get_bind()
+    update = recipe.update().where(recipe.c.id == sa.bindparam('recipe_id')).values(snippet=sa.bindparam('value'))
+    # walk the table by id, one batch of bodies in memory and one executemany per batch
+    last_id = 0
+    while True:
+        rows = connection.execute(sa.select([recipe.c.id, recipe.c.body]).where(recipe.c.id > last_id)
+                                  .order_by(recipe.c.id).limit(BATCH_SIZE)).fetchall()
+        if not rows:
+            break
+        connection.execute(update, [{'recipe_id': recipe_id, 'value': make_snippet(body)} for recipe_id, body in rows])
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    op.drop_column('recipe', 'snippet')
@@ -0,0 +1,24 @@
+"""last write of a user
+
+Revision ID: 5b8e0d3c7a19
+Revises: e13a7c5b9f26
+Create Date: 2018-04-16 09:14:52.318406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e0d3c7a19'
+down_revision = 'e13a7c5b9f26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('last_write_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('user', 'last_write_at')
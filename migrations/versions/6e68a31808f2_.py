@@ -0,0 +1,31 @@
+"""account deletion
+
+Revision ID: 6e68a31808f2
+Revises: 81ac6082212f
+Create Date: 2018-04-12 16:48:30.127794
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6e68a31808f2'
+down_revision = '81ac6082212f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('disabled_at', sa.DateTime(), nullable=True))
+    op.add_column('disable_tokens', sa.Column('user_id', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_disable_tokens_user_id'), 'disable_tokens', ['user_id'], unique=False)
+    op.create_foreign_key('disable_tokens_user_id_fkey', 'disable_tokens', 'user', ['user_id'], ['id'],
+                          ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('disable_tokens_user_id_fkey', 'disable_tokens', type_='foreignkey')
+    op.drop_index(op.f('ix_disable_tokens_user_id'), table_name='disable_tokens')
+    op.drop_column('disable_tokens', 'user_id')
+    op.drop_column('user', 'disabled_at')
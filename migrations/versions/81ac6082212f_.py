@@ -0,0 +1,29 @@
+"""delete the categories and recipes of a deleted user in the database
+
+Revision ID: 81ac6082212f
+Revises: 8211e367fb3d
+Create Date: 2018-04-09 11:26:08.913352
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '81ac6082212f'
+down_revision = '8211e367fb3d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.drop_constraint('category_user_id_fkey', 'category', type_='foreignkey')
+    op.create_foreign_key('category_user_id_fkey', 'category', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+    op.drop_constraint('recipe_user_id_fkey', 'recipe', type_='foreignkey')
+    op.create_foreign_key('recipe_user_id_fkey', 'recipe', 'user', ['user_id'], ['id'], ondelete='CASCADE')
+
+
+def downgrade():
+    op.drop_constraint('recipe_user_id_fkey', 'recipe', type_='foreignkey')
+    op.create_foreign_key('recipe_user_id_fkey', 'recipe', 'user', ['user_id'], ['id'])
+    op.drop_constraint('category_user_id_fkey', 'category', type_='foreignkey')
+    op.create_foreign_key('category_user_id_fkey', 'category', 'user', ['user_id'], ['id'])
@@ -0,0 +1,26 @@
+"""recipe count of categories
+
+Revision ID: 8211e367fb3d
+Revises: 351ca6a41b79
+Create Date: 2018-04-05 14:03:52.617420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8211e367fb3d'
+down_revision = '351ca6a41b79'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('category', sa.Column('recipe_count', sa.Integer(), server_default='0', nullable=False))
+    op.execute('UPDATE category SET recipe_count = '
+               '(SELECT count(recipe.id) FROM recipe WHERE recipe.category_id = category.id)')
+
+
+def downgrade():
+    op.drop_column('category', 'recipe_count')
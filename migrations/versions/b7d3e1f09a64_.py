@@ -0,0 +1,27 @@
+"""public recipes
+
+Revision ID: b7d3e1f09a64
+Revises: 4f1c9a7d2b35
+Create Date: 2018-04-10 16:45:12.538201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d3e1f09a64'
+down_revision = '4f1c9a7d2b35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('recipe', sa.Column('public', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.create_index('ix_recipe_public_id', 'recipe', ['id'], unique=False,
+                    postgresql_where=sa.text('public'), sqlite_where=sa.text('public'))
+
+
+def downgrade():
+    op.drop_index('ix_recipe_public_id', table_name='recipe')
+    op.drop_column('recipe', 'public')
@@ -0,0 +1,33 @@
+"""trending recipes
+
+Revision ID: c5a8e2d4f713
+Revises: b7d3e1f09a64
+Create Date: 2018-04-11 11:08:44.902316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5a8e2d4f713'
+down_revision = 'b7d3e1f09a64'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('recipe', sa.Column('view_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_table('trending_recipe',
+                    sa.Column('rank', sa.Integer(), autoincrement=False, nullable=False),
+                    sa.Column('recipe_id', sa.Integer(), nullable=False),
+                    sa.Column('view_count', sa.Integer(), nullable=False),
+                    sa.Column('refreshed_at', sa.DateTime(), nullable=False),
+                    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('rank')
+                    )
+
+
+def downgrade():
+    op.drop_table('trending_recipe')
+    op.drop_column('recipe', 'view_count')
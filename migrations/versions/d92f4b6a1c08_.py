@@ -0,0 +1,42 @@
+"""recipe tags
+
+Revision ID: d92f4b6a1c08
+Revises: c5a8e2d4f713
+Create Date: 2018-04-12 09:37:25.611840
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd92f4b6a1c08'
+down_revision = 'c5a8e2d4f713'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('tag',
+                    sa.Column('id', sa.Integer(), nullable=False),
+                    sa.Column('user_id', sa.Integer(), nullable=False),
+                    sa.Column('name', sa.String(length=50), nullable=False),
+                    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('id')
+                    )
+    op.create_index('ix_tag_user_id_name', 'tag', ['user_id', 'name'], unique=True)
+    op.create_table('recipe_tag',
+                    sa.Column('recipe_id', sa.Integer(), nullable=False),
+                    sa.Column('tag_id', sa.Integer(), nullable=False),
+                    sa.ForeignKeyConstraint(['recipe_id'], ['recipe.id'], ondelete='CASCADE'),
+                    sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ondelete='CASCADE'),
+                    sa.PrimaryKeyConstraint('recipe_id', 'tag_id')
+                    )
+    op.create_index('ix_recipe_tag_tag_id_recipe_id', 'recipe_tag', ['tag_id', 'recipe_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_recipe_tag_tag_id_recipe_id', table_name='recipe_tag')
+    op.drop_table('recipe_tag')
+    op.drop_index('ix_tag_user_id_name', table_name='tag')
+    op.drop_table('tag')
@@ -0,0 +1,36 @@
+"""user shards
+
+Revision ID: e13a7c5b9f26
+Revises: d92f4b6a1c08
+Create Date: 2018-04-13 15:52:09.227814
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e13a7c5b9f26'
+down_revision = 'd92f4b6a1c08'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('user', sa.Column('shard', sa.String(length=50), nullable=True))
+    op.add_column('user', sa.Column('shard_moving', sa.Boolean(), server_default=sa.false(), nullable=False))
+    op.add_column('user', sa.Column('shard_moved_at', sa.DateTime(), nullable=True))
+    op.add_column('trending_recipe', sa.Column('shard', sa.String(length=50), nullable=True))
+    op.create_table('id_block',
+                    sa.Column('name', sa.String(length=50), nullable=False),
+                    sa.Column('next_id', sa.Integer(), nullable=False),
+                    sa.PrimaryKeyConstraint('name')
+                    )
+
+
+def downgrade():
+    op.drop_table('id_block')
+    op.drop_column('trending_recipe', 'shard')
+    op.drop_column('user', 'shard_moved_at')
+    op.drop_column('user', 'shard_moving')
+    op.drop_column('user', 'shard')
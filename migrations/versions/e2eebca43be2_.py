@@ -0,0 +1,31 @@
+"""case insensitive unique indexes on recipe titles, category names and emails
+
+Revision ID: e2eebca43be2
+Revises: 7970182fe475
+Create Date: 2018-03-28 10:12:41.508316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e2eebca43be2'
+down_revision = '7970182fe475'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_user_lower_email', 'user', [sa.text('lower(email)')], unique=True)
+    # the case insensitive index also enforces what the plain constraint did
+    op.drop_constraint('user_email_key', 'user', type_='unique')
+    op.create_index('ix_category_user_id_lower_name', 'category', ['user_id', sa.text('lower(name)')], unique=True)
+    op.create_index('ix_recipe_user_id_lower_title', 'recipe', ['user_id', sa.text('lower(title)')], unique=True)
+
+
+def downgrade():
+    op.drop_index('ix_recipe_user_id_lower_title', table_name='recipe')
+    op.drop_index('ix_category_user_id_lower_name', table_name='category')
+    op.create_unique_constraint('user_email_key', 'user', ['email'])
+    op.drop_index('ix_user_lower_email', table_name='user')
@@ -15,4 +15,7 @@ def home():
 
 
 if __name__ == '__main__':
+    from api.sharding import check_directory
+    with app.app_context():
+        check_directory()
     app.run(debug=app.config['DEBUG'])
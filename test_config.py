@@ -15,3 +15,5 @@ SERVER_NAME = '127.0.0.1:5000'
 PAGINATION_PAGE_SIZE = 5
 PAGINATION_PAGE_ARGUMENT_NAME = 'page'
 WTF_CSRF_ENABLED = False
+ADMIN_TOKEN = "admintoken"
+VIEW_FLUSH_SECONDS = 0
@@ -2,6 +2,7 @@ import unittest
 from app import create_app
 from api.models import db
 from flask import url_for, json
+from .query_counter import QueryCounter
 
 
 class BaseTestCase(unittest.TestCase):
@@ -56,3 +57,9 @@ class BaseTestCase(unittest.TestCase):
             charset='UTF-8',
             data=json.dumps(data))
         return response
+
+    def assert_max_queries(self, budget, name='block'):
+        """
+        Fail when the block issues more than `budget` queries
+        """
+        return QueryCounter(db.engine, budget, name)
@@ -0,0 +1,16 @@
+# coding=utf-8
+import pytest
+
+from api.models import db
+from .query_counter import QueryCounter
+
+
+@pytest.fixture
+def query_counter():
+    """
+    Factory of query counters on the application engine, use as
+    `with query_counter(budget=4, name='recipe list'): ...`
+    """
+    def make_counter(budget=None, name='block'):
+        return QueryCounter(db.engine, budget, name)
+    return make_counter
@@ -0,0 +1,71 @@
+# coding=utf-8
+import os
+import traceback
+from collections import Counter, OrderedDict
+
+from sqlalchemy import event
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+API_DIR = os.path.join(ROOT, 'api')
+
+
+class QueryBudgetExceeded(AssertionError):
+    """
+    Raised when a block issues more queries than its budget
+    """
+
+
+def call_site():
+    """
+    :return: the innermost line of the api package on the current stack
+    """
+    for frame in reversed(traceback.extract_stack()):
+        if frame.filename.startswith(API_DIR):
+            return '{0}:{1} in {2}'.format(os.path.relpath(frame.filename, ROOT), frame.lineno, frame.name)
+    return '<outside api>'
+
+
+class QueryCounter(object):
+    """
+    Context manager recording the statements an engine executes inside the
+    block, with the line of the api package that issued each of them
+
+        with QueryCounter(db.engine, budget=4, name='recipe list'):
+            client.get(url)
+    """
+    def __init__(self, engine, budget=None, name='block'):
+        self.engine = engine
+        self.budget = budget
+        self.name = name
+        self.queries = []
+        self._listener = self.record
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._listener)
+        return self
+
+    def __exit__(self, exc_type, exc_value, tb):
+        event.remove(self.engine, 'before_cursor_execute', self._listener)
+        if exc_type is None and self.budget is not None and self.count > self.budget:
+            raise QueryBudgetExceeded(self.report())
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        self.queries.append((call_site(), statement))
+
+    def report(self):
+        """
+        :return: the queries of the block grouped by call site
+        """
+        grouped = OrderedDict()
+        for site, statement in self.queries:
+            grouped.setdefault(site, Counter())[statement] += 1
+        lines = ['{0} issued {1} queries, the budget is {2}'.format(self.name, self.count, self.budget)]
+        for site, statements in grouped.items():
+            lines.append('  {0}: {1} queries'.format(site, sum(statements.values())))
+            for statement, times in statements.items():
+                lines.append('    {0}x {1}'.format(times, ' '.join(statement.split())))
+        return '\n'.join(lines)
@@ -0,0 +1,54 @@
+# coding=utf-8
+import datetime
+import json
+from api import status
+from api.accounts import purge_accounts
+from api.models import User, Category, Recipe, DisableTokens
+from .base_tests import BaseTestCase
+
+
+class AccountDeletionTests(BaseTestCase):
+    """Test case for deleting accounts"""
+
+    def setUp(self):
+        super(AccountDeletionTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        for name in ('soup', 'stew'):
+            self.test_client.post(self.category_url, headers=self.headers, content_type='application/json',
+                                  data=json.dumps({'name': name}))
+        for number in range(5):
+            self.test_client.post('api/category/1/recipes/', headers=self.headers, content_type='application/json',
+                                  data=json.dumps({'title': 'dish' + 'abcde'[number], 'body': 'Boil the water'}))
+
+    def delete_account(self):
+        return self.test_client.delete('api/auth/account', headers=self.headers)
+
+    def test_delete_account_disables_it_at_once(self):
+        response = self.delete_account()
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.test_client.get(self.category_url, headers=self.headers).status_code, 401)
+        self.assertEqual(self.login_user(self.test_username, self.test_user_password).status_code, 400)
+
+    def test_purge_deletes_data_in_batches(self):
+        self.delete_account()
+        deleted = purge_accounts(batch_size=2)
+        self.assertEqual(deleted['recipe'], 5)
+        self.assertEqual(deleted['category'], 2)
+        self.assertEqual(deleted['disable_tokens'], 1)
+        self.assertEqual([Recipe.query.count(), Category.query.count(), DisableTokens.query.count()], [0, 0, 0])
+        # the username stays taken while the account's tokens may still be valid
+        self.assertEqual(User.query.count(), 1)
+
+    def test_purge_deletes_user_after_token_lifetime(self):
+        self.delete_account()
+        deleted = purge_accounts(now=datetime.datetime.utcnow() + datetime.timedelta(hours=3))
+        self.assertEqual(deleted['user'], 1)
+        self.assertEqual(User.query.count(), 0)
+
+    def test_purge_leaves_active_accounts(self):
+        self.assertEqual(purge_accounts(), {})
+        self.assertEqual(Recipe.query.count(), 5)
@@ -0,0 +1,36 @@
+# coding=utf-8
+import json
+from flask import url_for
+from api import status
+from .base_tests import BaseTestCase
+
+
+class AdminTests(BaseTestCase):
+    """Test case for the operator endpoints"""
+
+    def setUp(self):
+        super(AdminTests, self).setUp()
+        self.pool_url = url_for('api/admin.poolstatusresource', _external=True)
+
+    def test_pool_status_without_admin_token(self):
+        """Reject requests that do not carry the admin token"""
+        response = self.test_client.get(self.pool_url)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_pool_status_with_wrong_admin_token(self):
+        response = self.test_client.get(self.pool_url, headers={'x-admin-token': 'wrong'})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_pool_status(self):
+        """Report the pool of the worker serving the request"""
+        response = self.test_client.get(self.pool_url, headers={'x-admin-token': 'admintoken'})
+        response_data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('pool_class', response_data)
+        self.assertIn('worker_pid', response_data)
+
+    def test_pool_status_disabled_without_configured_token(self):
+        """Hide the admin endpoints when no admin token is configured"""
+        self.app.config['ADMIN_TOKEN'] = None
+        response = self.test_client.get(self.pool_url, headers={'x-admin-token': 'admintoken'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
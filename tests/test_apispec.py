@@ -0,0 +1,34 @@
+# coding=utf-8
+import json
+import os
+import tempfile
+from api import apispec
+from .base_tests import BaseTestCase
+
+
+class ApispecTests(BaseTestCase):
+    """Test case for serving the prebuilt swagger spec"""
+
+    def setUp(self):
+        super(ApispecTests, self).setUp()
+        handle, self.spec_path = tempfile.mkstemp(suffix='.json')
+        self.spec = {"swagger": "2.0", "paths": {"/api/categories/": {}}}
+        with os.fdopen(handle, 'w') as spec_file:
+            json.dump(self.spec, spec_file)
+
+    def tearDown(self):
+        os.remove(self.spec_path)
+        super(ApispecTests, self).tearDown()
+
+    def test_prebuilt_spec_served(self):
+        self.app.config['APISPEC_FILE'] = self.spec_path
+        apispec.init_app(self.app)
+        response = self.test_client.get('/apispec_1.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(json.loads(response.get_data(as_text=True)), self.spec)
+
+    def test_missing_spec_file_keeps_generated_spec(self):
+        self.app.config['APISPEC_FILE'] = self.spec_path + '.missing'
+        view = self.app.view_functions[apispec.SPEC_ENDPOINT]
+        apispec.init_app(self.app)
+        self.assertIs(self.app.view_functions[apispec.SPEC_ENDPOINT], view)
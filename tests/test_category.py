@@ -1,7 +1,7 @@
 # coding=utf-8
 import json
 from flask import url_for
-from api.models import Category
+from api.models import db, Category, Recipe
 from api import status
 from .base_tests import BaseTestCase
 
@@ -56,6 +56,30 @@ class CategoryTests(BaseTestCase):
         self.assertEqual(get_response.status_code, status.HTTP_200_OK)
         self.assertEqual(get_response_data['name'], self.category_name)
 
+    def test_recipe_count(self):
+        """Recipe counts follow recipes being created, deleted and moved"""
+        headers = {"x-access-token": self.access_token}
+        for title in ('pea soup', 'bean soup'):
+            self.test_client.post('api/category/1/recipes/', headers=headers, content_type='application/json',
+                                  data=json.dumps({'title': title, 'body': 'Boil the water'}))
+        self.test_client.delete('api/recipes/1', headers=headers)
+        get_response = self.test_client.get('/api/categories/1', headers=headers)
+        self.assertEqual(json.loads(get_response.get_data(as_text=True))['recipe_count'], 1)
+
+        self.create_category('stew')
+        recipe = Recipe.query.get(2)
+        recipe.category_id = 2
+        recipe.update()
+        self.assertEqual([Category.query.get(1).recipe_count, Category.query.get(2).recipe_count], [0, 1])
+
+    def test_recount_recipes(self):
+        self.test_client.post('api/category/1/recipes/', headers={"x-access-token": self.access_token},
+                              content_type='application/json',
+                              data=json.dumps({'title': 'pea soup', 'body': 'Boil the water'}))
+        db.session.execute(Category.__table__.update().values(recipe_count=7))
+        Category.recount_recipes()
+        self.assertEqual(Category.query.get(1).recipe_count, 1)
+
     def test_retrieve_category_with_nonexistent_id(self):
         """Test retrieve category by an id not existing"""
         get_response = self.test_client.get(
@@ -103,7 +127,7 @@ class CategoryTests(BaseTestCase):
             content_type='application/json'
         )
         post_response_data = json.loads(post_response.get_data(as_text=True))
-        self.assertEqual(post_response_data, {'message': 'No input data provided'})
+        self.assertEqual(post_response_data, {'message': {'name': ['No input data provided']}})
         self.assertEqual(post_response.status_code, 400)
 
     def test_create_duplicated_category(self):
@@ -180,6 +204,17 @@ class CategoryTests(BaseTestCase):
         get_response_data = json.loads(get_response.get_data(as_text=True))
         self.assertEqual(get_response_data['name'], new_category_name)
 
+    def test_update_category_to_existing_name(self):
+        """Renaming a category to the name of another one conflicts, whatever the case"""
+        self.create_category('stew')
+        put_response = self.test_client.put(
+            'api/categories/2',
+            headers={"x-access-token": self.access_token},
+            data=json.dumps({"name": self.category_name.upper()}),
+            content_type='application/json'
+        )
+        self.assertEqual(put_response.status_code, status.HTTP_409_CONFLICT)
+
     def test_update_category_with_nonexistent_id(self):
         """A category that does not exist"""
         url = '/api/categories/10'
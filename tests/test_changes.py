@@ -0,0 +1,93 @@
+# coding=utf-8
+import datetime
+import json
+from api import status
+from api.endpoints.changes import decode_sync_token, encode_sync_token
+from api.models import Change
+from .base_tests import BaseTestCase
+
+
+class ChangeFeedTests(BaseTestCase):
+    """Test case for the change feed"""
+
+    def setUp(self):
+        super(ChangeFeedTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.post(self.category_url, {'name': 'soup'})
+        for title in ('pea soup', 'bean soup'):
+            self.post('api/category/1/recipes/', {'title': title, 'body': 'Boil the water'})
+
+    def post(self, url, data):
+        return self.test_client.post(url, headers=self.headers, data=json.dumps(data),
+                                     content_type='application/json')
+
+    def sync(self, since=None, limit=None):
+        url = '/api/changes?'
+        if since:
+            url += 'since={0}&'.format(since)
+        if limit:
+            url += 'limit={0}'.format(limit)
+        response = self.test_client.get(url, headers=self.headers)
+        return response, json.loads(response.get_data(as_text=True))
+
+    def test_first_sync_returns_everything(self):
+        response, data = self.sync()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(change['type'], change['id'], change['action']) for change in data['changes']],
+                         [('recipe', 1, 'upsert'), ('category', 1, 'upsert'), ('recipe', 2, 'upsert')])
+        self.assertEqual(data['changes'][0]['data']['title'], 'Pea Soup')
+        self.assertEqual(data['changes'][1]['data']['recipe_count'], 2)
+        self.assertFalse(data['has_more'])
+
+    def test_sync_returns_only_new_changes_in_batches(self):
+        _, data = self.sync()
+        self.test_client.put('api/recipes/1', headers=self.headers, content_type='application/json',
+                             data=json.dumps({'body': 'Boil the peas'}))
+        self.post('api/category/1/recipes/', {'title': 'lentil soup', 'body': 'Boil the water'})
+        _, first = self.sync(data['next'], limit=1)
+        self.assertEqual([change['id'] for change in first['changes']], [1])
+        self.assertEqual(first['changes'][0]['data']['body'], 'Boil the peas')
+        self.assertTrue(first['has_more'])
+        _, count = self.sync(first['next'], limit=1)
+        self.assertEqual([(change['type'], change['data']['recipe_count']) for change in count['changes']],
+                         [('category', 3)])
+        _, second = self.sync(count['next'], limit=1)
+        self.assertEqual([change['id'] for change in second['changes']], [3])
+        _, third = self.sync(second['next'])
+        self.assertEqual(third['changes'], [])
+
+    def test_deleting_a_category_leaves_tombstones(self):
+        _, data = self.sync()
+        self.test_client.delete('/api/categories/1', headers=self.headers)
+        _, changes = self.sync(data['next'])
+        self.assertEqual(sorted((change['type'], change['id'], change['action']) for change in changes['changes']),
+                         [('category', 1, 'delete'), ('recipe', 1, 'delete'), ('recipe', 2, 'delete')])
+
+    def test_resync_after_a_purge_returns_everything(self):
+        self.test_client.put('api/recipes/1', headers=self.headers, content_type='application/json',
+                             data=json.dumps({'body': 'Boil the peas'}))
+        self.test_client.delete('api/recipes/2', headers=self.headers)
+        Change.purge(datetime.datetime.utcnow() + datetime.timedelta(days=1))
+        self.assertEqual(Change.query.count(), 2)
+        _, data = self.sync()
+        self.assertEqual([(change['type'], change['id'], change['action']) for change in data['changes']],
+                         [('recipe', 1, 'upsert'), ('category', 1, 'upsert')])
+        self.assertEqual(data['changes'][0]['data']['body'], 'Boil the peas')
+        self.assertEqual(data['changes'][1]['data']['recipe_count'], 1)
+
+    def test_tokens_keep_microseconds(self):
+        issued = datetime.datetime(2018, 4, 13, 15, 52, 9, 227814)
+        self.assertEqual(decode_sync_token(encode_sync_token(7, issued)), (7, issued))
+        # tokens of whole seconds are still read
+        self.assertEqual(decode_sync_token('NzoxNTIzNjM0NzI5'), (7, issued.replace(microsecond=0)))
+
+    def test_invalid_and_expired_tokens(self):
+        response, _ = self.sync('garbage')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        expired = encode_sync_token(1, datetime.datetime.utcnow() - datetime.timedelta(days=31))
+        response, _ = self.sync(expired)
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
@@ -0,0 +1,54 @@
+# coding=utf-8
+import json
+from api.models import Category, User
+from api import status
+from .base_tests import BaseTestCase
+
+
+class IdempotencyTests(BaseTestCase):
+    """Test case for the Idempotency-Key header"""
+
+    def setUp(self):
+        super(IdempotencyTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+
+    def create_category(self, name, key):
+        return self.test_client.post(self.category_url, data=json.dumps({'name': name}),
+                                     headers={"x-access-token": self.access_token, "Idempotency-Key": key},
+                                     content_type='application/json')
+
+    def test_retry_replays_response(self):
+        first = self.create_category('soup', 'key-1')
+        retry = self.create_category('soup', 'key-1')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.get_data(as_text=True)), json.loads(first.get_data(as_text=True)))
+        self.assertEqual(Category.query.count(), 1)
+
+    def test_key_reused_for_other_request(self):
+        self.create_category('soup', 'key-1')
+        response = self.create_category('stew', 'key-1')
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+        self.assertEqual(Category.query.count(), 1)
+
+    def test_keys_are_scoped_to_the_user(self):
+        self.create_category('soup', 'key-1')
+        self.create_user('other', self.test_user_password, 'other@gmail.com')
+        self.access_token = json.loads(self.login_user('other', self.test_user_password).data.decode())['token']
+        response = self.create_category('soup', 'key-1')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertNotIn('Idempotent-Replayed', response.headers)
+        self.assertEqual(Category.query.count(), 2)
+
+    def test_registration_retry_skips_handler(self):
+        data = json.dumps({'username': 'other', 'password': self.test_user_password, 'email': 'other@gmail.com'})
+        headers = {"Idempotency-Key": "register-1"}
+        first = self.client.post('api/auth/register/', data=data, headers=headers, content_type='application/json')
+        retry = self.client.post('api/auth/register/', data=data, headers=headers, content_type='application/json')
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(retry.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(User.query.count(), 2)
@@ -0,0 +1,35 @@
+# coding=utf-8
+import json
+from api import metrics, status
+from .base_tests import BaseTestCase
+
+
+class MetricsTests(BaseTestCase):
+    """Test case for the prometheus metrics endpoint"""
+
+    def setUp(self):
+        super(MetricsTests, self).setUp()
+        self.app.config['METRICS'] = True
+        metrics.init_app(self.app)
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+
+    def test_metrics_exposition(self):
+        self.test_client.get(self.category_url, headers={"x-access-token": self.access_token})
+        response = self.test_client.get('/metrics', headers={'x-admin-token': 'admintoken'})
+        body = response.get_data(as_text=True)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+        self.assertIn('http_request_duration_seconds_bucket{endpoint="api/categories.categorylistresource"', body)
+        self.assertIn('db_queries_total{endpoint="api/categories.categorylistresource"}', body)
+        self.assertIn('auth_token_checks_total{result="ok"}', body)
+        self.assertIn('db_pool_connections', body)
+
+    def test_metrics_require_the_admin_token(self):
+        response = self.test_client.get('/metrics')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.app.config['ADMIN_TOKEN'] = None
+        response = self.test_client.get('/metrics', headers={'x-admin-token': 'admintoken'})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,61 @@
+# coding=utf-8
+import json
+from api import status
+from api.notifications import get_broker, RESYNC
+from .base_tests import BaseTestCase
+
+
+class NotificationTests(BaseTestCase):
+    """Test case for the change notification stream"""
+
+    def setUp(self):
+        super(NotificationTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+
+    def test_committed_changes_are_published(self):
+        subscription = get_broker().subscribe(1)
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        self.assertEqual(subscription.get(timeout=1),
+                         {'changes': [{'type': 'category', 'id': 1, 'action': 'upsert'}]})
+        self.assertIsNone(subscription.get(timeout=0.01))
+        subscription.close()
+
+    def test_rejected_changes_are_not_published(self):
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        subscription = get_broker().subscribe(1)
+        response = self.test_client.post(self.category_url, headers=self.headers,
+                                         data=json.dumps({'name': 'soup'}), content_type='application/json')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertIsNone(subscription.get(timeout=0.01))
+        subscription.close()
+
+    def test_slow_subscriber_is_told_to_resync(self):
+        broker = get_broker()
+        subscription = broker.subscribe(1)
+        for number in range(self.app.config['NOTIFICATIONS_QUEUE_SIZE'] + 1):
+            broker.publish(1, {'changes': [number]})
+        self.assertEqual(subscription.get(timeout=0.01), RESYNC)
+        self.assertIsNone(subscription.get(timeout=0.01))
+        subscription.close()
+        self.assertEqual(broker.subscriptions, {})
+
+    def test_stream_sends_heartbeats(self):
+        self.app.config['NOTIFICATIONS_HEARTBEAT'] = 0.05
+        self.app.config['NOTIFICATIONS_STREAM_SECONDS'] = 0.2
+        response = self.test_client.get('/api/changes/stream?token={0}'.format(self.access_token))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        body = response.get_data(as_text=True)
+        self.assertTrue(body.startswith('retry: 5000\n\n'))
+        self.assertIn(': heartbeat\n\n', body)
+        self.assertEqual(get_broker().subscriptions, {})
+
+    def test_stream_requires_a_token(self):
+        response = self.test_client.get('/api/changes/stream')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
@@ -0,0 +1,59 @@
+# coding=utf-8
+import json
+import os
+import shutil
+import tempfile
+from api import profiling
+from .base_tests import BaseTestCase
+
+
+class ProfilingTests(BaseTestCase):
+    """Test case for the per request profiler"""
+
+    def setUp(self):
+        super(ProfilingTests, self).setUp()
+        self.profile_dir = tempfile.mkdtemp()
+        self.app.config.update(PROFILER_ENABLED=True, PROFILER_DIR=self.profile_dir,
+                               PROFILER_SAMPLE_RATE=0.0, PROFILER_INTERVAL=0.001)
+        profiling.init_app(self.app)
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+
+    def tearDown(self):
+        shutil.rmtree(self.profile_dir)
+        super(ProfilingTests, self).tearDown()
+
+    def test_profile_requested_with_admin_token(self):
+        response = self.test_client.get(self.category_url, headers={
+            "x-access-token": self.access_token, "x-admin-token": "admintoken", "x-profile": "1"})
+        name = response.headers['X-Profile-Id']
+        self.assertTrue(name.endswith('.collapsed'))
+        self.assertEqual([profile[0] for profile in profiling.list_profiles(self.profile_dir)], [name])
+
+    def test_profile_header_ignored_without_admin_token(self):
+        response = self.test_client.get(self.category_url, headers={
+            "x-access-token": self.access_token, "x-profile": "1"})
+        self.assertNotIn('X-Profile-Id', response.headers)
+        self.assertEqual(profiling.list_profiles(self.profile_dir), [])
+
+    def test_render_flamegraph(self):
+        path = os.path.join(self.profile_dir, 'request.collapsed')
+        with open(path, 'w') as collapsed:
+            collapsed.write('run.py:main;api/auth.py:decorated 3\nrun.py:main;api/pagination.py:paginate 1\n')
+        svg = profiling.render_flamegraph(path)
+        self.assertIn('api/auth.py:decorated (3 samples)', svg)
+        self.assertIn('run.py:main (4 samples)', svg)
+
+    def test_green_threads_use_cprofile(self):
+        self.assertEqual(profiling.profile_mode(None), 'sample')
+        self.assertEqual(profiling.profile_mode('cprofile'), 'cprofile')
+        green_threads, profiling.green_threads = profiling.green_threads, lambda: True
+        try:
+            self.assertEqual(profiling.profile_mode('sample'), 'cprofile')
+            response = self.test_client.get(self.category_url, headers={
+                "x-access-token": self.access_token, "x-admin-token": "admintoken", "x-profile": "1"})
+        finally:
+            profiling.green_threads = green_threads
+        self.assertTrue(response.headers['X-Profile-Id'].endswith('.prof'))
@@ -0,0 +1,77 @@
+# coding=utf-8
+import json
+from api import status
+from api.trending import refresh_trending
+from .base_tests import BaseTestCase
+
+
+class PublicRecipeTests(BaseTestCase):
+    """Test case for the public recipe feed"""
+
+    def setUp(self):
+        super(PublicRecipeTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        for title, public in (('pea soup', True), ('bean soup', False), ('corn soup', True),
+                              ('fish soup', True)):
+            self.test_client.post('api/category/1/recipes/', headers=self.headers, content_type='application/json',
+                                  data=json.dumps({'title': title, 'body': 'Boil the water', 'public': public}))
+
+    def feed(self, url='/api/public/recipes', headers=None):
+        response = self.test_client.get(url, headers=headers)
+        return response, json.loads(response.get_data(as_text=True) or 'null')
+
+    def test_feed_lists_shared_recipes_without_a_token(self):
+        response, data = self.feed()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([recipe['title'] for recipe in data['results']], ['Fish Soup', 'Corn Soup', 'Pea Soup'])
+        self.assertEqual(data['results'][0]['author'], self.test_username)
+        self.assertNotIn('body', data['results'][0])
+        self.assertIsNone(data['next'])
+
+    def test_feed_pages_with_a_cursor(self):
+        _, first = self.feed('/api/public/recipes?limit=2')
+        self.assertEqual([recipe['id'] for recipe in first['results']], [4, 3])
+        _, second = self.feed(first['next'])
+        self.assertEqual([recipe['id'] for recipe in second['results']], [1])
+        self.assertIsNone(second['next'])
+
+    def test_feed_is_cacheable(self):
+        response, _ = self.feed()
+        self.assertIn('public', response.headers['Cache-Control'])
+        self.assertIn('max-age=60', response.headers['Cache-Control'])
+        self.assertIn('stale-while-revalidate=600', response.headers['Cache-Control'])
+        response, _ = self.feed(headers={'If-None-Match': response.headers['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_private_recipes_are_not_shared(self):
+        response, data = self.feed('/api/public/recipes/1')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['body'], 'Boil the water')
+        response, _ = self.feed('/api/public/recipes/2')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertNotIn('Cache-Control', response.headers)
+
+    def test_unsharing_a_recipe(self):
+        response = self.test_client.put('api/recipes/1', headers=self.headers, data=json.dumps({'public': False}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        _, data = self.feed()
+        self.assertEqual([recipe['id'] for recipe in data['results']], [4, 3])
+        response = self.test_client.put('api/recipes/1', headers=self.headers, data=json.dumps({'public': 'yes'}))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_deleted_accounts_stop_sharing_at_once(self):
+        refresh_trending()
+        response = self.test_client.delete('api/auth/account', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        _, data = self.feed()
+        self.assertEqual(data['results'], [])
+        _, data = self.feed('/api/public/recipes/trending')
+        self.assertEqual(data['results'], [])
+        response, _ = self.feed('/api/public/recipes/1')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,92 @@
+# coding=utf-8
+import json
+from api import status
+from api.models import db, Recipe
+from .base_tests import BaseTestCase
+from .query_counter import QueryBudgetExceeded, QueryCounter
+
+# most queries a request to each endpoint may issue, whatever the page size
+# (recipes bring one query loading the tags of all of them)
+QUERY_BUDGETS = {
+    'api.recipelistresource': 5,
+    'api.reciperesource': 5,
+    'api.recipetagcountresource': 3,
+    'api/categories.categorylistresource': 6,
+    'api/categories.categoryresource': 5,
+}
+
+
+class QueryBudgetTests(BaseTestCase):
+    """Catch N+1 queries in the read endpoints"""
+
+    def setUp(self):
+        super(QueryBudgetTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        for category in ('soup', 'stew', 'salad'):
+            self.post(self.category_url, {'name': category})
+        for category_id in (1, 2, 3):
+            for number in range(4):
+                self.post('api/category/{0}/recipes/'.format(category_id),
+                          {'title': 'dish{0}{1}'.format(category_id, 'abcd'[number]),
+                           'body': 'Boil the water then add everything', 'tags': ['quick', 'vegan'][:number]})
+
+    def post(self, url, data):
+        return self.test_client.post(url, headers=self.headers, data=json.dumps(data),
+                                     content_type='application/json')
+
+    def assert_within_budget(self, endpoint, url):
+        with self.assert_max_queries(QUERY_BUDGETS[endpoint], endpoint):
+            response = self.test_client.get(url, headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_recipe_list_budget(self):
+        for limit in (1, 2, 9):
+            self.assert_within_budget('api.recipelistresource',
+                                      'api/category/1/recipes/?limit={0}'.format(limit))
+
+    def test_recipe_search_budget(self):
+        self.assert_within_budget('api.recipelistresource', 'api/category/1/recipes/?q=dish&limit=2')
+
+    def test_recipe_tag_filter_budget(self):
+        self.assert_within_budget('api.recipelistresource', 'api/category/1/recipes/?tags=quick,vegan&limit=2')
+
+    def test_recipe_tag_count_budget(self):
+        self.assert_within_budget('api.recipetagcountresource', 'api/category/1/recipes/tags?tags=quick')
+
+    def test_recipe_budget(self):
+        self.assert_within_budget('api.reciperesource', 'api/recipes/1')
+
+    def test_category_list_budget(self):
+        for limit in (1, 2, 6):
+            self.assert_within_budget('api/categories.categorylistresource',
+                                      '/api/categories/?limit={0}'.format(limit))
+
+    def test_category_budget(self):
+        self.assert_within_budget('api/categories.categoryresource', '/api/categories/1')
+
+    def test_category_delete_is_constant(self):
+        """The database deletes the recipes, they are not loaded one by one"""
+        for number in range(6):
+            self.post('api/category/3/recipes/', {'title': 'extra{0}'.format('abcdef'[number]),
+                                                  'body': 'Boil the water then add everything'})
+        counts = []
+        for category_id in (1, 3):
+            with QueryCounter(db.engine) as counter:
+                response = self.test_client.delete('/api/categories/{0}'.format(category_id), headers=self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            counts.append(counter.count)
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(Recipe.query.filter(Recipe.category_id.in_([1, 3])).count(), 0)
+
+    def test_violation_reports_call_sites(self):
+        with self.assertRaises(QueryBudgetExceeded) as context:
+            with self.assert_max_queries(1, 'category list'):
+                self.test_client.get('/api/categories/', headers=self.headers)
+        report = str(context.exception)
+        self.assertIn('category list issued', report)
+        self.assertIn('api/auth.py', report)
+        self.assertIn('api/pagination.py', report)
@@ -100,6 +100,13 @@ class RecipeCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
         self.assertEqual(response_data['message'], 'A recipe with the same title already exists')
 
+    def test_create_existing_recipe_in_other_case(self):
+        """Titles are unique whatever their case"""
+        self.create_recipe(self.recipe_title, self.recipe_body)
+        response = self.create_recipe(self.recipe_title.upper(), self.recipe_body)
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(Recipe.query.count(), 1)
+
     def test_create_recipe_with_no_data(self):
         """Create recipe with no data provided"""
         data = {}
@@ -136,7 +143,7 @@ class RecipeCase(BaseTestCase):
             content_type='application/json'
         )
         response_data = json.loads(response.get_data(as_text=True))
-        self.assertEqual(response_data, {'message': 'No input data provided'})
+        self.assertEqual(response_data, {'message': {'title': ['No input data provided']}})
         self.assertEqual(response.status_code, 400)
 
     def test_create_recipe_with_invalid_body(self):
@@ -149,7 +156,7 @@ class RecipeCase(BaseTestCase):
             content_type='application/json'
         )
         response_data = json.loads(response.get_data(as_text=True))
-        self.assertEqual(response_data, {'message': 'No input data provided'})
+        self.assertEqual(response_data, {'message': {'body': ['No input data provided']}})
         self.assertEqual(response.status_code, 400)
 
     def test_retrieve_recipe_list(self):
@@ -242,3 +249,26 @@ class RecipeCase(BaseTestCase):
         delete_response_data = json.loads(delete_response.get_data(as_text=True))
         self.assertEqual(delete_response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(delete_response_data, {"error": "A recipe with the the id of 4 does not exist"})
+
+    def test_recipe_list_returns_snippets(self):
+        """List views send a snippet of the body, the whole body only when asked for"""
+        long_body = 'Chop the onions and fry them slowly ' * 10
+        self.create_recipe('onion soup', long_body)
+        response = self.test_client.get(self.url, headers={"x-access-token": self.access_token})
+        recipe = json.loads(response.get_data(as_text=True))['results'][0]
+        self.assertNotIn('body', recipe)
+        self.assertTrue(recipe['snippet'].endswith('...'))
+        self.assertLessEqual(len(recipe['snippet']), 120)
+        self.assertTrue(long_body.startswith(recipe['snippet'][:-3]))
+        response = self.test_client.get(self.url + '?full=true', headers={"x-access-token": self.access_token})
+        recipe = json.loads(response.get_data(as_text=True))['results'][0]
+        self.assertEqual(recipe['body'], long_body.strip())
+
+    def test_update_recipe_body_updates_snippet(self):
+        self.create_recipe(self.recipe_title, self.recipe_body)
+        self.test_client.put(self.recipe_url, headers={"x-access-token": self.access_token},
+                             data=json.dumps({'body': 'Boil the peas'}))
+        response = self.test_client.get(self.recipe_url, headers={"x-access-token": self.access_token})
+        recipe = json.loads(response.get_data(as_text=True))
+        self.assertEqual(recipe['body'], 'Boil the peas')
+        self.assertEqual(recipe['snippet'], 'Boil the peas')
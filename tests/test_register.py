@@ -37,7 +37,7 @@ class AuthTestCase(BaseTestCase):
         )
         response_data = json.loads(response.get_data(as_text=True))
 
-        self.assertEqual(response_data, {'message': {'error': "'password'"}})
+        self.assertEqual(response_data, {'message': {'password': ['Missing data for required field.']}})
         self.assertEqual(response.status_code, 400)
 
     def test_register_with_invalid_inputs(self):
@@ -49,7 +49,9 @@ class AuthTestCase(BaseTestCase):
             content_type='application/json'
         )
         response_2_data = json.loads(response_2.get_data(as_text=True))
-        self.assertEqual(response_2_data, {'message': {'error': 'The password is too short'}})
+        self.assertEqual(response_2_data, {'message': {'password': [
+            'The password is too short', 'The password must include at least one uppercase letter',
+            'The password must include at least one number', 'The password must include at least one symbol']}})
         self.assertEqual(response_2.status_code, 400)
 
     def test_register_when_password_has_no_number(self):
@@ -61,7 +63,7 @@ class AuthTestCase(BaseTestCase):
             content_type='application/json'
         )
         response_3_data = json.loads(response_3.get_data(as_text=True))
-        self.assertEqual(response_3_data, {'message': {'error': 'The password must include at least one number'}})
+        self.assertEqual(response_3_data, {'message': {'password': ['The password must include at least one number']}})
         self.assertEqual(response_3.status_code, 400)
 
     def test_register_with_long_password(self):
@@ -74,7 +76,9 @@ class AuthTestCase(BaseTestCase):
             content_type='application/json'
         )
         response_4_data = json.loads(response_4.get_data(as_text=True))
-        self.assertEqual(response_4_data, {'message': {'error': 'The password is too long'}})
+        self.assertEqual(response_4_data, {'message': {'password': [
+            'The password is too long',
+            'The parameter password has spaces in: {0}'.format(data_4['password'])]}})
         self.assertEqual(response_4.status_code, 400)
 
     def test_register_when_no_uppercase_letter_pwd(self):
@@ -87,7 +91,7 @@ class AuthTestCase(BaseTestCase):
         )
         response_5_data = json.loads(response_5.get_data(as_text=True))
         self.assertEqual(response_5_data, {'message':
-                                               {'error': 'The password must include at least one uppercase letter'}})
+                                               {'password': ['The password must include at least one uppercase letter']}})
 
     def test_register_with_no_symbol_in_password(self):
         """Password must have at least on symbol"""
@@ -99,7 +103,7 @@ class AuthTestCase(BaseTestCase):
         )
         response_6_data = json.loads(response_6.get_data(as_text=True))
         self.assertEqual(response_6_data, {'message':
-                                               {'error': 'The password must include at least one symbol'}})
+                                               {'password': ['The password must include at least one symbol']}})
 
     def test_register_when_password_has_no_lowercase(self):
         """Password must have at least one lowercase letter"""
@@ -111,7 +115,7 @@ class AuthTestCase(BaseTestCase):
         )
         response_7_data = json.loads(response_7.get_data(as_text=True))
         self.assertEqual(response_7_data, {'message':
-                                               {'error': 'The password must include at least one lowercase letter'}})
+                                               {'password': ['The password must include at least one lowercase letter']}})
 
     def test_already_registered_user(self):
         """Test that a user cannot be registered twice."""
@@ -120,6 +124,23 @@ class AuthTestCase(BaseTestCase):
         second_res = self.test_client.post(self.register_url, data=json.dumps(self.user_data))
         self.assertEqual(second_res.status_code, 400)
 
+    def test_register_with_existing_email_in_other_case(self):
+        """Emails are unique whatever their case"""
+        data = {"username": "other", "password": self.test_user_password, "email": self.test_email.upper()}
+        response = self.test_client.post(self.register_url, data=json.dumps(data),
+                                         content_type='application/json')
+        response_data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response_data['message'], {"error": "A user with the same email already exists"})
+
+    def test_register_with_existing_username(self):
+        data = {"username": self.test_username, "password": self.test_user_password, "email": "other@gmail.com"}
+        response = self.test_client.post(self.register_url, data=json.dumps(data),
+                                         content_type='application/json')
+        response_data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response_data['message'], {"error": "A user with the same name already exists"})
+
     def test_user_login(self):
         """Test registered user can login."""
         login_res = self.test_client.post(self.login_url, data=json.dumps(self.user_data),
@@ -161,7 +182,7 @@ class AuthTestCase(BaseTestCase):
             content_type='application/json'
         )
         response_data = json.loads(response.get_data(as_text=True))
-        self.assertEqual(response_data, {'message': {'error': "'username'"}})
+        self.assertEqual(response_data, {'message': {'username': ['Missing data for required field.']}})
         self.assertEqual(response.status_code, 400)
 
     def test_non_registered_user_login(self):
@@ -0,0 +1,79 @@
+# coding=utf-8
+import datetime
+import json
+import os
+import tempfile
+
+from api.models import db, Category, User
+from api import status
+from .base_tests import BaseTestCase
+
+
+class ReplicaTests(BaseTestCase):
+    """Test case for routing the GET endpoints to a read replica"""
+
+    def setUp(self):
+        super(ReplicaTests, self).setUp()
+        handle, self.replica_path = tempfile.mkstemp(suffix='.db')
+        os.close(handle)
+        self.app.config['SQLALCHEMY_BINDS'] = {'replica': 'sqlite:///' + self.replica_path}
+        self.replica_engine = db.get_engine(self.app, bind='replica')
+        db.Model.metadata.create_all(bind=self.replica_engine)
+
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+
+    def tearDown(self):
+        super(ReplicaTests, self).tearDown()
+        self.replica_engine.dispose()
+        os.remove(self.replica_path)
+
+    def create_category(self, name):
+        return self.test_client.post(
+            self.category_url,
+            headers=self.headers,
+            data=json.dumps({'name': name}),
+            content_type='application/json'
+        )
+
+    def test_get_reads_from_replica(self):
+        """Serve reads from the replica once the sticky window has passed"""
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 0
+        self.create_category(self.category_name)
+        response = self.test_client.get('/api/categories/1', headers=self.headers)
+        # the category only exists on the primary, the replica has not caught up
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_read_your_writes(self):
+        """Keep serving a user from the primary right after they wrote"""
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 60
+        self.create_category(self.category_name)
+        response = self.test_client.get('/api/categories/1', headers=self.headers)
+        response_data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response_data['name'], self.category_name)
+
+    def test_writes_go_to_primary(self):
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 0
+        response = self.create_category(self.category_name)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Category.query.count(), 1)
+        replica_count = self.replica_engine.execute('SELECT COUNT(*) FROM category').scalar()
+        self.assertEqual(replica_count, 0)
+
+    def test_every_worker_sees_the_last_write(self):
+        """The last write is stored with the user, not in the worker that served it"""
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 60
+        self.create_category(self.category_name)
+        user = User.query.get(1)
+        self.assertIsNotNone(user.last_write_at)
+        response = self.test_client.get('/api/categories/1', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # a write older than the window no longer keeps the user on the primary
+        user.last_write_at -= datetime.timedelta(seconds=61)
+        db.session.commit()
+        response = self.test_client.get('/api/categories/1', headers=self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
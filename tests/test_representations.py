@@ -0,0 +1,76 @@
+# coding=utf-8
+import datetime
+import json
+import unittest
+
+from api import representations
+from api.models import db, Category
+from .base_tests import BaseTestCase
+
+
+class RepresentationTests(BaseTestCase):
+    """Test case for encoding responses as json and msgpack"""
+
+    def setUp(self):
+        super(RepresentationTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        category = Category.query.get(1)
+        category.created_timestamp = datetime.datetime(2018, 4, 1, 12, 30, 15)
+        db.session.commit()
+
+    def test_datetimes_are_iso_8601_in_utc(self):
+        response = self.test_client.get('api/categories/1', headers=self.headers)
+        self.assertEqual(response.mimetype, 'application/json')
+        data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(data['created_timestamp'], '2018-04-01T12:30:15+00:00')
+        self.assertTrue(data['modified_timestamp'].endswith('+00:00'))
+        modified = datetime.datetime.strptime(data['modified_timestamp'][:19], '%Y-%m-%dT%H:%M:%S')
+        self.assertLess(abs(datetime.datetime.utcnow() - modified), datetime.timedelta(minutes=1))
+
+    def test_stdlib_encoder_matches(self):
+        orjson, representations.orjson = representations.orjson, None
+        try:
+            with self.app.test_request_context():
+                dumped = representations.dumps_json({'at': datetime.datetime(2018, 4, 1, 12, 30, 15, 5)})
+        finally:
+            representations.orjson = orjson
+        self.assertEqual(json.loads(dumped.decode('utf-8')), {'at': '2018-04-01T12:30:15.000005+00:00'})
+
+    def test_json_is_the_default(self):
+        for accept in ('*/*', 'text/html', 'application/msgpack;q=0.5, application/json'):
+            response = self.test_client.get('api/categories/1', headers=dict(self.headers, Accept=accept))
+            self.assertEqual(response.mimetype, 'application/json')
+
+    @unittest.skipIf(representations.msgpack is None, 'msgpack is not installed')
+    def test_msgpack_is_negotiated(self):
+        msgpack = representations.msgpack
+        headers = dict(self.headers, Accept='application/msgpack')
+        response = self.test_client.get('api/categories/1', headers=headers)
+        self.assertEqual(response.mimetype, 'application/msgpack')
+        data = msgpack.unpackb(response.get_data(), raw=False, timestamp=3)
+        self.assertEqual(data['name'], 'soup')
+        self.assertEqual(data['created_timestamp'],
+                         datetime.datetime(2018, 4, 1, 12, 30, 15, tzinfo=datetime.timezone.utc))
+
+        response = self.test_client.get('api/categories/5', headers=headers)
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(msgpack.unpackb(response.get_data(), raw=False),
+                         {'Error': 'Category with id 5 not found'})
+
+    @unittest.skipIf(representations.msgpack is None, 'msgpack is not installed')
+    def test_idempotent_replay_follows_the_retry(self):
+        msgpack = representations.msgpack
+        headers = dict(self.headers, **{'Idempotency-Key': 'abc'})
+        first = self.test_client.post(self.category_url, data=json.dumps({'name': 'stew'}),
+                                      content_type='application/json',
+                                      headers=dict(headers, Accept='application/msgpack'))
+        retry = self.test_client.post(self.category_url, data=json.dumps({'name': 'stew'}),
+                                      content_type='application/json', headers=headers)
+        self.assertEqual(retry.headers['Idempotent-Replayed'], 'true')
+        self.assertEqual(json.loads(retry.get_data(as_text=True)), msgpack.unpackb(first.get_data(), raw=False))
@@ -0,0 +1,24 @@
+# coding=utf-8
+from api.models import User
+from api.seed import Seeder, SEED_PASSWORD
+from .base_tests import BaseTestCase
+
+
+class SeedTests(BaseTestCase):
+    """Test case for the bulk seeder"""
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(Seeder(1).hashed_password, Seeder(1).hashed_password)
+        Seeder(1).run(2, 1, 2)
+        user = User.query.filter_by(username='seedb').first()
+        self.assertTrue(user.verify_password(SEED_PASSWORD))
+        self.assertEqual(user.hashed_password, Seeder(1).hashed_password)
+
+    def test_sharded_databases_are_refused(self):
+        shards, self.app.config['SHARDS'] = self.app.config['SHARDS'], ['one']
+        try:
+            with self.assertRaises(RuntimeError):
+                Seeder(1).run(1, 1, 1)
+        finally:
+            self.app.config['SHARDS'] = shards
+        self.assertEqual(User.query.count(), 0)
@@ -0,0 +1,236 @@
+# coding=utf-8
+import json
+import os
+import shutil
+import tempfile
+import time
+
+from flask import g
+
+from api import database, sharding, status, trending
+from api.accounts import purge_accounts
+from api.database import ShardNotSelected
+from api.models import db, User, Category, Recipe, Change
+from api.sharding import using_shard
+from .base_tests import BaseTestCase
+
+
+class ShardingTests(BaseTestCase):
+    """Test case for spreading users' data over shards"""
+
+    def setUp(self):
+        super(ShardingTests, self).setUp()
+        db.drop_all()
+        self.shard_dir = tempfile.mkdtemp()
+        self.app.config['SQLALCHEMY_BINDS'] = {
+            shard: 'sqlite:///' + os.path.join(self.shard_dir, shard + '.db') for shard in ('shard0', 'shard1')}
+        self.app.config['SHARDS'] = ['shard0', 'shard1']
+        sharding._id_blocks.clear()
+        sharding.create_schema()
+        self.users = {}
+        for username in ('kevin', 'alice'):
+            self.create_user(username, 'P@ssword1', username + '@gmail.com')
+            token = json.loads(self.login_user(username, 'P@ssword1').data.decode())['token']
+            self.users[username] = {'x-access-token': token}
+
+    def tearDown(self):
+        db.session.remove()
+        for shard in self.app.config['SHARDS']:
+            db.get_engine(self.app, bind=shard).dispose()
+        self.app.config['SHARDS'] = []
+        self.app.config['SQLALCHEMY_BINDS'] = {}
+        db.drop_all()
+        sharding._id_blocks.clear()
+        shutil.rmtree(self.shard_dir)
+
+    def post(self, url, username, data):
+        return self.test_client.post(url, headers=self.users[username], content_type='application/json',
+                                     data=json.dumps(data))
+
+    def add_recipes(self, username, *titles, **kwargs):
+        self.post(self.category_url, username, {'name': 'soup'})
+        user = User.query.filter_by(username=username).first()
+        with using_shard(sharding.shard_of(user)):
+            category_id = Category.query.filter_by(user_id=user.id).first().id
+        for title in titles:
+            self.post('api/category/{0}/recipes/'.format(category_id), username,
+                      {'title': title, 'body': 'Boil the water', 'public': kwargs.get('public', False)})
+        with using_shard(sharding.shard_of(user)):
+            ids = [recipe.id for recipe in Recipe.query.filter_by(user_id=user.id).order_by(Recipe.id)]
+        db.session.remove()
+        return category_id, ids
+
+    def count(self, shard, model, user_id):
+        with using_shard(shard):
+            return model.query.filter_by(user_id=user_id).count()
+
+    def test_users_data_goes_to_their_shard(self):
+        self.add_recipes('kevin', 'pea soup')
+        self.add_recipes('alice', 'bean soup')
+        self.assertEqual(self.count('shard1', Recipe, 1), 1)
+        self.assertEqual(self.count('shard0', Recipe, 1), 0)
+        self.assertEqual(self.count('shard0', Recipe, 2), 1)
+        self.assertEqual(self.count('shard1', Recipe, 2), 0)
+        response = self.test_client.get(self.category_url, headers=self.users['alice'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(json.loads(response.get_data(as_text=True))['results']), 1)
+
+    def test_ids_are_unique_across_shards(self):
+        kevin_category, kevin_recipes = self.add_recipes('kevin', 'pea soup', 'corn soup')
+        alice_category, alice_recipes = self.add_recipes('alice', 'bean soup', 'fish soup')
+        self.assertNotEqual(kevin_category, alice_category)
+        self.assertEqual(len(set(kevin_recipes + alice_recipes)), 4)
+
+    def test_ids_continue_in_the_next_block(self):
+        block_size, sharding.ID_BLOCK_SIZE = sharding.ID_BLOCK_SIZE, 2
+        try:
+            ids = [sharding.allocate_id('tag') for _ in range(5)]
+        finally:
+            sharding.ID_BLOCK_SIZE = block_size
+        self.assertEqual(ids, [1, 2, 3, 4, 5])
+
+    def test_new_users_are_pinned_to_a_shard(self):
+        self.assertEqual([(user.id, user.shard) for user in User.query.order_by(User.id)],
+                         [(1, 'shard1'), (2, 'shard0')])
+        sharding.check_directory()
+
+    def test_unpinned_users_stop_the_start(self):
+        db.session.execute(User.__table__.update().where(User.id == 2).values(shard=None))
+        db.session.commit()
+        with self.assertRaises(RuntimeError):
+            sharding.check_directory()
+        self.assertEqual(sharding.pin_shards(), 1)
+        self.assertEqual(User.query.get(2).shard, 'shard0')
+        sharding.check_directory()
+
+    def test_sharded_tables_need_a_shard(self):
+        with self.assertRaises(ShardNotSelected):
+            Category.query.count()
+
+    def test_move_user_keeps_data_and_ids(self):
+        category_id, recipe_ids = self.add_recipes('kevin', 'pea soup', 'corn soup')
+        moved = sharding.move_user(1, 'shard0', batch_size=1)
+        self.assertEqual(moved['recipe'], 2)
+        self.assertEqual(moved['category'], 1)
+        self.assertEqual(User.query.get(1).shard, 'shard0')
+        self.assertEqual(self.count('shard1', Recipe, 1), 0)
+        self.assertEqual(self.count('shard1', Change, 1), 0)
+        self.assertEqual(self.count('shard0', Recipe, 1), 2)
+
+        headers = self.users['kevin']
+        response = self.test_client.get('api/recipes/{0}'.format(recipe_ids[0]), headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.post('api/category/{0}/recipes/'.format(category_id), 'kevin',
+                             {'title': 'fish soup', 'body': 'Boil the water'})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_move_replaces_rows_an_interrupted_move_copied(self):
+        self.add_recipes('kevin', 'pea soup')
+        categories = Category.__table__
+        with sharding.shard_engine('shard1').connect() as source, sharding.shard_engine('shard0').begin() as target:
+            sharding.copy_rows(source, target, categories, categories.c.user_id == 1, 10)
+        moved = sharding.move_user(1, 'shard0')
+        self.assertEqual(moved['category'], 1)
+        self.assertEqual(self.count('shard0', Category, 1), 1)
+        self.assertEqual(self.count('shard0', Recipe, 1), 1)
+
+    def test_writes_check_the_directory(self):
+        user = User.query.get(1)
+        user.shard_moving = True
+        db.session.commit()
+        with self.app.test_request_context():
+            g.current_user_id, g.shard = 1, 'shard1'
+            db.session.add(Category('soup', 1))
+            with self.assertRaises(sharding.ShardMoving):
+                db.session.commit()
+            db.session.rollback()
+            user = User.query.get(1)
+            user.shard, user.shard_moving = 'shard0', False
+            db.session.commit()
+            # a request authenticated before the move ended still points at the old shard
+            db.session.add(Category('soup', 1))
+            with self.assertRaises(sharding.ShardMoving):
+                db.session.commit()
+        db.session.remove()
+        self.assertEqual(self.count('shard1', Category, 1), 0)
+
+    def test_views_follow_the_owner_to_the_new_shard(self):
+        _, recipe_ids = self.add_recipes('kevin', 'pea soup', public=True)
+        self.app.config['VIEW_FLUSH_SECONDS'] = 60
+        trending._last_flush[0] = time.time()
+        self.test_client.get('/api/public/recipes/{0}'.format(recipe_ids[0]))
+        user = User.query.get(1)
+        user.shard_moving = True
+        db.session.commit()
+        trending.flush_views()
+        self.assertEqual(trending._pending_views, {(1, recipe_ids[0]): 1})
+        user.shard_moving = False
+        db.session.commit()
+        sharding.move_user(1, 'shard0')
+        trending.flush_views()
+        self.assertEqual(trending._pending_views, {})
+        with using_shard('shard0'):
+            self.assertEqual(Recipe.query.get(recipe_ids[0]).view_count, 1)
+
+    def test_sync_tokens_from_before_a_move_expire(self):
+        self.add_recipes('kevin', 'pea soup')
+        response = self.test_client.get('/api/changes', headers=self.users['kevin'])
+        token = json.loads(response.get_data(as_text=True))['next']
+        sharding.move_user(1, 'shard0')
+        response = self.test_client.get('/api/changes?since=' + token, headers=self.users['kevin'])
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+        response = self.test_client.get('/api/changes', headers=self.users['kevin'])
+        data = json.loads(response.get_data(as_text=True))
+        self.assertEqual(len(data['changes']), 2)
+        # issued within the second the move ended, after it
+        response = self.test_client.get('/api/changes?since=' + data['next'], headers=self.users['kevin'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_requests_wait_while_the_user_moves(self):
+        self.add_recipes('alice', 'bean soup')
+        user = User.query.get(1)
+        user.shard_moving = True
+        db.session.commit()
+        response = self.test_client.get(self.category_url, headers=self.users['kevin'])
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response.headers['Retry-After'], '5')
+        response = self.test_client.get(self.category_url, headers=self.users['alice'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_shard_reads_use_its_replica(self):
+        replica = 'sqlite:///' + os.path.join(self.shard_dir, 'shard1_replica.db')
+        self.app.config['SQLALCHEMY_BINDS']['shard1_replica'] = replica
+        sharding.schema_tables(database.SHARDED_TABLES).create_all(db.get_engine(self.app, bind='shard1_replica'))
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 60
+        category_id, _ = self.add_recipes('kevin')
+        url = 'api/categories/{0}'.format(category_id)
+        # the write to the shard keeps kevin on it for the sticky window
+        self.assertIsNotNone(User.query.get(1).last_write_at)
+        response = self.test_client.get(url, headers=self.users['kevin'])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.app.config['SQLALCHEMY_REPLICA_STICKY_SECONDS'] = 0
+        # the replica has not caught up
+        response = self.test_client.get(url, headers=self.users['kevin'])
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        db.get_engine(self.app, bind='shard1_replica').dispose()
+
+    def test_public_feed_merges_shards(self):
+        _, kevin_recipes = self.add_recipes('kevin', 'pea soup', 'corn soup', public=True)
+        _, alice_recipes = self.add_recipes('alice', 'bean soup', public=True)
+        response = self.test_client.get('/api/public/recipes?limit=2')
+        data = json.loads(response.get_data(as_text=True))
+        ids = sorted(kevin_recipes + alice_recipes, reverse=True)
+        self.assertEqual([recipe['id'] for recipe in data['results']], ids[:2])
+        self.assertEqual(data['results'][0]['author'], 'alice')
+        data = json.loads(self.test_client.get(data['next']).get_data(as_text=True))
+        self.assertEqual([recipe['id'] for recipe in data['results']], ids[2:])
+        response = self.test_client.get('/api/public/recipes/{0}'.format(alice_recipes[0]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_purge_accounts_cleans_the_shard(self):
+        self.add_recipes('alice', 'bean soup')
+        self.test_client.delete('api/auth/account', headers=self.users['alice'])
+        deleted = purge_accounts()
+        self.assertEqual(deleted['recipe'], 1)
+        self.assertEqual(self.count('shard0', Recipe, 2), 0)
+        self.assertEqual(self.count('shard0', Category, 2), 0)
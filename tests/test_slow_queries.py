@@ -0,0 +1,55 @@
+# coding=utf-8
+import json
+from flask import url_for
+from sqlalchemy.exc import DBAPIError
+from api import slow_queries
+from api.models import db
+from .base_tests import BaseTestCase
+
+
+class SlowQueryTests(BaseTestCase):
+    """Test case for the slow query log"""
+
+    def setUp(self):
+        super(SlowQueryTests, self).setUp()
+        # every statement is slower than a nanosecond
+        self.app.config.update(SLOW_QUERY_MS=0.000001, SLOW_QUERY_EXPLAIN=True)
+        slow_queries.init_app(self.app)
+        slow_queries.reset()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+
+    def tearDown(self):
+        slow_queries.reset()
+        super(SlowQueryTests, self).tearDown()
+
+    def test_slow_statement_logged_with_endpoint_and_user(self):
+        with self.assertLogs('api.slow_queries', level='WARNING') as logs:
+            self.test_client.get(self.category_url, headers={"x-access-token": self.access_token})
+        lines = [json.loads(record.getMessage()) for record in logs.records]
+        category_lines = [line for line in lines if 'FROM category' in line['statement']]
+        self.assertTrue(category_lines)
+        self.assertEqual(category_lines[0]['endpoint'], 'api/categories.categorylistresource')
+        self.assertEqual(category_lines[0]['user_id'], 1)
+
+    def test_failed_statements_leave_nothing_on_the_connection(self):
+        with db.engine.connect() as connection:
+            with self.assertRaises(DBAPIError):
+                connection.execute('SELECT * FROM no_such_table')
+            connection.execute('SELECT 1')
+            self.assertNotIn('query_start', connection.info)
+
+    def test_plans_served_to_admins(self):
+        self.test_client.get(self.category_url + '?q=soup', headers={"x-access-token": self.access_token})
+        response = self.test_client.get(url_for('api/admin.slowqueryresource', _external=True),
+                                        headers={'x-admin-token': 'admintoken'})
+        statements = json.loads(response.get_data(as_text=True))['statements']
+        category = [entry for entry in statements if entry['statement'].startswith('SELECT category.')][0]
+        self.assertIn('api/categories.categorylistresource', category['endpoints'])
+        self.assertTrue(category['plan'])
+
+    def test_statement_shape_folds_in_lists(self):
+        self.assertEqual(slow_queries.statement_shape('SELECT *\n  FROM recipe WHERE id IN (?, ?, ?)'),
+                         slow_queries.statement_shape('SELECT * FROM recipe WHERE id IN (?)'))
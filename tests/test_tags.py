@@ -0,0 +1,91 @@
+# coding=utf-8
+import json
+from api import status
+from api.models import Tag
+from .base_tests import BaseTestCase
+
+
+class TagTests(BaseTestCase):
+    """Test case for recipe tags"""
+
+    def setUp(self):
+        super(TagTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        for title, tags in (('pea soup', ['Vegan', 'quick']), ('bean soup', ['vegan']),
+                            ('fish soup', ['quick']), ('corn soup', [])):
+            self.create_recipe(title, tags)
+
+    def create_recipe(self, title, tags):
+        return self.test_client.post('api/category/1/recipes/', headers=self.headers, content_type='application/json',
+                                     data=json.dumps({'title': title, 'body': 'Boil the water', 'tags': tags}))
+
+    def get(self, url):
+        response = self.test_client.get(url, headers=self.headers)
+        return response, json.loads(response.get_data(as_text=True))
+
+    def test_tags_are_shared_between_recipes(self):
+        _, recipe = self.get('api/recipes/1')
+        self.assertEqual(recipe['tags'], ['quick', 'vegan'])
+        self.assertEqual(sorted(tag.name for tag in Tag.query), ['quick', 'vegan'])
+
+    def test_filter_by_every_tag(self):
+        _, data = self.get('api/category/1/recipes/?tags=vegan')
+        self.assertEqual([recipe['id'] for recipe in data['results']], [2, 1])
+        _, data = self.get('api/category/1/recipes/?tags=vegan,Quick')
+        self.assertEqual([recipe['id'] for recipe in data['results']], [1])
+        response, _ = self.get('api/category/1/recipes/?tags=vegan,spicy')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tag_counts_follow_the_filter(self):
+        response, data = self.get('api/category/1/recipes/tags')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(data['tags'], [{'name': 'quick', 'count': 2}, {'name': 'vegan', 'count': 2}])
+        _, data = self.get('api/category/1/recipes/tags?tags=quick')
+        self.assertEqual(data['tags'], [{'name': 'quick', 'count': 2}, {'name': 'vegan', 'count': 1}])
+        _, data = self.get('api/category/1/recipes/tags?q=bean')
+        self.assertEqual(data['tags'], [{'name': 'vegan', 'count': 1}])
+
+    def test_update_tags(self):
+        response = self.test_client.put('api/recipes/4', headers=self.headers,
+                                        data=json.dumps({'tags': ['quick', 'cheap']}))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        _, recipe = self.get('api/recipes/4')
+        self.assertEqual(recipe['tags'], ['cheap', 'quick'])
+        self.test_client.put('api/recipes/4', headers=self.headers, data=json.dumps({'tags': []}))
+        _, recipe = self.get('api/recipes/4')
+        self.assertEqual(recipe['tags'], [])
+
+    def test_invalid_tags(self):
+        response = self.create_recipe('lentil soup', 'vegan')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.create_recipe('lentil soup', ['a' * 51])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.create_recipe('lentil soup', [str(number) for number in range(11)])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_tag_created_by_another_request_is_reused(self):
+        """A tag created between the lookup and the commit is found again instead of failing the save"""
+        for_names = Tag.for_names
+        lookups = []
+
+        def stale_for_names(user_id, names):
+            lookups.append(names)
+            if len(lookups) == 1:
+                # as if 'vegan' did not exist yet when the tags were looked up
+                return [Tag(name, user_id) for name in names]
+            return for_names(user_id, names)
+
+        Tag.for_names = staticmethod(stale_for_names)
+        try:
+            response = self.create_recipe('lentil soup', ['vegan'])
+        finally:
+            Tag.for_names = staticmethod(for_names)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(lookups), 2)
+        self.assertEqual(Tag.query.filter_by(name='vegan').count(), 1)
@@ -0,0 +1,34 @@
+# coding=utf-8
+import json
+from api import timing
+from .base_tests import BaseTestCase
+
+
+class ServerTimingTests(BaseTestCase):
+    """Test case for the Server-Timing breakdown"""
+
+    def setUp(self):
+        super(ServerTimingTests, self).setUp()
+        self.app.config['SERVER_TIMING'] = True
+        timing.init_app(self.app)
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.test_client.post(self.category_url, headers={"x-access-token": self.access_token},
+                              data=json.dumps({'name': self.category_name}),
+                              content_type='application/json')
+
+    def test_header_breaks_down_request_phases(self):
+        response = self.test_client.get(self.category_url, headers={"x-access-token": self.access_token})
+        phases = [metric.split(';')[0] for metric in response.headers['Server-Timing'].split(', ')]
+        for phase in ('jwt', 'blacklist', 'user', 'query', 'dump', 'json', 'db', 'total'):
+            self.assertIn(phase, phases)
+
+    def test_log_line_per_request(self):
+        with self.assertLogs('api.timing', level='INFO') as logs:
+            self.test_client.get(self.category_url, headers={"x-access-token": self.access_token})
+        line = json.loads(logs.records[-1].getMessage())
+        self.assertEqual(line['endpoint'], 'api/categories.categorylistresource')
+        self.assertEqual(line['status'], 200)
+        self.assertIn('total_ms', line)
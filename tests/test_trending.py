@@ -0,0 +1,76 @@
+# coding=utf-8
+import json
+import time
+from api import status
+from api.models import Recipe
+from api import trending
+from api.trending import refresh_trending
+from .base_tests import BaseTestCase
+
+
+class TrendingRecipeTests(BaseTestCase):
+    """Test case for the trending feed"""
+
+    def setUp(self):
+        super(TrendingRecipeTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+        for title, public in (('pea soup', True), ('bean soup', False), ('corn soup', True),
+                              ('fish soup', True)):
+            self.test_client.post('api/category/1/recipes/', headers=self.headers, content_type='application/json',
+                                  data=json.dumps({'title': title, 'body': 'Boil the water', 'public': public}))
+
+    def trending(self, url='/api/public/recipes/trending'):
+        response = self.test_client.get(url)
+        return response, json.loads(response.get_data(as_text=True))
+
+    def test_views_are_counted_without_touching_the_recipe(self):
+        modified = Recipe.query.get(1).modified_timestamp
+        for _ in range(2):
+            self.test_client.get('/api/public/recipes/1')
+        self.test_client.get('/api/public/recipes/2')
+        recipe = Recipe.query.get(1)
+        self.assertEqual(recipe.view_count, 2)
+        self.assertEqual(recipe.modified_timestamp, modified)
+        self.assertEqual(Recipe.query.get(2).view_count, 0)
+
+    def test_views_are_written_once_per_window(self):
+        self.app.config['VIEW_FLUSH_SECONDS'] = 60
+        trending._last_flush[0] = time.time()
+        for _ in range(3):
+            self.test_client.get('/api/public/recipes/1')
+        self.assertEqual(Recipe.query.get(1).view_count, 0)
+        trending.flush_views()
+        self.assertEqual(Recipe.query.get(1).view_count, 3)
+
+    def test_trending_is_ranked_by_views_then_recency(self):
+        _, data = self.trending()
+        self.assertEqual(data['results'], [])
+        for _ in range(2):
+            self.test_client.get('/api/public/recipes/1')
+        self.test_client.get('/api/public/recipes/3')
+        self.assertEqual(refresh_trending(), 3)
+        response, data = self.trending()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([(recipe['rank'], recipe['id']) for recipe in data['results']], [(1, 1), (2, 3), (3, 4)])
+        self.assertIn('stale-while-revalidate', response.headers['Cache-Control'])
+
+    def test_trending_pages_with_a_cursor(self):
+        refresh_trending()
+        _, first = self.trending('/api/public/recipes/trending?limit=2')
+        self.assertEqual([recipe['id'] for recipe in first['results']], [4, 3])
+        _, second = self.trending(first['next'])
+        self.assertEqual([recipe['id'] for recipe in second['results']], [1])
+        self.assertIsNone(second['next'])
+
+    def test_unshared_and_deleted_recipes_leave_the_ranking(self):
+        refresh_trending()
+        self.test_client.put('api/recipes/4', headers=self.headers, data=json.dumps({'public': False}))
+        self.test_client.delete('api/recipes/3', headers=self.headers)
+        _, data = self.trending()
+        self.assertEqual([recipe['id'] for recipe in data['results']], [1])
@@ -0,0 +1,69 @@
+# coding=utf-8
+import json
+from api import status
+from api.models import Recipe
+from api.validation import Validator, Field, matches, min_length
+from .base_tests import BaseTestCase
+
+
+class ValidationTests(BaseTestCase):
+    """Test case for validating request bodies"""
+
+    def setUp(self):
+        super(ValidationTests, self).setUp()
+        self.client.post('api/auth/register/', data=json.dumps(self.user_data),
+                         content_type='application/json')
+        self.login_response = self.login_user(self.test_username, self.test_user_password)
+        self.access_token = json.loads(self.login_response.data.decode())['token']
+        self.headers = {"x-access-token": self.access_token}
+        self.test_client.post(self.category_url, headers=self.headers, data=json.dumps({'name': 'soup'}),
+                              content_type='application/json')
+
+    def send(self, method, url, data):
+        response = getattr(self.test_client, method)(url, headers=self.headers, content_type='application/json',
+                                                     data=data if isinstance(data, str) else json.dumps(data))
+        return response, json.loads(response.get_data(as_text=True))
+
+    def test_every_error_is_reported(self):
+        response, data = self.send('post', 'api/category/1/recipes/',
+                                   {'title': '   ', 'body': 5, 'public': 'yes', 'tags': ['a,b']})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data['message'], {
+            'title': ['No input data provided'],
+            'body': ['Not a valid string.'],
+            'public': ['The parameter public must be true or false'],
+            'tags': ['Tag names must be 1 to 50 characters without commas: a,b'],
+        })
+
+    def test_payload_is_stripped_and_defaulted(self):
+        response, _ = self.send('post', 'api/category/1/recipes/', {'title': ' pea soup ', 'body': ' Boil it '})
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        recipe = Recipe.query.get(1)
+        self.assertEqual((recipe.title, recipe.body, recipe.public, recipe.tags), ('Pea Soup', 'Boil it', False, []))
+
+    def test_edits_validate_the_fields_sent(self):
+        self.send('post', 'api/category/1/recipes/', {'title': 'pea soup', 'body': 'Boil the water'})
+        response, data = self.send('put', 'api/recipes/1', {'body': 'Boil  it'})
+        self.assertEqual(data['message'], {'body': ['The parameter category has more than one spaces in: Boil  it']})
+        response, _ = self.send('put', 'api/recipes/1', {'public': True})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(Recipe.query.get(1).public)
+
+    def test_invalid_json(self):
+        response, data = self.send('post', self.category_url, '{"name": ')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(data, {'error': 'payload must be a valid json'})
+        response, data = self.send('post', self.category_url, '["soup"]')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_validator_loads_once(self):
+        validator = Validator({
+            'name': Field(checks=[min_length(3), matches(r'^[a-z]+$', 'Lower case letters only')]),
+            'quiet': Field(bool, required=False, default=False),
+        })
+        self.assertEqual(validator.load({'name': ' ab1 '}),
+                         ({'quiet': False}, {'name': ['Lower case letters only']}))
+        self.assertEqual(validator.load({'name': 'A1', 'quiet': 1}), ({}, {
+            'name': ['Shorter than minimum length 3.', 'Lower case letters only'],
+            'quiet': ['Not a valid boolean.']}))
+        self.assertEqual(validator.load({'name': 'soup'}), ({'name': 'soup', 'quiet': False}, {}))